@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import json
+import pickle
+from hashlib import sha256
+from os import utime
+from pathlib import Path
+from typing import TYPE_CHECKING, Final, Optional
+
+import attr
+
+if TYPE_CHECKING:
+    from ayed.types import File, Files
+
+# Bump whenever File/Variable change shape so that stale pickles are ignored.
+CACHE_VERSION: Final = 5
+CHUNK_SIZE: Final = 1024 * 1024
+
+
+def file_digest(path: Path) -> str:
+    """Returns the sha256 hexdigest of the contents of `path`"""
+    h = sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@attr.s(slots=True)
+class WorkbookCache:
+    """
+    On-disk cache of parsed workbooks. Entries are pickled File/Files keyed by
+    the workbook's content hash and the sheet that was read, and the least
+    recently used ones are evicted once the cache grows past `max_bytes`.
+    """
+
+    folder: Path = attr.ib(default=Path("output_files") / ".cache", converter=Path)
+    max_bytes: int = attr.ib(default=64 * 1024 * 1024)
+
+    def entry(self, digest: str, sheet: Optional[str], stream: bool) -> Path:
+        """Returns the path of the entry for a given workbook/sheet"""
+        key = sha256(
+            f"{CACHE_VERSION}:{digest}:{sheet or '*'}:{stream}".encode("utf-8")
+        ).hexdigest()
+        return self.folder / f"{key}.pickle"
+
+    def get(self, entry: Path) -> File | Files | None:
+        """Returns the cached data for `entry`, None on a miss"""
+        try:
+            with entry.open("rb") as fh:
+                data = pickle.load(fh)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        utime(entry)  # mark it as recently used
+        return data
+
+    def put(self, entry: Path, data: File | Files) -> None:
+        """Stores `data` as `entry` and evicts old entries if needed"""
+        self.folder.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_suffix(".tmp")
+        with tmp.open("wb") as fh:
+            pickle.dump(data, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(entry)
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until it fits in max_bytes"""
+        entries = []
+        for path in self.folder.glob("*.pickle"):
+            try:
+                entries.append((path.stat(), path))
+            except FileNotFoundError:  # evicted by someone else
+                continue
+        entries.sort(key=lambda e: e[0].st_mtime)
+        total = sum(stat.st_size for stat, _ in entries)
+        for stat, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+
+    def clear(self) -> None:
+        for path in self.folder.glob("*.pickle"):
+            path.unlink(missing_ok=True)
+
+
+@attr.s(slots=True)
+class Manifest:
+    """
+    A json file that maps output names to the digest of what produced them,
+    used to skip rebuilding outputs whose inputs didn't change. Inputs that
+    failed are kept too, with their error, so they aren't retried unchanged.
+
+    The size and mtime of the outputs written are kept as well, so outputs
+    changed by something else since (ex: ayed sort) aren't taken as fresh.
+    """
+
+    path: Path = attr.ib(converter=Path)
+    digests: dict[str, str] = attr.ib(factory=dict, repr=False)
+    errors: dict[str, str] = attr.ib(factory=dict, repr=False)
+    outputs: dict[str, list[int]] = attr.ib(factory=dict, repr=False)
+
+    @classmethod
+    def load(cls, path: Path) -> "Manifest":
+        try:
+            with path.open(encoding="utf-8") as fh:
+                digests = json.load(fh)
+        except (OSError, ValueError):
+            digests = {}
+        if not isinstance(digests, dict) or digests.get("version") != CACHE_VERSION:
+            digests = {}
+        digests.pop("version", None)
+        errors = digests.pop("errors", None)
+        outputs = digests.pop("outputs", None)
+        return cls(
+            path,
+            digests,
+            errors if isinstance(errors, dict) else {},
+            outputs if isinstance(outputs, dict) else {},
+        )
+
+    def is_fresh(self, name: str, digest: str, output: Optional[Path] = None) -> bool:
+        """
+        Whether `name` was built from `digest`, and if its `output` is given,
+        whether it's still the file that was written then
+        """
+        if self.digests.get(name) != digest:
+            return False
+        return output is None or self.outputs.get(name) == self.stat(output)
+
+    def update(
+        self,
+        name: str,
+        digest: str,
+        error: Optional[str] = None,
+        output: Optional[Path] = None,
+    ) -> None:
+        self.digests[name] = digest
+        if error is None:
+            self.errors.pop(name, None)
+        else:
+            self.errors[name] = error
+        if output is not None:
+            self.outputs[name] = self.stat(output)
+
+    @staticmethod
+    def stat(output: Path) -> list[int]:
+        """The size and mtime of `output`, [] if there's none"""
+        try:
+            st = output.stat()
+        except OSError:
+            return []
+        return [st.st_size, st.st_mtime_ns]
+
+    def error(self, name: str) -> Optional[str]:
+        """What went wrong the last time `name` was built, if anything did"""
+        return self.errors.get(name)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("w", encoding="utf-8") as fh:
+            data = {"version": CACHE_VERSION, **self.digests}
+            if self.errors:
+                data["errors"] = self.errors
+            if self.outputs:
+                data["outputs"] = self.outputs
+            json.dump(data, fh, indent=2)
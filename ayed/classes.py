@@ -1,21 +1,39 @@
 from __future__ import annotations
 
-from functools import partial
+from functools import lru_cache
 from pathlib import Path
 from random import sample
 from string import ascii_lowercase
 from struct import Struct as CStruct
-from typing import TYPE_CHECKING, Any, Iterable, Iterator, Optional
+from struct import calcsize
+from typing import TYPE_CHECKING, Any, Callable, Final, Iterable, Iterator, Optional
 
 if TYPE_CHECKING:
+    from numpy import dtype, ndarray
+
     from ayed.types import Variables
 
 import attr
 
-from ayed.utils import build_cfn, console, create_table
+from ayed.exceptions import NoStructException, ReadSheetException
+from ayed.output import output
+from ayed.utils import PAGE_SIZE, build_cfn
 
 ascii_lowercase: str = "".join(x for x in ascii_lowercase if x != "x")
 
+# Struct.iter_packed packs this many bytes worth of records per chunk
+CHUNK_BYTES: Final = 8 * 1024 * 1024
+# Struct.digest hashes the values of a column this many at a time
+DIGEST_VALUES: Final = 65_536
+# the generated TReadAll/TWriteAll move this many records per fread/fwrite
+IO_BATCH: Final = 4096
+# (a, b) -> a C++ expression that compares a and b, ex: a < b
+Compare = Callable[[str, str], str]
+# TToString/TFromString separate the fields with SEPARATOR, TToString
+# reserves TOKEN_CHARS for each field that isn't a char[], ex: an int64
+SEPARATOR: Final = "-"
+TOKEN_CHARS: Final = 20
+
 # C_DTYPES :: Num a => string -> a
 C_DTYPES: dict[str, str] = {
     "char": "",
@@ -45,11 +63,67 @@ C_DTYPES: dict[str, str] = {
     "signed long long int": "stoll",
     "unsigned long long": "stoull",
     "unsigned long long int": "stoull",
+    "bool": "stoi",  # std::to_string writes it as 1 or 0
+    "int8_t": "stoi",
+    "uint8_t": "stoul",
+    "int16_t": "stoi",
+    "uint16_t": "stoul",
+    "int32_t": "stoi",
+    "uint32_t": "stoul",
+    "int64_t": "stoll",
+    "uint64_t": "stoull",
+    "ssize_t": "stoll",
+    "size_t": "stoull",
     "float": "stof",
     "double": "stod",
     "long double": "stold",
 }
 
+# https://docs.python.org/3/library/struct.html?highlight=struct#format-characters
+# every spelling of each type, std::string and other structs have no format
+FORMATS: Final[dict[str, str]] = {
+    "char": "c",
+    "signed char": "b",
+    "unsigned char": "B",
+    "bool": "?",
+    "short": "h",
+    "short int": "h",
+    "signed short": "h",
+    "signed short int": "h",
+    "unsigned short": "H",
+    "unsigned short int": "H",
+    "int": "i",
+    "signed": "i",
+    "signed int": "i",
+    "unsigned": "I",
+    "unsigned int": "I",
+    "long": "l",
+    "long int": "l",
+    "signed long": "l",
+    "signed long int": "l",
+    "unsigned long": "L",
+    "unsigned long int": "L",
+    "long long": "q",
+    "long long int": "q",
+    "signed long long": "q",
+    "signed long long int": "q",
+    "unsigned long long": "Q",
+    "unsigned long long int": "Q",
+    "int8_t": "b",
+    "uint8_t": "B",
+    "int16_t": "h",
+    "uint16_t": "H",
+    "int32_t": "i",
+    "uint32_t": "I",
+    "int64_t": "q",
+    "uint64_t": "Q",
+    "ssize_t": "n",
+    "size_t": "N",
+    "float": "f",
+    "double": "d",
+    "void *": "P",
+}
+
 
 @attr.s(slots=True, init=True)
 class Variable:
@@ -82,28 +156,63 @@ class Variable:
         return C_DTYPES.get(self.type, f"{self.type.lower()}FromString")
 
     def format_character(self) -> str:
+        """The struct module's format of the field, raises if it has none"""
         if self.ctype:
             return f"{self.ctype}s"
-        # https://docs.python.org/3/library/struct.html?highlight=struct#format-characters
-        conv_table = {
-            "char": "c",
-            "signed char": "b",
-            "unsigned char": "B",
-            "short": "h",
-            "unsigned short": "H",
-            "int": "i",
-            "unsigned int": "I",
-            "long": "l",
-            "unsigned long": "L",
-            "long long": "q",
-            "unsigned long long": "Q",
-            "ssize_t": "n",
-            "size_t": "N",
-            "float": "f",
-            "double": "d",
-            "void *": "P",
-        }
-        return conv_table.get(self.type, "c")
+        try:
+            return FORMATS[self.type]
+        except KeyError:
+            raise NoStructException(
+                f"{self.name} is a {self.type}, which can't be written to a .dat:"
+                " it has no fixed size (or isn't a type ayed knows)."
+            ) from None
+
+    def comparison(self) -> Optional[tuple[str, Compare, Compare]]:
+        """
+        The C++ type of a search key for this field, and how to tell whether
+        a value is less than / equal to another. None if it can't be compared.
+        """
+        if self.ctype:
+            n = self.ctype
+            return (
+                "const char*",
+                lambda a, b: f"strncmp({a}, {b}, {n}) < 0",
+                lambda a, b: f"strncmp({a}, {b}, {n}) == 0",
+            )
+        if self.type in ("string", "std::string"):
+            key = "const std::string&"
+        elif self.type in FORMATS:
+            key = self.type
+        else:
+            return None
+        return key, lambda a, b: f"{a} < {b}", lambda a, b: f"{a} == {b}"
+
+    def numpy_format(self) -> str:
+        """Returns the numpy equivalent of `format_character`, ex: i -> i4"""
+        fmt = self.format_character()
+        size = calcsize(fmt)
+        if fmt[-1] in "sc":
+            return f"S{size}"
+        if fmt in "efd":
+            return f"f{size}"
+        return f"{'i' if fmt.islower() else 'u'}{size}"
+
+
+def c_literal(text: str) -> str:
+    """A C++ char literal for a single character, a string literal otherwise"""
+    escaped = text.replace("\\", "\\\\")
+    if len(text) == 1:
+        return "'{}'".format(escaped.replace("'", "\\'"))
+    return '"{}"'.format(escaped.replace('"', '\\"'))
+
+
+@lru_cache(maxsize=256)
+def compile_layout(fmt: str) -> CStruct:
+    """
+    struct.Struct(fmt), compiled once per format. The same structs are parsed
+    again on every run of `ayed watch`, their layouts don't need to be.
+    """
+    return CStruct(fmt)
 
 
 @attr.s(init=True)
@@ -115,11 +224,28 @@ class Struct(Iterable[Variable]):
 
     name: str = attr.ib()
     fields: Variables = attr.ib()
-    cstruct: CStruct = attr.ib(init=False)
+    _cstruct: Optional[CStruct] = attr.ib(
+        init=False, default=None, eq=False, repr=False
+    )
+
+    @property
+    def cstruct(self) -> CStruct:
+        """
+        The layout of the records. Compiled the first time it's needed, so
+        structs with fields that have no layout (std::string, other structs)
+        can still generate their functions, raises NoStructException for them.
+        """
+        if self._cstruct is None:
+            fmt = "".join(field.format_character() for field in self.fields)
+            self._cstruct = compile_layout(fmt)
+        return self._cstruct
 
-    def __attrs_post_init__(self) -> None:
-        c_fmt = "".join(ctype.format_character() for ctype in self.fields)
-        self.cstruct = CStruct(c_fmt)
+    def __getstate__(self) -> dict[str, Any]:
+        # struct.Struct can't be pickled, it's compiled again when it's needed
+        return {"name": self.name, "fields": self.fields}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state, _cstruct=None)
 
     def __iter__(self) -> Iterator[Variable]:
         yield from self.fields
@@ -129,53 +255,223 @@ class Struct(Iterable[Variable]):
         """Returns the size of the struct."""
         return self.cstruct.size
 
+    @property
+    def layout(self) -> str:
+        """Returns the name, format and (ordered) fields of the struct."""
+        fields = ";".join(
+            f"{field.type}{f'[{field.ctype}]' if field.ctype else ''} {field.name}"
+            for field in self
+        )
+        return f"{self.name}:{self.cstruct.format}:{fields}"
+
+    def __len__(self) -> int:
+        """Returns the amount of records the struct holds."""
+        return len(self.fields[0].data) if self.fields else 0
+
+    def check_lengths(self) -> None:
+        """Raises if the columns don't hold the same amount of records."""
+        lengths = {field.name: len(field.data) for field in self}
+        if len(set(lengths.values())) > 1:
+            counts = ", ".join(f"{name}={n}" for name, n in lengths.items())
+            raise ReadSheetException(
+                f"The columns of {self.name} have different lengths: {counts}"
+            )
+
+    def digest(self) -> str:
+        """Returns a digest of the struct layout plus its data."""
+        from hashlib import blake2b
+
+        h = blake2b(digest_size=16)
+        h.update(self.layout.encode("utf-8"))
+        for field in self:
+            h.update(f"{field.name}:{len(field.data)}:".encode("utf-8"))
+            # a slice at a time, the repr of a whole column can be huge
+            for start in range(0, len(field.data), DIGEST_VALUES):
+                chunk = field.data[start : start + DIGEST_VALUES]
+                h.update(repr(chunk).encode("utf-8"))
+        return h.hexdigest()
+
     def pack(self) -> list[bytes]:
         """Packs the raw bytes of the struct into a list."""
-        data_len = len(self.fields[0].data)
-        return [
-            self.cstruct.pack(*[field.data[i] for field in self])
-            for i in range(data_len)
-        ]
+        self.check_lengths()
+        pack = self.cstruct.pack
+        return [pack(*row) for row in zip(*(field.data for field in self))]
 
-    def unpack(self, filepath: Path) -> None:
-        """Reads raw struct bytes written in `filepath`"""
+    def pack_buffer(self, start: int = 0, stop: Optional[int] = None) -> bytearray:
+        """Packs records [start, stop) into a single preallocated buffer."""
+        self.check_lengths()
+        columns = [field.data[start:stop] for field in self]
+        rows = len(columns[0]) if columns else 0
+        buffer = bytearray(self.size * rows)
+        pack_into = self.cstruct.pack_into
+        for offset, row in zip(range(0, len(buffer), self.size), zip(*columns)):
+            pack_into(buffer, offset, *row)
+        return buffer
+
+    def iter_packed(self, chunk_bytes: int = CHUNK_BYTES) -> Iterator[bytearray]:
+        """
+        Yields all the records packed into buffers of at most `chunk_bytes`
+        (at least one record each), so huge sheets are packed in bounded memory.
+        """
+        rows = max(1, chunk_bytes // max(self.size, 1))
+        for start in range(0, len(self), rows):
+            yield self.pack_buffer(start, start + rows)
+
+    def iter_unpack(
+        self, filepath: Path, start: int = 0, stop: Optional[int] = None
+    ) -> Iterator[tuple[Any, ...]]:
+        """Yields records [start, stop) of `filepath`, reading it in chunks"""
+        rows = max(1, CHUNK_BYTES // max(self.size, 1))
+        with filepath.open("rb") as dat:
+            dat.seek(start * self.size)
+            left = stop - start if stop is not None else None
+            while left is None or left > 0:
+                n = rows if left is None else min(rows, left)
+                chunk = dat.read(n * self.size)
+                chunk = chunk[: len(chunk) - len(chunk) % self.size]
+                if not chunk:
+                    return
+                yield from self.cstruct.iter_unpack(chunk)
+                if left is not None:
+                    left -= len(chunk) // self.size
+
+    def unpack(
+        self,
+        filepath: Path,
+        *,
+        head: Optional[int] = None,
+        tail: Optional[int] = None,
+        page_size: int = PAGE_SIZE,
+    ) -> None:
+        """
+        Reads raw struct bytes written in `filepath` and logs them in pages of
+        `page_size` records, optionally only the first `head` or last `tail`.
+        """
         if not filepath.exists():
             raise AssertionError("Path doesn't exist")
-        data_len = len(self.fields[0].data)
-        table = create_table(
-            f"{filepath.name} - {self.size * data_len} bytes",
-            columns=iter(field.name for field in self),
+        if head is not None and tail is not None:
+            raise ValueError("head and tail can't be used together")
+        total = filepath.stat().st_size // self.size
+        start, stop = 0, total
+        if head is not None:
+            stop = min(head, total)
+        if tail is not None:
+            start = max(0, total - tail)
+        output.records(
+            filepath.name,
+            columns=[field.name for field in self],
+            records=self.iter_unpack(filepath, start, stop),
+            title=f"{filepath.name} - {self.size * total} bytes",
+            start=start,
+            page_size=page_size,
+        )
+
+    @property
+    def offsets(self) -> list[int]:
+        """Returns the byte offset of every field within a record."""
+        offsets, fmt = [], ""
+        for field in self:
+            char = field.format_character()
+            offsets.append(calcsize(fmt + char) - calcsize(char))
+            fmt += char
+        return offsets
+
+    def field(self, name: str) -> tuple[int, Variable]:
+        """Returns the position and the variable of the field called `name`."""
+        for i, field in enumerate(self):
+            if field.name == name:
+                return i, field
+        raise KeyError(
+            f"{self.name} has no field {name}, its fields are: "
+            + ", ".join(field.name for field in self)
+        )
+
+    @property
+    def dtype(self) -> dtype:
+        """
+        Returns the layout as a numpy structured dtype, with the same offsets
+        and itemsize as self.cstruct so arrays can be read/written as-is.
+        """
+        from numpy import dtype
+
+        return dtype(
+            {
+                "names": [field.name for field in self],
+                "formats": [field.numpy_format() for field in self],
+                "offsets": self.offsets,
+                "itemsize": self.size,
+            }
         )
-        with filepath.open("rb") as dat:
-            for d in iter(partial(dat.read, self.size), b""):
-                written = self.cstruct.unpack(d)
-                table.add_row(*[str(d) for d in written])
-        console.log(table, justify="center")
 
-    # TODO: Use a different separator when reading a struct
-    def to_str(self, sep: Optional[str] = "-") -> str:
+    def to_array(self) -> ndarray:
+        """Builds a structured array out of the struct's columns."""
+        from numpy import zeros
+
+        self.check_lengths()
+        array = zeros(len(self), dtype=self.dtype)
+        for field in self:
+            array[field.name] = field.data
+        return array
+
+    def tofile(self, filepath: Path) -> None:
+        """Writes the records to `filepath` with ndarray.tofile"""
+        self.to_array().tofile(filepath)
+
+    def fromfile(self, filepath: Path, mmap: bool = False) -> ndarray:
+        """
+        Reads the records written in `filepath` into a structured array.
+        With mmap, the file is memory-mapped read-only instead of copied.
+        """
+        from numpy import fromfile, memmap
+
+        if mmap:
+            return memmap(filepath, dtype=self.dtype, mode="r")
+        return fromfile(filepath, dtype=self.dtype)
+
+    def to_str(self, sep: str = SEPARATOR) -> str:
         """Returns the function TToString"""
         name = self.name[0].lower()
-        variables: list[str] = [
-            field.name
-            if field.type == "string"
-            else f"{field.type_to_str()}({name}.{field.name})"
-            for field in self
-        ]
-        ret = f"+'{sep}'+".join(variables)
+        # appended into a single buffer, reserved up front. Not `s`, which
+        # would shadow the parameter of structs like Sale
+        body = ["std::string out", f"out.reserve({self.str_size(sep)})"]
+        for i, field in enumerate(self):
+            if i:
+                body.append(f"out += {c_literal(sep)}")
+            convert = field.type_to_str()
+            if field.type in ("string", "std::string") or not convert:
+                body.append(f"out += {name}.{field.name}")
+            else:
+                body.append(f"out += {convert}({name}.{field.name})")
         return build_cfn(
             "string",
             f"{self.name.lower()}ToString",
             params=[f"{self.name} {name}"],
-            vret=ret,
+            body=body,
+            vret="out",
         )
 
-    def from_str(self) -> str:
-        """Returns the function TFromString"""
-        body: list[str] = [f"{self.name} x" + "{}"]
+    def str_size(self, sep: str = SEPARATOR) -> int:
+        """About how long TToString's result is, to reserve it"""
+        fields = sum(field.ctype or TOKEN_CHARS for field in self)
+        return fields + len(sep) * max(len(self.fields) - 1, 0)
+
+    def from_str(self, sep: str = SEPARATOR) -> str:
+        """
+        Returns the function TFromString, which goes through `s` once: each
+        token is found from where the previous one ended.
+        """
+        end = "std::string::npos"
+        body: list[str] = [
+            f"{self.name} x" + "{}",
+            "size_t pos = 0",
+            "auto token = [&]()\n  {"
+            f"\n    size_t end = s.find({c_literal(sep)}, pos);"
+            "\n    std::string t = s.substr(pos, end - pos);"
+            f"\n    pos = end == {end} ? s.size() : end + {len(sep)};"
+            "\n    return t;\n  }",
+        ]
         for i, field in enumerate(self):
-            token = f"std::string t{i} = getTokenAt(s, '-', {i})"
-            body.append(token)
+            body.append(f"std::string t{i} = token()")
             if fn := field.str_to_type():
                 body.append(
                     fn + f"(x.{field.name}, t{i}.c_str())"
@@ -217,7 +513,8 @@ class Struct(Iterable[Variable]):
         """Creates an initializer function. T newT(...)"""
         vnames = sample(ascii_lowercase[13:], k=len(self.fields))
         params = [
-            f'{field.type if not field.ctype else "std::string"} {vnames[i]}'
+            f"{'std::string' if field.ctype or field.type == 'string' else field.type}"
+            f" {vnames[i]}"
             for i, field in enumerate(self)
         ]
         body: list[str] = [
@@ -233,6 +530,199 @@ class Struct(Iterable[Variable]):
             self.name, f"new{self.name}", params=params, body=body, vret="x"
         )
 
+    def functions(
+        self, io: bool = True, sep: str = SEPARATOR, collection: bool = False
+    ) -> Iterator[str]:
+        """
+        Yields the struct definition, then each of its functions. With `io`,
+        the binary ones too, for the structs that have them (see Struct.io),
+        and with `collection`, TColl (see Struct.collection). TToString and
+        TFromString separate the fields with `sep`.
+        """
+        yield str(self)
+        yield self.init()
+        yield self.to_str(sep)
+        yield self.from_str(sep)
+        yield self.to_debug()
+        if io and self.binary:
+            yield self.io()
+        if collection:
+            yield self.collection()
+
+    @property
+    def binary(self) -> bool:
+        """
+        Whether its records can be read and written byte by byte in C++: only
+        fixed size fields, and no std::string or other structs, whose layout
+        cstruct doesn't know.
+        """
+        return bool(self.fields) and all(
+            field.ctype or field.type in FORMATS for field in self
+        )
+
+    def io(self) -> str:
+        """
+        Returns T_SIZE and the functions TRead, TWrite, TReadAll, TWriteAll,
+        TSeek and TCount. Records are T_SIZE bytes long, exactly as cstruct
+        packs them in the .dat files, which leaves out the padding C++ might
+        add after the last field of a T.
+        """
+        x, lower, upper = self.name, self.name.lower(), self.name.upper()
+        size, batch = f"{upper}_SIZE", f"{upper}_BATCH"
+        fns = [
+            f"// bytes per record in the .dat files, as ayed writes them\n"
+            f"const size_t {size} = {self.size};\n"
+            f"const size_t {batch} = {IO_BATCH};  // records per fread/fwrite\n"
+            f'static_assert(sizeof({x}) >= {size}, "{x} has a different layout");\n',
+            build_cfn(
+                "bool",
+                f"{lower}Read",
+                params=["FILE* f", f"{x}& x"],
+                body=["x = {}"],
+                vret=f"fread(&x, {size}, 1, f) == 1",
+            ),
+            build_cfn(
+                "void",
+                f"{lower}Write",
+                params=["FILE* f", f"const {x}& x"],
+                body=[f"fwrite(&x, {size}, 1, f)"],
+            ),
+            build_cfn(
+                f"std::vector<{x}>",
+                f"{lower}ReadAll",
+                params=["FILE* f"],
+                body=[
+                    f"std::vector<{x}> v",
+                    f"std::vector<char> buffer({batch} * {size})",
+                    f"for (size_t n; (n = fread(buffer.data(), {size}, {batch}, f));)"
+                    "\n    for (size_t i = 0; i < n; i++)"
+                    f"\n      memcpy(&v.emplace_back(), &buffer[i * {size}], {size})",
+                ],
+                vret="v",
+            ),
+            build_cfn(
+                "void",
+                f"{lower}WriteAll",
+                params=["FILE* f", f"const std::vector<{x}>& v"],
+                body=[
+                    f"std::vector<char> buffer({batch} * {size})",
+                    f"for (size_t i = 0; i < v.size(); i += {batch})\n  {{"
+                    f"\n    size_t n = std::min(v.size() - i, {batch});"
+                    "\n    for (size_t j = 0; j < n; j++)"
+                    f"\n      memcpy(&buffer[j * {size}], &v[i + j], {size});"
+                    f"\n    fwrite(buffer.data(), {size}, n, f);\n  }}",
+                ],
+            ),
+            build_cfn(
+                "bool",
+                f"{lower}Seek",
+                params=["FILE* f", "long n"],
+                vret=f"fseek(f, n * (long){size}, SEEK_SET) == 0",
+            ),
+            build_cfn(
+                "long",
+                f"{lower}Count",
+                params=["FILE* f"],
+                body=[
+                    "long pos = ftell(f)",
+                    "fseek(f, 0, SEEK_END)",
+                    "long end = ftell(f)",
+                    "fseek(f, pos, SEEK_SET)",
+                ],
+                vret=f"end / (long){size}",
+            ),
+        ]
+        return "".join(fns)
+
+    def collection(self) -> str:
+        """
+        Returns TColl, a contiguous, typed collection of T, and its functions:
+        TCollAdd, TCollReserve, TCollSize, TCollGetAt, TCollSetAt, TCollSort,
+        TCollFind and, for every field that can be compared, TCollSortBy[Field]
+        and TCollSearchBy[Field], a binary search. Unlike the course's Coll,
+        elements are never turned into strings and parsed back on each access.
+
+        >>> # TColl c{tReadAll(f)}; tCollSortByIdT(c); tCollSearchByIdT(c, 8)
+        """
+        x, lower = self.name, self.name.lower()
+        coll, fn = f"{x}Coll", f"{lower}Coll"
+        fns = [
+            f"struct {coll}\n{{\n  std::vector<{x}> items;\n}};\n",
+            build_cfn(
+                "int",
+                f"{fn}Add",
+                params=[f"{coll}& c", f"const {x}& x"],
+                body=["c.items.push_back(x)"],
+                vret="c.items.size() - 1",
+            ),
+            build_cfn(
+                "void",
+                f"{fn}Reserve",
+                params=[f"{coll}& c", "int n"],
+                body=["c.items.reserve(n)"],
+            ),
+            build_cfn(
+                "int", f"{fn}Size", params=[f"const {coll}& c"], vret="c.items.size()"
+            ),
+            build_cfn(
+                f"{x}&", f"{fn}GetAt", params=[f"{coll}& c", "int i"], vret="c.items[i]"
+            ),
+            build_cfn(
+                "void",
+                f"{fn}SetAt",
+                params=[f"{coll}& c", f"const {x}& x", "int i"],
+                body=["c.items[i] = x"],
+            ),
+            "template <typename Cmp>\n"
+            + build_cfn(
+                "void",
+                f"{fn}Sort",
+                params=[f"{coll}& c", "Cmp cmp"],
+                body=["std::sort(c.items.begin(), c.items.end(), cmp)"],
+            ),
+            "template <typename Pred>\n"
+            + build_cfn(
+                "int",
+                f"{fn}Find",
+                params=[f"const {coll}& c", "Pred pred"],
+                body=["auto it = std::find_if(c.items.begin(), c.items.end(), pred)"],
+                vret="it != c.items.end() ? int(it - c.items.begin()) : -1",
+            ),
+        ]
+        for field in self:
+            if (compare := field.comparison()) is None:
+                continue
+            key, less, equal = compare
+            by = field.name[0].upper() + field.name[1:]
+            fns.append(
+                build_cfn(
+                    "void",
+                    f"{fn}SortBy{by}",
+                    params=[f"{coll}& c"],
+                    body=[
+                        "std::sort(c.items.begin(), c.items.end(),"
+                        f" [](const {x}& a, const {x}& b) {{ return"
+                        f" {less(f'a.{field.name}', f'b.{field.name}')}; }})"
+                    ],
+                )
+            )
+            fns.append(
+                build_cfn(
+                    "int",
+                    f"{fn}SearchBy{by}",  # c has to be sorted by the field
+                    params=[f"const {coll}& c", f"{key} k"],
+                    body=[
+                        "auto it = std::lower_bound(c.items.begin(), c.items.end(),"
+                        f" k, [](const {x}& a, {key} k) {{ return"
+                        f" {less(f'a.{field.name}', 'k')}; }})"
+                    ],
+                    vret="it != c.items.end()"
+                    f" && {equal(f'it->{field.name}', 'k')}"
+                    " ? int(it - c.items.begin()) : -1",
+                )
+            )
+        return "".join(fns)
+
     def __str__(self) -> str:
         fns = [
             f"struct {self.name} ",
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+from glob import glob
+from os.path import commonpath
+from pathlib import Path
+from typing import Any, Final, Iterable, Optional
+
+import attr
+
+from ayed.exceptions import NoStructException
+from ayed.parser import Tokenizer
+from ayed.printer import CODEGEN_VERSION, StructPrinter
+from ayed.utils import console
+
+SUFFIXES: Final = (".c", ".cpp", ".h", ".hpp")
+MANIFEST: Final = ".coll-manifest.json"
+
+
+@attr.s(slots=True)
+class Header:
+    """A header to generate the functions of, and where they're written to"""
+
+    source: Path = attr.ib()
+    output: Path = attr.ib()
+    structs: Optional[list[str]] = attr.ib(default=None)
+    rebuilt: bool = attr.ib(default=False)
+    error: Optional[str] = attr.ib(default=None)
+    parsed: bool = attr.ib(default=False)  # False when it came from the manifest
+
+
+def expand(patterns: Iterable[str]) -> list[Path]:
+    """Files, directories (recursively) and globs to the C/C++ files they match"""
+    found: dict[Path, None] = {}  # keeps the order, without duplicates
+    for pattern in patterns:
+        path = Path(pattern)
+        matches = [path] if path.exists() else map(Path, glob(pattern, recursive=True))
+        for match in matches:
+            if match.is_dir():
+                files = sorted(p for p in match.rglob("*") if p.suffix in SUFFIXES)
+            else:
+                files = [match] if match.suffix in SUFFIXES else []
+            found.update(dict.fromkeys(p.resolve() for p in files))
+    return list(found)
+
+
+def plan(sources: list[Path], output_folder: Path) -> list[Header]:
+    """
+    Every source gets its own output, mirroring the folders the sources are
+    in, ex: structs/a/vuelos.hpp, structs/b/vuelos.hpp -> a/vuelos.hpp, ...
+
+    Sources that would share an output keep their suffix instead, ex:
+    vuelos.h, vuelos.cpp -> vuelos.h.hpp, vuelos.cpp.hpp
+    """
+    if not sources:
+        return []
+    root = Path(commonpath([source.parent for source in sources]))
+    relative = {source: source.relative_to(root) for source in sources}
+    outputs = {source: path.with_suffix(".hpp") for source, path in relative.items()}
+    while True:
+        taken: dict[Path, list[Path]] = {}
+        for source, output in outputs.items():
+            taken.setdefault(output, []).append(source)
+        clashes = [
+            source for same in taken.values() if len(same) > 1 for source in same
+        ]
+        if not clashes:
+            break
+        for source in clashes:  # eventually every output is unique this way
+            path = relative[source]
+            outputs[source] = path.with_name(f"{path.name}.hpp")
+    return [Header(source, output_folder / outputs[source]) for source in sources]
+
+
+def digest(source: Path, options: dict[str, Any]) -> str:
+    """Changes when the source or the generated code do"""
+    from ayed.cache import file_digest
+
+    settings = ",".join(f"{k}={v}" for k, v in sorted(options.items()))
+    return f"{CODEGEN_VERSION}:{settings}:{file_digest(source)}"
+
+
+def generate(header: Header, options: dict[str, Any]) -> Header:
+    """
+    Parses the source and writes its functions, `options` are passed on to
+    StructPrinter. Runs in worker processes.
+    """
+    try:
+        structs = Tokenizer.from_str(header.source.read_text(encoding="utf-8"))
+    except NoStructException as e:
+        return attr.evolve(header, error=str(e), parsed=True)
+    except UnicodeDecodeError as e:
+        error = f"{header.source.name} isn't UTF-8 ({e.reason} at byte {e.start})"
+        return attr.evolve(header, error=error, parsed=True)
+    except OSError as e:
+        return attr.evolve(header, error=str(e), parsed=True)
+    try:
+        header.output.parent.mkdir(parents=True, exist_ok=True)
+        with header.output.open("w", encoding="utf-8") as fh:
+            StructPrinter(structs, **options).write(fh)
+    except OSError as e:
+        return attr.evolve(header, error=str(e), parsed=True)
+    return attr.evolve(
+        header,
+        structs=[struct.name for struct in structs],
+        rebuilt=True,
+        error=None,
+        parsed=True,
+    )
+
+
+def coll(
+    patterns: Iterable[str],
+    output_folder: Path,
+    *,
+    jobs: int = 1,
+    force: bool = False,
+    **options: Any,
+) -> list[Header]:
+    """
+    Writes the functions of every struct in the files matched by `patterns`,
+    one header per file, parsing them in `jobs` processes. Files that didn't
+    change since their header was written (with the same `options`) are
+    skipped, unless `force`, and so are the ones that failed to parse: they
+    come back with the error they had then.
+    """
+    from functools import partial
+
+    from ayed.cache import Manifest
+
+    generated = output_folder.resolve()  # ex: ayed coll . writes into ./output_files
+    sources = [path for path in expand(patterns) if not path.is_relative_to(generated)]
+    headers = plan(sources, output_folder)
+    manifest = Manifest.load(output_folder / MANIFEST)
+    digests: dict[Path, str] = {}
+    for header in headers:
+        try:
+            digests[header.source] = digest(header.source, options)
+        except OSError as e:  # can't be read, let alone parsed
+            header.error, header.parsed = str(e), True
+            continue
+        header.error = manifest.error(str(header.source))
+    stale = [
+        header
+        for header in headers
+        if header.source in digests
+        and (
+            force
+            or not manifest.is_fresh(str(header.source), digests[header.source])
+            or not (header.error or header.output.exists())
+        )
+    ]
+    if jobs > 1 and len(stale) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with console.status(f"Parsing {len(stale)} files with {jobs} jobs..."):
+            with ProcessPoolExecutor(jobs) as pool:
+                done = list(pool.map(partial(generate, options=options), stale))
+    else:
+        done = [generate(header, options) for header in stale]
+    results = {header.source: header for header in done}
+    for header in done:
+        manifest.update(str(header.source), digests[header.source], header.error)
+    manifest.save()
+    return [results.get(header.source, header) for header in headers]
@@ -1,34 +1,135 @@
 from __future__ import annotations
 
+from collections import defaultdict
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator
 
 import attr
-from pandas import DataFrame, Series, isna, read_excel
+from openpyxl import load_workbook
+from pandas import DataFrame, Series, read_excel
 from regex import compile
 
 from ayed.classes import C_DTYPES, Variable
-from ayed.types import File, Files, PandasDF, PathLike, Sheet
+from ayed.profile import profiler
+from ayed.sources import convert_column
+from ayed.types import File, Files, PandasDF, Sheet
 from ayed.utils import console, sanitize_name
 
+if TYPE_CHECKING:
+    from ayed.cache import WorkbookCache
+
 char_array = compile(r"char\[(\d*)\]")
 
 
 @attr.s(slots=True)
 class Excel:
-    file_path: PathLike = attr.ib()
+    file_path: Path = attr.ib(converter=Path)
     sheet: str | None = attr.ib(default=None)
+    stream: bool = attr.ib(default=False)
+    cache: WorkbookCache | None = attr.ib(default=None, repr=False)
     df: PandasDF | None = attr.ib(default=None, init=False, repr=False)
 
-    def __attrs_post_init__(self) -> None:
-        if isinstance(self.file_path, str):
-            self.file_path = Path(self.file_path)
-        self.df = read_excel(self.file_path.absolute().as_uri(), sheet_name=self.sheet)
-
     def read(self) -> File | Files:
+        if self.cache is None or self.stream:  # iter_sheets caches each sheet
+            return self.__parse()
+        from ayed.cache import file_digest
+
+        entry = self.cache.entry(
+            file_digest(self.file_path), sheet=self.sheet, stream=self.stream
+        )
+        with profiler.stage("cache", file=self.file_path.name):
+            data = self.cache.get(entry)
+        if data is not None:
+            console.log(f"Using cached {self.file_path.name} 📦", justify="center")
+            return data
+        data = self.__parse()
+        self.cache.put(entry, data)
+        return data
+
+    def __parse(self) -> File | Files:
+        if self.stream:
+            with console.status("Parsing structs..."):
+                files = [{sanitize_name(name): f} for name, f in self.iter_sheets()]
+            return files if self.sheet is None else files[0].popitem()[1]
+        if self.df is None:
+            with profiler.stage("read_excel"):
+                self.df = read_excel(
+                    self.file_path.absolute().as_uri(), sheet_name=self.sheet
+                )
         if self.sheet is None:
             return self.__read_sheets()
         return self.__read_sheet()
 
+    def sheet_names(self) -> list[str]:
+        """Returns the names of the sheets that `read` would parse"""
+        if self.sheet is not None:
+            return [self.sheet]
+        wb = load_workbook(self.file_path, read_only=True)
+        try:
+            return wb.sheetnames
+        finally:
+            wb.close()
+
+    def iter_sheets(self) -> Iterator[tuple[str, File]]:
+        """
+        Streams the workbook with openpyxl's read-only mode, yielding
+        (sheet_name, File) one sheet at a time. Only `self.sheet` is loaded
+        when it's set, and only the cells that hold a value are kept.
+
+        With a cache, every sheet is cached on its own and the cached ones
+        aren't read from the workbook at all.
+        """
+        from ayed.cache import file_digest
+
+        cache = self.cache
+        digest = file_digest(self.file_path) if cache is not None else ""
+        wb = load_workbook(self.file_path, read_only=True, data_only=True)
+        try:
+            names = wb.sheetnames if self.sheet is None else [self.sheet]
+            for sheet_name in names:
+                if cache is None:
+                    yield sheet_name, self.__parse_sheet(wb, sheet_name)
+                    continue
+                entry = cache.entry(digest, sheet=sheet_name, stream=True)
+                file = cache.get(entry)
+                if isinstance(file, File):
+                    console.log(f"Using cached {sheet_name} 📦", justify="center")
+                else:
+                    file = self.__parse_sheet(wb, sheet_name)
+                    cache.put(entry, file)
+                yield sheet_name, file
+        finally:
+            wb.close()
+
+    def __parse_sheet(self, wb: Any, sheet_name: str) -> File:
+        file = File(filenames=[], structs=[], variables=[])
+        sheet = sanitize_name(sheet_name)
+        with profiler.stage("parse sheet", sheet=sheet) as span:
+            for column in self.__stream_columns(wb[sheet_name]):
+                span.rows = max(span.rows, len(column))
+                self.__read_column(file, Series(column, dtype=object))
+        self.__check_file(file, sheet_name)
+        return file
+
+    @staticmethod
+    def __stream_columns(ws: Any) -> list[list[Any]]:
+        """Turns a row-major worksheet into its non-empty columns, left to right."""
+        columns: defaultdict[int, list[Any]] = defaultdict(list)
+        for row in ws.iter_rows(values_only=True):
+            for i, value in enumerate(row):
+                if value is not None:
+                    columns[i].append(value)
+        return [columns[i] for i in sorted(columns)]
+
+    @staticmethod
+    def __check_file(file: File, sheet_name: str) -> None:
+        if len(file.filenames) != len(file.structs):
+            raise AssertionError(f"{len(file.filenames)=} != {len(file.structs)=}")
+        console.log(
+            f"Found {len(file.structs)} structs in {sheet_name} 🙉",
+            justify="center",
+        )
+
     def __read_sheets(self) -> Files:
         files = []
         if not (isinstance(self.df, dict) or self.df):
@@ -37,16 +138,12 @@ class Excel:
             for sheet_name, data in self.df.items():
                 data = data.dropna(axis="columns", how="all")
                 file = File(filenames=[], structs=[], variables=[])
-                self.__read_sheet(file=file, df=data)
+                with profiler.stage(
+                    "parse sheet", sheet=sanitize_name(sheet_name), rows=len(data)
+                ):
+                    self.__read_sheet(file=file, df=data)
                 files.append({sanitize_name(sheet_name): file})  # type: ignore
-                if len(file.filenames) != len(file.structs):
-                    raise AssertionError(
-                        f"{len(file.filenames)=} != {len(file.structs)=}"
-                    )
-                console.log(
-                    f"Found {len(file.structs)} structs in {sheet_name} 🙉",
-                    justify="center",
-                )
+                self.__check_file(file, sheet_name)
             return files
 
     def __read_sheet(
@@ -56,7 +153,10 @@ class Excel:
         file: File | None = None,
     ) -> File:
         if df is None:
-            df = self.df  # type: ignore
+            sheet = sanitize_name(self.sheet or "")
+            rows = len(self.df) if self.df is not None else 0
+            with profiler.stage("parse sheet", sheet=sheet, rows=rows):
+                return self.__read_sheet(df=self.df, file=file)  # type: ignore
         if not isinstance(df, (DataFrame, Series)):
             raise ValueError("You should probably use read_sheets")
         df = df.dropna(axis="columns", how="all")
@@ -65,30 +165,40 @@ class Excel:
         for (_, content) in df.items():
             if content.empty:
                 continue
-            var = Variable(type="", name="", ctype=None)
-            for item in content.values:
-                if isna(item):
-                    continue
-                if isinstance(item, str):
-                    item = item.strip()  # sometimes items have spaces and such
-                    if item.startswith("struct"):
-                        _, struct = item.split()
-                        file.structs.append(struct)
-                        continue
-                    if item.endswith(".dat"):
-                        file.filenames.append(item)
-                        continue
-                    if var.type and not var.name:
-                        var.name = item
-                        continue
-                    if (c := char_array.match(item)) or item in C_DTYPES:
-                        var.type = item.split("[")[0]
-                        var.ctype = int(c[1]) if c else None
-                        continue
-                var.struct_id = len(file.structs) - 1
-                var.file_id = len(file.filenames) - 1
-                var.data.append(
-                    item if not var.ctype else item.ljust(var.ctype).encode("utf-8")
-                )
-            file.variables.append(var)
+            self.__read_column(file, content)
         return file
+
+    @staticmethod
+    def __read_column(file: File, values: Series) -> None:
+        """
+        Reads a column: the header cells (.dat filename, struct name, type and
+        variable name) are classified one by one, everything below the
+        variable name is data and gets converted in bulk.
+        """
+        values = values.dropna()
+        var = Variable(type="", name="", ctype=None)
+        header = 0
+        for item in values:
+            if var.name or not isinstance(item, str):
+                break
+            header += 1
+            item = item.strip()  # sometimes items have spaces and such
+            if item.startswith("struct"):
+                _, struct = item.split()
+                file.structs.append(struct)
+            elif item.endswith(".dat"):
+                file.filenames.append(item)
+            elif var.type:
+                var.name = item
+            elif (c := char_array.match(item)) or item in C_DTYPES:
+                var.type = item.split("[")[0]
+                var.ctype = int(c[1]) if c else None
+            else:  # not a header after all
+                header -= 1
+                break
+        data = values.iloc[header:]
+        if not data.empty:
+            var.struct_id = len(file.structs) - 1
+            var.file_id = len(file.filenames) - 1
+            var.data = convert_column(var, data)
+        file.add(var)
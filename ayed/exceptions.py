@@ -15,3 +15,19 @@ class ReadSheetException(Exception):
 
     def __str__(self) -> str:
         return self.message
+
+
+@dataclass
+class IndexFileException(Exception):
+    message: str
+
+    def __str__(self) -> str:
+        return self.message
+
+
+@dataclass
+class SourceException(Exception):
+    message: str
+
+    def __str__(self) -> str:
+        return self.message
@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+class Format(str, Enum):
+    """How records and summaries are output, see ayed.output.Output"""
+
+    rich = "rich"
+    json = "json"
+    csv = "csv"
+    ndjson = "ndjson"
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from math import gcd, ulp
+from pathlib import Path
+from random import Random
+from string import ascii_lowercase
+from struct import calcsize
+from typing import Any, Callable, Final, Iterable, Iterator, Optional, Union
+
+import attr
+
+from ayed.classes import Struct, Variable
+from ayed.reader import Record
+from ayed.sort import write_records
+
+Number = Union[int, float]
+Column = Callable[[int, int], list[Any]]  # (first row, rows) -> values
+
+# records are generated (and packed) this many at a time
+CHUNK_ROWS: Final = 8192
+# default ranges, numbers anyone would type into the excel
+INT_RANGE: Final = (0, 999_999)
+FLOAT_RANGE: Final = (0.0, 1000.0)
+MANTISSA_BITS: Final = {"e": 10, "f": 23, "d": 52}
+
+
+def int_bounds(fmt: str) -> tuple[int, int]:
+    """The values a C integer of format `fmt` can hold, ex: B -> (0, 255)"""
+    bits = calcsize(fmt) * 8
+    if fmt.islower():
+        return -(2 ** (bits - 1)), 2 ** (bits - 1) - 1
+    return 0, 2**bits - 1
+
+
+def float_ulp(fmt: str, value: float) -> float:
+    """The gap between `value` and the next float of format `fmt` (e, f or d)"""
+    return ulp(value) * 2 ** (52 - MANTISSA_BITS[fmt])
+
+
+def parse_range(value: str) -> tuple[str, tuple[Number, Number]]:
+    """Parses FIELD=MIN:MAX, both ends included"""
+    name, sep, bounds = value.partition("=")
+    lo, colon, hi = bounds.partition(":")
+    if not (name and sep and colon):
+        raise ValueError(f"{value!r} should look like FIELD=MIN:MAX")
+    number = float if "." in bounds or "e" in bounds.lower() else int
+    start, stop = number(lo), number(hi)
+    if start > stop:
+        raise ValueError(f"{value!r}: MIN is bigger than MAX")
+    return name, (start, stop)
+
+
+def field_names(names: Iterable[str]) -> frozenset[str]:
+    """The converter of Generator.unique, typed so mypy knows what it takes"""
+    return frozenset(names)
+
+
+@attr.s(slots=True)
+class Generator:
+    """
+    Generates `rows` random records for `struct`, a chunk at a time, so that
+    any amount of them can be written without holding them in memory. The
+    same `seed` always generates the same records.
+
+    `ranges` bounds numeric fields (both ends included) and every field in
+    `unique` gets distinct values: a random permutation of its range, so
+    uniqueness doesn't need to remember what was already generated either.
+
+    >>> Generator(vuelo, 10_000_000, seed=1, unique={"idVue"}).write(path)
+    """
+
+    struct: Struct = attr.ib()
+    rows: int = attr.ib()
+    seed: Optional[int] = attr.ib(default=None)
+    ranges: dict[str, tuple[Number, Number]] = attr.ib(factory=dict)
+    unique: frozenset[str] = attr.ib(factory=frozenset, converter=field_names)
+    _rand: Random = attr.ib(init=False, repr=False)
+
+    def __attrs_post_init__(self) -> None:
+        self._rand = Random(self.seed)
+        for name in (*self.ranges, *self.unique):
+            self.struct.field(name)  # raises KeyError on unknown fields
+        for field in self.struct:  # bad ranges raise before writing anything
+            self._column(field)
+
+    def records(self) -> Iterator[Record]:
+        """Yields the records, generating CHUNK_ROWS of them at a time"""
+        self._rand.seed(self.seed)
+        columns = [self._column(field) for field in self.struct]
+        for start in range(0, self.rows, CHUNK_ROWS):
+            n = min(CHUNK_ROWS, self.rows - start)
+            yield from zip(*(column(start, n) for column in columns))
+
+    def write(self, path: Path) -> int:
+        """Writes the records to `path`, returns how many it wrote"""
+        return write_records(path, self.struct.cstruct, self.records())
+
+    def _column(self, field: Variable) -> Column:
+        fmt, unique = field.format_character(), field.name in self.unique
+        rand = self._rand
+        if fmt[-1] == "s" or fmt == "c":
+            if field.name in self.ranges:
+                raise ValueError(f"{field.name} isn't numeric, it can't have a range")
+            width = calcsize(fmt)
+            if unique:
+                return self._unique_strings(field.name, width)
+
+            def words(start: int, n: int) -> list[Any]:
+                return [
+                    "".join(rand.choices(ascii_lowercase, k=rand.randint(1, width)))
+                    .ljust(width)
+                    .encode("utf-8")
+                    for _ in range(n)
+                ]
+
+            return words
+        if fmt in "efd":
+            lo, hi = self.ranges.get(field.name, FLOAT_RANGE)
+            if unique:
+                step = (hi - lo) / max(self.rows - 1, 1)
+                # values closer than the precision of the field would collide
+                if self.rows > 1 and step <= float_ulp(fmt, max(abs(lo), abs(hi))):
+                    raise ValueError(
+                        f"{field.name} can't have {self.rows} unique values"
+                        f" in [{lo}, {hi}]"
+                    )
+                permuted = self._permutation(field.name, self.rows)
+                return lambda start, n: [lo + i * step for i in permuted(start, n)]
+            return lambda start, n: [round(rand.uniform(lo, hi), 2) for _ in range(n)]
+        lo, hi = self._int_range(field.name, fmt)
+        if unique:
+            permuted = self._permutation(field.name, hi - lo + 1)
+            return lambda start, n: [lo + i for i in permuted(start, n)]
+        return lambda start, n: [rand.randint(lo, hi) for _ in range(n)]
+
+    def _int_range(self, name: str, fmt: str) -> tuple[int, int]:
+        low, high = int_bounds(fmt)
+        default = max(low, INT_RANGE[0]), min(high, INT_RANGE[1])
+        lo, hi = self.ranges.get(name, default)
+        if not (low <= lo and hi <= high) or int(lo) != lo or int(hi) != hi:
+            raise ValueError(f"{name} can only hold integers in [{low}, {high}]")
+        return int(lo), int(hi)
+
+    def _permutation(self, name: str, size: int) -> Column:
+        """
+        Maps row i to (a * i + b) % size, a permutation of [0, size) since a
+        and size are coprime, then shuffles each chunk so that consecutive
+        records don't look like a progression. Needs as many values as rows.
+        """
+        if size < self.rows:
+            raise ValueError(
+                f"{name} can't have {self.rows} unique values, it only has {size}"
+            )
+        rand = self._rand
+        a = rand.randrange(1, size) if size > 1 else 1
+        while gcd(a, size) != 1:
+            a = rand.randrange(1, size)
+        b = rand.randrange(size)
+
+        def permuted(start: int, n: int) -> list[int]:
+            values = [(a * i + b) % size for i in range(start, start + n)]
+            rand.shuffle(values)
+            return values
+
+        return permuted
+
+    def _unique_strings(self, name: str, width: int) -> Column:
+        """Distinct strings: a unique number written with `width` digits"""
+        permuted = self._permutation(name, 10**width)
+        return lambda start, n: [
+            str(i).zfill(width).encode("utf-8") for i in permuted(start, n)
+        ]
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import json
+from bisect import bisect_left, bisect_right
+from mmap import ACCESS_READ, mmap
+from pathlib import Path
+from struct import Struct as CStruct
+from tempfile import TemporaryDirectory
+from typing import IO, Any, Final, Optional
+
+import attr
+
+from ayed.classes import Struct
+from ayed.exceptions import IndexFileException
+from ayed.reader import Record, RecordReader
+from ayed.sort import (
+    DEFAULT_MEMORY,
+    FIELD_OVERHEAD,
+    RECORD_OVERHEAD,
+    dump_records,
+    merge_runs,
+    sorted_runs,
+)
+
+MAGIC: Final = b"AYEDIDX1"
+HEADER: Final = CStruct("<8sI")  # magic, length of the json header
+
+
+def index_path(path: Path) -> Path:
+    """VUELOS.dat -> VUELOS.dat.idx"""
+    return path.with_name(path.name + ".idx")
+
+
+def key_format(fmt: str) -> str:
+    """
+    Index keys are stored with standard sizes, so every integer becomes a
+    64 bit one and every float a double. char[n] keys stay as they are.
+    """
+    if fmt[-1] in "sc":
+        return fmt if fmt[-1] == "s" else "1s"
+    if fmt in "efd":
+        return "d"
+    return "q" if fmt.islower() else "Q"
+
+
+def normalize_key(value: Any, fmt: str) -> Any:
+    """Makes stored and looked up keys comparable, ex: b'Miami   ' -> b'Miami'"""
+    if fmt[-1] == "s":
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        return value.rstrip(b" \x00")
+    if fmt == "d":
+        return float(value)
+    return int(value)
+
+
+def build_index(
+    path: Path,
+    struct: Struct,
+    key: str,
+    *,
+    memory: int = DEFAULT_MEMORY,
+    tmp_dir: Optional[Path] = None,
+) -> Path:
+    """
+    Builds a sorted (key, offset) index of the `key` field of the records in
+    `path` and writes it next to it, returns the path of the index. The
+    entries are sorted like `ayed sort` sorts records, in runs that fit in
+    `memory` which are then merged into the index.
+    """
+    position, field = struct.field(key)
+    kfmt = key_format(field.format_character())
+    entry = CStruct("<" + kfmt + "Q")
+    # an entry is a (key, offset) tuple while it's sorted
+    per_run = max(1, memory // (entry.size + RECORD_OVERHEAD + 2 * FIELD_OVERHEAD))
+    stat = path.stat()
+    idx = index_path(path)
+    with TemporaryDirectory(prefix="ayed-index-", dir=tmp_dir) as tmp:
+        with RecordReader(path, struct) as records:
+            count = len(records)
+            entries = (
+                (normalize_key(record[position], kfmt), i * struct.size)
+                for i, record in enumerate(records)
+            )
+            runs = sorted_runs(entries, entry, per_run, Path(tmp))
+        header = json.dumps(
+            {
+                "struct": struct.name,
+                "format": struct.cstruct.format,
+                "fields": [field.name for field in struct],
+                "key": key,
+                "key_format": kfmt,
+                "records": count,
+                "dat_size": stat.st_size,
+                "dat_mtime_ns": stat.st_mtime_ns,
+            }
+        ).encode("utf-8")
+        with idx.open("wb") as fh:
+            fh.write(HEADER.pack(MAGIC, len(header)))
+            fh.write(header)
+            dump_records(fh, entry, merge_runs(runs, entry, memory, Path(tmp)))
+    return idx
+
+
+class _Keys:
+    """Lazy sequence over the keys of an mmapped index, for bisect"""
+
+    __slots__ = ("index",)
+
+    def __init__(self, index: "Index") -> None:
+        self.index = index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, i: int) -> Any:
+        return self.index.entry(i)[0]
+
+
+@attr.s(slots=True)
+class Index:
+    """
+    A sorted index of a .dat file built by `build_index`. Both the index and
+    the .dat file are memory-mapped, lookups are a binary search over the
+    index followed by reading only the matching records.
+
+    >>> with Index(Path("VUELOS.dat")) as vuelos:
+    ...     vuelos.lookup("4")
+    """
+
+    dat: Path = attr.ib(converter=Path)
+    header: dict[str, Any] = attr.ib(factory=dict, init=False, repr=False)
+    struct: Optional[CStruct] = attr.ib(default=None, init=False, repr=False)
+    _entry: Optional[CStruct] = attr.ib(default=None, init=False, repr=False)
+    _start: int = attr.ib(default=0, init=False, repr=False)
+    _fh: Optional[IO[bytes]] = attr.ib(default=None, init=False, repr=False)
+    _mm: Optional[mmap] = attr.ib(default=None, init=False, repr=False)
+
+    def open(self) -> "Index":
+        idx = index_path(self.dat)
+        if not idx.exists():
+            raise IndexFileException(
+                f"{self.dat.name} has no index, build it with `ayed index`."
+            )
+        self._fh = idx.open("rb")
+        try:
+            self.__load(idx)
+        except BaseException:
+            self.close()
+            raise
+        return self
+
+    def __load(self, idx: Path) -> None:
+        assert self._fh is not None
+        magic, length = HEADER.unpack(self._fh.read(HEADER.size))
+        if magic != MAGIC:
+            raise IndexFileException(f"{idx.name} isn't an ayed index.")
+        self.header = json.loads(self._fh.read(length))
+        stat = self.dat.stat()
+        if (stat.st_size, stat.st_mtime_ns) != (
+            self.header["dat_size"],
+            self.header["dat_mtime_ns"],
+        ):
+            raise IndexFileException(
+                f"{self.dat.name} changed since {idx.name} was built, rebuild it."
+            )
+        self._start = HEADER.size + length
+        self._entry = CStruct("<" + self.header["key_format"] + "Q")
+        self.struct = CStruct(self.header["format"])
+        if self.header["records"]:
+            self._mm = mmap(self._fh.fileno(), 0, access=ACCESS_READ)
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def __enter__(self) -> "Index":
+        return self.open()
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.header.get("records", 0)
+
+    @property
+    def fields(self) -> list[str]:
+        return self.header["fields"]
+
+    def entry(self, i: int) -> tuple[Any, int]:
+        """Returns the i-th (key, offset) pair of the index"""
+        assert self._entry is not None and self._mm is not None
+        key, offset = self._entry.unpack_from(
+            self._mm, self._start + i * self._entry.size
+        )
+        return normalize_key(key, self.header["key_format"]), offset
+
+    def find(self, value: Any) -> list[int]:
+        """Returns the offsets of the records whose key equals `value`"""
+        if not len(self):
+            return []
+        value = normalize_key(value, self.header["key_format"])
+        keys = _Keys(self)
+        lo = bisect_left(keys, value)  # type: ignore
+        hi = bisect_right(keys, value, lo)  # type: ignore
+        return [self.entry(i)[1] for i in range(lo, hi)]
+
+    def lookup(self, value: Any) -> list[tuple[int, Record]]:
+        """Returns (record number, record) for every record whose key is `value`"""
+        assert self.struct is not None
+        offsets = self.find(value)
+        if not offsets:
+            return []
+        with self.dat.open("rb") as dat:
+            with mmap(dat.fileno(), 0, access=ACCESS_READ) as mm:
+                return [
+                    (offset // self.struct.size, self.struct.unpack_from(mm, offset))
+                    for offset in offsets
+                ]
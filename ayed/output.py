@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import sys
+from itertools import count
+from typing import Any, Iterable, Optional, Sequence, TextIO
+
+import attr
+
+from ayed.formats import Format
+from ayed.utils import PAGE_SIZE, console, render_records
+
+
+def to_json_value(value: Any) -> Any:
+    """char[n] fields are decoded, everything else is already json-friendly"""
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace").rstrip(" \x00")
+    return value
+
+
+@attr.s(slots=True)
+class Output:
+    """
+    Where decoded records and run summaries go. `rich` renders tables to the
+    console, every other format is streamed to `stream` (stdout by default)
+    as is, without building any rich Table, and silences the console.
+    """
+
+    format: Format = attr.ib(default=Format.rich, converter=Format)
+    stream: TextIO = attr.ib(factory=lambda: sys.stdout, repr=False)
+    _items: int = attr.ib(default=0, init=False, repr=False)
+    _quiet: Optional[bool] = attr.ib(default=None, init=False, repr=False)
+
+    @property
+    def machine(self) -> bool:
+        return self.format is not Format.rich
+
+    def use(self, format: Format, stream: Optional[TextIO] = None) -> None:
+        """
+        Switches to `format`, quieting the console for machine formats until
+        the output is closed
+        """
+        self.format = Format(format)
+        self.stream = stream or sys.stdout
+        self._items = 0
+        if self._quiet is None:
+            self._quiet = console.quiet
+        console.quiet = self.machine or self._quiet
+
+    def records(
+        self,
+        name: str,
+        columns: Sequence[str],
+        records: Iterable[Sequence[Any]],
+        *,
+        title: Optional[str] = None,
+        start: int = 0,
+        index: Optional[Iterable[int]] = None,
+        page_size: int = PAGE_SIZE,
+    ) -> None:
+        """
+        Outputs the decoded `records` of the file `name`, numbered from `start`
+        or by `index` if given.
+        """
+        if self.format is Format.rich:
+            render_records(
+                title or name,
+                columns=columns,
+                records=records,
+                start=start,
+                index=index,
+                page_size=page_size,
+            )
+            return
+        numbered = zip(index or count(start), records)
+        if self.format is Format.csv:
+            self._csv_block(
+                ["file", "#", *columns],
+                ([name, i, *map(to_json_value, record)] for i, record in numbered),
+            )
+            return
+        for i, record in numbered:
+            data = dict(zip(columns, map(to_json_value, record)))
+            self._json({"type": "record", "file": name, "index": i, "data": data})
+
+    def summary(self, command: str, **fields: Any) -> None:
+        """Outputs a summary of what `command` did. Only for machine formats"""
+        if self.format is Format.rich:
+            return
+        if self.format is Format.csv:
+            from json import dumps
+
+            values = [
+                dumps(v, ensure_ascii=False) if isinstance(v, (list, dict)) else v
+                for v in fields.values()
+            ]
+            self._csv_block(["command", *fields], [[command, *values]])
+            return
+        self._json({"type": "summary", "command": command, **fields})
+
+    def close(self) -> None:
+        """
+        Finishes the output, closing the json array if one was started, and
+        lets the console log as it did before `use`
+        """
+        if self.format is Format.json:
+            self.stream.write("[]\n" if not self._items else "\n]\n")
+        self.stream.flush()
+        self._items = 0
+        if self._quiet is not None:
+            console.quiet, self._quiet = self._quiet, None
+
+    def _json(self, item: dict[str, Any]) -> None:
+        from json import dumps
+
+        line = dumps(item, ensure_ascii=False, default=str)
+        if self.format is Format.json:
+            line = ("[\n" if not self._items else ",\n") + line
+        else:
+            line += "\n"
+        self.stream.write(line)
+        self._items += 1
+
+    def _csv_block(self, header: list[Any], rows: Iterable[list[Any]]) -> None:
+        """Writes a header and its rows, blocks are separated by a blank line"""
+        from csv import writer
+
+        if self._items:
+            self.stream.write("\n")
+        out = writer(self.stream, lineterminator="\n")
+        out.writerow(header)
+        out.writerows(rows)
+        self._items += 1
+
+
+output = Output()
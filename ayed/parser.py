@@ -1,60 +1,314 @@
 from __future__ import annotations
 
 from pathlib import Path
-from re import compile as rcompile
-from typing import Any, Pattern
+from re import DOTALL, findall
+from typing import Final, Optional
 
 from ayed.classes import Struct, Variable
 from ayed.types import Structs
 from ayed.exceptions import NoStructException
 
+# Comments and preprocessor lines match without a group, so findall returns
+# them as "" along with the tokens: names (std::string too), numbers,
+# literals and single characters. Whitespace is skipped by the search itself.
+# It's compiled (and cached by re) on first use, not on every import.
+TOKENS: Final = (
+    r"//[^\n]*|/\*.*?\*/|#(?:\\\n|[^\n])*"
+    r"|((?:::)?[A-Za-z_]\w*(?:\s*::\s*[A-Za-z_]\w*)*"
+    r"|\d\w*"
+    r"|\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'"
+    r"|\S)"
+)
+# words that make up multi-word types, ex: unsigned long long int
+BUILTINS: Final = frozenset(
+    ("signed", "unsigned", "short", "long", "int", "char", "float", "double")
+)
+QUALIFIERS: Final = frozenset(("const", "volatile", "mutable", "inline"))
+SKIPPED: Final = frozenset(("static", "typedef", "using", "friend", "template"))
+# members of these types share (or pick) their bits, so they have no layout
+UNSUPPORTED: Final = frozenset(("union", "enum"))
+KEYWORDS: Final = SKIPPED | QUALIFIERS | UNSUPPORTED | {"struct"}
+ACCESS: Final = frozenset(("public", "private", "protected"))
+OPENING: Final = {"(": ")", "[": "]", "{": "}"}
+# types that are written down under another name, the one classes.py knows
+ALIASES: Final = {"std::string": "string"}
+
+
+def tokenize(code: str) -> list[str]:
+    """Splits C/C++ source into tokens, dropping whitespace and comments"""
+    return [
+        # std :: string -> std::string
+        "".join(token.split()) if "::" in token and token[0] != '"' else token
+        for token in findall(TOKENS, code, DOTALL)
+        if token
+    ]
+
 
 class Tokenizer:
-    """Struct tokenizer"""
-
-    nfields: Pattern = rcompile(
-        r"struct (?P<struct>\w+)\s*{|\s*"  # struct name
-        r"(?P<type>[char|signed char|unsigned char|short|short int|signed short|signed"
-        r"short int|unsigned short|unsigned short int|int|signed|signed int|unsigned|"
-        r"unsigned int|long|long int|signed long|signed long int|unsigned long|unsigned"
-        r" long int|long long|long long int|signed long long|signed long long int|"
-        r"unsigned long long|unsigned long long int|float|double|long double|\w]+)\s"
-        r"(?P<identifier>\w+)(?P<cstr>\[\d*\])?;\s*?|(?P<ENDLINE>};)*"
-    )
-    char_array: Pattern = rcompile(r"\[(\d*)\]")
+    """
+    Struct tokenizer: a lexer (`tokenize`) plus a recursive descent parser
+    over its tokens. Every struct definition in the source is returned, the
+    nested ones right before the struct that holds them, and everything else
+    (functions, includes, globals) is skipped.
+    """
 
-    @staticmethod
-    def __build(lines: str) -> Structs:
-        tokens: Structs = []
-        struct: dict[str, Any] = {"name": "", "fields": []}
-        fields: list[tuple[str, str, str, str, str]] = Tokenizer.nfields.findall(lines)
-        for (sname, ttype, vname, ctype, endl) in fields:
-            if endl:
-                tokens.append(Struct(**struct))
-                struct["fields"] = []
-                continue
-            if not any([sname, ttype, vname, ctype]):
-                continue
-            if sname:
-                struct["name"] = sname.strip()
-                continue
-            is_ctype = Tokenizer.char_array.match(ctype.strip())
-            ctype = int(is_ctype[1]) if is_ctype else 0
-            struct["fields"].append(Variable(ttype.strip(), vname.strip(), ctype=ctype))
-        if not struct["name"]:
+    __slots__ = ("tokens", "pos", "structs")
+
+    def __init__(self, code: str) -> None:
+        # the trailing "" mark the end, so peeking never goes out of range
+        self.tokens = tokenize(code) + ["", ""]
+        self.pos = 0
+        self.structs: Structs = []
+
+    def parse(self) -> Structs:
+        tokens = self.tokens
+        while True:
+            try:  # jumps over everything that isn't a struct at once
+                self.pos = tokens.index("struct", self.pos) + 1
+            except ValueError:
+                break
+            if self.__peek() == "{":  # typedef struct { ... } Name;
+                self.pos += 1
+                fields = self.__fields()
+                names = self.__names()
+                self.__add(names[0] if names else "", fields)
+            elif self.__peek(1) in ("{", ":"):  # struct Name [: Base] {
+                name = self.__next()
+                while self.__next() != "{":
+                    continue
+                self.__add(name, self.__fields())
+        if not self.structs:
             raise NoStructException(
                 "Couldn't find a struct to parse."
                 " Make sure the struct is well formatted."
             )
-        return tokens
+        return self.structs
+
+    def __add(self, name: str, fields: list[Variable]) -> Struct:
+        struct = Struct(name=name or f"Struct{len(self.structs)}", fields=fields)
+        self.structs.append(struct)
+        return struct
+
+    def __peek(self, ahead: int = 0) -> str:
+        return self.tokens[self.pos + ahead]
+
+    def __next(self) -> str:
+        token = self.tokens[self.pos]
+        if not token:
+            raise NoStructException("Unexpected end of file, is a '}' missing?")
+        self.pos += 1
+        return token
+
+    def __close(self, opening: str) -> None:
+        """Skips everything up to the bracket that closes `opening`"""
+        depth = 1
+        while depth:
+            token = self.__next()
+            if token == opening:
+                depth += 1
+            elif token == OPENING[opening]:
+                depth -= 1
+
+    def __statement(self) -> None:
+        """Skips a statement: up to a ; or a {body}, ex: a method definition"""
+        while (token := self.__next()) != ";":
+            if token in ("(", "["):
+                self.__close(token)
+            elif token == "{":
+                self.__close(token)
+                if self.__peek() == ";":
+                    self.pos += 1
+                return
+
+    def __fields(self) -> list[Variable]:
+        """Parses the members of a struct, from its '{' up to its '}'"""
+        fields: list[Variable] = []
+        tokens = self.tokens
+        while (token := tokens[self.pos]) != "}":
+            if not token:
+                raise NoStructException("Unexpected end of file, is a '}' missing?")
+            name, end = tokens[self.pos + 1], tokens[self.pos + 2]
+            if end == ";" and name.isidentifier() and token.isidentifier():
+                if token not in KEYWORDS:  # the usual `type name;`
+                    fields.append(Variable(ALIASES.get(token, token), name))
+                    self.pos += 3
+                    continue
+            if token == ";":
+                self.pos += 1
+            elif token in SKIPPED:  # static members aren't part of the record
+                self.__statement()
+            elif token in ACCESS and tokens[self.pos + 1] == ":":  # public:
+                self.pos += 2
+            else:
+                fields.extend(self.__member())
+        self.pos += 1
+        return fields
+
+    def __names(self) -> list[str]:
+        """The names after a struct's closing brace, ex: } Name; or } a, b;"""
+        names = []
+        while (token := self.__next()) != ";":
+            if token not in ("*", ",") and token not in QUALIFIERS:
+                names.append(token)
+        return names
+
+    def __member(self) -> list[Variable]:
+        """Parses a member declaration, ex: unsigned long a, b[10];"""
+        while self.tokens[self.pos] in QUALIFIERS:
+            self.pos += 1
+        if self.tokens[self.pos] == "struct":
+            self.pos += 1
+            if "{" in (self.__peek(), self.__peek(1)):
+                return self.__nested()
+        elif self.tokens[self.pos] in UNSUPPORTED:
+            return self.__unsupported()
+        return self.__declarators(self.__type())
+
+    def __nested(self) -> list[Variable]:
+        """struct Inner { ... } a, b; inside of another struct"""
+        name = "" if self.__peek() == "{" else self.__next()
+        self.pos += 1
+        fields = self.__fields()
+        if self.__peek() == ";":  # only a definition, no fields of its type
+            self.pos += 1
+            self.__add(name, fields)
+            return []
+        if not name:  # struct { ... } pos; -> struct Pos
+            name = self.__peek().capitalize()
+        return self.__declarators(self.__add(name, fields).name)
+
+    def __unsupported(self) -> list[Variable]:
+        """Skips union and enum definitions, their fields can't be laid out"""
+        kind, words = self.__next(), []
+        while (token := self.__next()) not in ("{", ";"):
+            words.append(token)
+        if token == "{":  # enum [class] Color [: int] { ... } [c];
+            self.__close("{")
+            names = self.__names()
+            if not names and not words and kind == "union":
+                names = ["(anonymous)"]  # its members are the struct's
+        elif ":" in words:  # enum class Color : int;
+            names = []
+        else:  # enum Color c; but not enum Color;
+            names = [word for word in words[1:] if word.isidentifier()]
+        if not names:  # only a definition, no fields of its type
+            return []
+        raise NoStructException(
+            f"Can't lay out the {kind} field {names[0]}, only structs, numbers,"
+            " strings and char[N] arrays are supported."
+        )
+
+    def __type(self) -> str:
+        tokens, start = self.tokens, self.pos
+        while tokens[self.pos] in BUILTINS:
+            self.pos += 1
+        if self.pos > start + 1:
+            ctype = " ".join(tokens[start : self.pos])
+        else:
+            ctype = self.__next() if self.pos == start else tokens[start]
+            if tokens[self.pos] == "<":  # templates, ex: std::vector<int>
+                ctype += self.__template()
+        while tokens[self.pos] in QUALIFIERS:
+            self.pos += 1
+        return ALIASES.get(ctype, ctype)
+
+    def __template(self) -> str:
+        depth, parts = 0, []
+        while True:
+            token = self.__next()
+            parts.append(token)
+            depth += {"<": 1, ">": -1}.get(token, 0)
+            if not depth:
+                return "".join(parts)
+
+    def __declarators(self, ctype: str) -> list[Variable]:
+        """Parses `name[size] = value, ...;` after a member's type"""
+        variables: list[Variable] = []
+        tokens = self.tokens
+        while True:
+            pos, pointer = self.pos, ""
+            while tokens[pos] in ("*", "&"):
+                pointer += tokens[pos]
+                pos += 1
+            name, after = tokens[pos], tokens[pos + 1]
+            if not name:
+                raise NoStructException("Unexpected end of file, is a ';' missing?")
+            if name == "(" or after == "(":  # a constructor or a method
+                self.pos = pos
+                self.__statement()
+                return variables
+            self.pos, size, dims = pos + 1, 0, 0
+            while after == "[":
+                self.pos, dims = self.pos + 1, dims + 1
+                if (dim := self.__next()) != "]":
+                    size = size or self.__size(name, dim)
+                    self.__close("[")
+                after = tokens[self.pos]
+            vtype = f"{ctype} {pointer}" if pointer else ctype
+            if ":" in (name, after):
+                raise NoStructException(
+                    f"Can't lay out the bitfield {vtype} {name.strip(':')}:N,"
+                    " declare it without its width."
+                )
+            if dims and (vtype != "char" or dims > 1 or not size):
+                # char[N] is the only array there's code (and a layout) for
+                raise NoStructException(
+                    f"Can't lay out {vtype} {name}[], only char[N] arrays (with"
+                    " a size and a single dimension) are supported."
+                )
+            variables.append(Variable(vtype, name, ctype=size))
+            if after not in (",", ";"):  # default values
+                self.__default()
+            if self.__next() == ";":
+                return variables
+
+    @staticmethod
+    def __size(name: str, dim: str) -> int:
+        for base in (0, 8):  # 20, 0x14, 0o24 and C's octal 024
+            try:
+                return int(dim, base)
+            except ValueError:
+                continue
+        raise NoStructException(
+            f"Couldn't tell the size of {name}[{dim}], use a number instead."
+        )
+
+    def __default(self) -> None:
+        """Skips `= value` or `{value}` up to the next , or ;"""
+        while (token := self.__peek()) not in (",", ";"):
+            self.pos += 1
+            if token in OPENING:
+                self.__close(token)
+            elif not token:
+                raise NoStructException("Unexpected end of file, is a ';' missing?")
 
     @classmethod
     def from_str(cls, code: str) -> Structs:
-        tokens = cls.__build(code)
-        return tokens
+        return cls(code).parse()
 
     @classmethod
     def from_path(cls, path: Path) -> Structs:
         with path.open() as fh:
-            tokens = cls.__build(fh.read())
-        return tokens
+            return cls.from_str(fh.read())
+
+    @classmethod
+    def struct_from_path(cls, path: Path, name: Optional[str] = None) -> Struct:
+        """
+        Returns the struct called `name` defined in `path`. If `name` isn't
+        given, the file must define a single struct.
+        """
+        structs = cls.from_path(path)
+        if name is None:
+            if len(structs) != 1:
+                raise NoStructException(
+                    f"{path.name} defines {len(structs)} structs,"
+                    " choose one of them with --struct."
+                )
+            return structs[0]
+        for struct in structs:
+            if struct.name == name:
+                return struct
+        raise NoStructException(
+            f"Couldn't find struct {name} in {path.name}. Found: "
+            + ", ".join(struct.name for struct in structs)
+        )
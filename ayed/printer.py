@@ -2,15 +2,29 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 from collections import defaultdict
+from copy import copy
+from itertools import repeat
 from pathlib import Path
-from typing import Iterable
+from typing import TYPE_CHECKING, Final, Iterable, Iterator, TextIO
 
+import attr
 from attr import dataclass, field
 
-from ayed.classes import Struct
-from ayed.excel import Excel
+from ayed.classes import SEPARATOR, Struct
+from ayed.profile import profiler
 from ayed.types import File, Files, Structs
-from ayed.utils import add_includes, console, sanitize_name
+from ayed.utils import PAGE_SIZE, add_includes, console, sanitize_name
+
+if TYPE_CHECKING:
+    from ayed.cache import Manifest
+    from ayed.excel import Excel
+    from ayed.profile import Span
+    from ayed.sources import Source
+
+MANIFEST: Final = ".manifest.json"
+# Bump whenever StructPrinter's output changes, so that `ayed coll` rewrites
+# the headers it skipped because their structs didn't change.
+CODEGEN_VERSION: Final = 3
 
 
 class Printer(ABC):
@@ -28,33 +42,50 @@ class StructPrinter(Printer):
     """Printer prints out an iterable of structs to either a str or a file."""
 
     structs: Iterable[Struct]
+    io: bool = True  # TRead, TWrite... see Struct.io
+    sep: str = SEPARATOR  # between the fields, in TToString and TFromString
+    collection: bool = False  # TColl, see Struct.collection
 
-    def to_str(self) -> str:
-        """Writes all the structs and functions to a str and returns it"""
-        s = add_includes(
+    def iter_str(self) -> Iterator[str]:
+        """
+        Yields the includes, then every struct and its functions, a piece at a
+        time, so that no matter how many structs there are only one of them is
+        ever being built.
+        """
+        yield add_includes(
             libs=[
                 "filesystem",
                 "cstdio",
                 "iostream",
                 "cstring",
                 "string",
+                *(["vector", "algorithm"] if self.io or self.collection else []),
                 "biblioteca/funciones/tokens.hpp",
             ],
         )
-        fbody = [
-            f"{str(token)}{token.init()}{token.to_str()}{token.from_str()}{token.to_debug()}"
-            for token in self.structs
-        ]
-        return s + "\n".join(fbody)
+        for i, struct in enumerate(self.structs):
+            if i:
+                yield "\n"
+            yield from struct.functions(
+                io=self.io, sep=self.sep, collection=self.collection
+            )
+
+    def write(self, sink: TextIO) -> None:
+        """Writes all the structs and functions to `sink`, as they're built"""
+        for chunk in self.iter_str():
+            sink.write(chunk)
+
+    def to_str(self) -> str:
+        """Writes all the structs and functions to a str and returns it"""
+        return "".join(self.iter_str())
 
     def to_file(self, path: Path) -> None:
         """Writes all the structs and functions to output_files/path"""
-        fns = self.to_str()
         out = Path("output_files")
         out.mkdir(exist_ok=True)
         path = out / path
         with path.open("w", encoding="utf-8") as fh:
-            fh.write(fns)
+            self.write(fh)
         console.log(
             f"[b]Output file: [magenta]{path.absolute().as_uri()}[/magenta][/b]",
             justify="center",
@@ -67,8 +98,10 @@ class StructPrinter(Printer):
 
 @dataclass(slots=True)
 class ExcelPrinter(Printer):
-    file: Excel
+    file: Excel | Source
     output_folder: Path = Path("output_files")
+    incremental: bool = True
+    jobs: int = 1
     data: File | Files = field(init=False)
 
     def _write_one(
@@ -83,48 +116,208 @@ class ExcelPrinter(Printer):
             packed_structs[fname].append(packed)
         return packed_structs  # packs the struct into output_files/fname
 
-    def _write_many(self):
-        if not isinstance(self.data, list):
-            raise ValueError(
-                f"Expected {list} of {dict} but got {type(self.file)}."
-                " Try using struct_from_file instead."
-            )
-        return [
-            [
-                self._write_one(file=fh, sheet_name=sheet_name)
-                for (sheet_name, fh) in file.items()
-            ]
-            for file in self.data
-        ]
-
-    def _write(self, bytes: dict[str, list[list[bytes]]]):
-        for fname, data in bytes.items():
-            with (self.output_folder / fname).open("wb") as fh:
-                for raw_bytes in data[0]:
-                    fh.write(raw_bytes)
+    def _write(self, fname: str, struct: Struct) -> None:
+        """Writes the packed struct to output_folder/fname, one write per chunk"""
+        chunks = profiler.timed("pack", struct.iter_packed(), rows=len(struct))
+        with profiler.stage("write", file=fname, rows=len(struct)) as span, (
+            self.output_folder / fname
+        ).open("wb") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+                span.bytes += len(chunk)
 
-    def to_file(self):
-        if not self.output_folder.exists():
-            self.output_folder.mkdir(exist_ok=True)
-        if isinstance(self.data, File):
-            to_write = self._write_one()
-            self._write(to_write)
-            return True
-        to_write = self._write_many()
-        for bytes_list in to_write:
-            for packed_structs in bytes_list:
-                self._write(packed_structs)
-        return True
-
-    def to_table(self):
+    def _sheets(self) -> Iterator[tuple[str | None, File]]:
+        """Yields every (sheet name, File) pair in self.data"""
         if isinstance(self.data, File):
-            for fname, struct in self.data:
-                struct.unpack(self.output_folder / fname)
+            yield sanitize_name(self.file.sheet or ""), self.data
             return
         for sheet in self.data:
-            for _, file in sheet.items():
-                for fname, struct in file:
-                    struct.unpack(self.output_folder / fname)
+            yield from sheet.items()
+
+    def _structs(self) -> Iterator[tuple[str, Struct]]:
+        """Yields every (filename, struct) pair in self.data"""
+        for _, file in self._sheets():
+            yield from file
+
+    def _is_fresh(
+        self, manifest: Manifest, fname: str, digest: str, size: int | None = None
+    ) -> bool:
+        """
+        Whether output_folder/fname was already written from the same data,
+        and is still `size` bytes long if it's known
+        """
+        path = self.output_folder / fname
+        return (
+            path.exists()
+            and (size is None or path.stat().st_size == size)
+            and manifest.is_fresh(fname, digest, path)
+        )
+
+    def _write_file(
+        self, manifest: Manifest, sheet: str | None, file: File
+    ) -> list[str]:
+        """Packs and writes the stale structs of a sheet, returns their filenames"""
+        rebuilt: list[str] = []
+        with profiler.stage("sheet", sheet=sheet):
+            for fname, struct in profiler.timed("File.__iter__", file):
+                with profiler.stage("digest", file=fname):
+                    digest = struct.digest()
+                size = struct.size * len(struct)
+                if self.incremental and self._is_fresh(manifest, fname, digest, size):
+                    continue
+                self._write(fname, struct)
+                manifest.update(fname, digest, output=self.output_folder / fname)
+                rebuilt.append(fname)
+        return rebuilt
+
+    def _write_files(self, manifest: Manifest) -> list[str]:
+        """Packs and writes every stale struct, returns the rebuilt filenames"""
+        rebuilt: list[str] = []
+        for sheet, file in self._sheets():
+            rebuilt.extend(self._write_file(manifest, sheet, file))
+        return rebuilt
+
+    def _write_stream(self, excel: Excel, manifest: Manifest) -> list[str]:
+        """
+        Reads, packs and writes the workbook a sheet at a time, so only one
+        sheet's data is ever in memory. self.data only keeps their layout.
+        """
+        rebuilt: list[str] = []
+        self.data = []
+        for name, file in excel.iter_sheets():
+            sheet = sanitize_name(name)
+            rebuilt.extend(self._write_file(manifest, sheet, file))
+            self.data.append({sheet: _layout(file)})
+            del file  # before iter_sheets reads the next sheet
+        return rebuilt
+
+    def _write_source(self, source: Source, manifest: Manifest) -> list[str]:
+        """
+        Packs and writes a source one chunk at a time, so only a chunk of its
+        records is ever in memory. Returns the rebuilt filename, if it was.
+
+        The records go to a temporary file that only replaces the .dat once
+        they were all written, a source that fails halfway leaves it as it was.
+        """
+        from tempfile import NamedTemporaryFile
+
+        fname, digest = source.filename, source.digest()
+        path = self.output_folder / fname
+        if self.incremental and self._is_fresh(manifest, fname, digest):
+            return []
+        sheet = sanitize_name(source.sheet)
+        with NamedTemporaryFile(
+            dir=self.output_folder, prefix=f".{fname}-", delete=False
+        ) as fh:
+            tmp = Path(fh.name)
+        try:
+            with profiler.stage("sheet", sheet=sheet), profiler.stage(
+                "write", file=fname
+            ) as span, tmp.open("wb") as fh:
+                for chunk in profiler.timed("read chunk", source.chunks()):
+                    for _, struct in chunk:
+                        span.rows += len(struct)
+                        for packed in profiler.timed(
+                            "pack", struct.iter_packed(), rows=len(struct)
+                        ):
+                            fh.write(packed)
+                            span.bytes += len(packed)
+            tmp.replace(path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        manifest.update(fname, digest, output=path)
+        return [fname]
+
+    def _write_sheets(self, excel: Excel, manifest: Manifest) -> list[str]:
+        """
+        Fans the sheets out to a process pool, each worker parses, packs and
+        writes its own sheet (streaming it if `excel.stream`), and gathers the
+        layout of their sheets back into self.data.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        sheets = excel.sheet_names()
+        excels = [attr.evolve(excel, sheet=sheet) for sheet in sheets]
+        rebuilt: list[str] = []
+        self.data = []
+        with console.status(
+            f"Writing {len(sheets)} sheets with {self.jobs} jobs..."
+        ), ProcessPoolExecutor(
+            self.jobs, initializer=_quiet_worker, initargs=(profiler.enabled,)
+        ) as pool:
+            results = pool.map(
+                _write_sheet,
+                excels,
+                repeat(self.output_folder),
+                repeat(self.incremental),
+                repeat(manifest),
+            )
+            for sheet, (file, sheet_rebuilt, digests, spans) in zip(sheets, results):
+                profiler.extend(spans)
+                console.log(
+                    f"Found {len(file.structs)} structs in {sheet} 🙉",
+                    justify="center",
+                )
+                self.data.append({sanitize_name(sheet): file})
+                for fname in sheet_rebuilt:
+                    output = self.output_folder / fname
+                    manifest.update(fname, digests[fname], output=output)
+                rebuilt.extend(sheet_rebuilt)
+        return rebuilt
+
+    def to_file(self) -> list[str]:
+        """
+        Packs and writes every struct to output_folder/filename. Files whose
+        layout and data didn't change since the last run are skipped when
+        self.incremental is set. Returns the filenames that were (re)written.
+
+        With jobs > 1 and every sheet selected, sheets are parsed, packed and
+        written in parallel (each worker streams its sheet if the Excel is
+        streamed), and self.data is only filled in by this method, with the
+        layout of the sheets. So it is when streaming every sheet of an Excel,
+        one after the other.
+
+        Sources (csv, ndjson, parquet) are streamed in chunks instead, and
+        self.data only holds their layout.
+        """
+        from ayed.cache import Manifest
+        from ayed.sources import Source
+
+        if not self.output_folder.exists():
+            self.output_folder.mkdir(exist_ok=True)
+        manifest = Manifest.load(self.output_folder / MANIFEST)
+        if isinstance(self.file, Source):
+            rebuilt = self._write_source(self.file, manifest)
+        elif self._streaming:
+            rebuilt = self._write_stream(self.file, manifest)
+        elif self._parallel:
+            rebuilt = self._write_sheets(self.file, manifest)
+        else:
+            rebuilt = self._write_files(manifest)
+        manifest.save()
+        console.log(
+            f"Rebuilt {len(rebuilt)} file(s): {', '.join(rebuilt)}"
+            if rebuilt
+            else "Nothing changed, no files were rebuilt 💤",
+            justify="center",
+        )
+        return rebuilt
+
+    def to_table(
+        self,
+        *,
+        head: int | None = None,
+        tail: int | None = None,
+        page_size: int = PAGE_SIZE,
+    ) -> None:
+        """Logs the records written to every file, see Struct.unpack"""
+        for sheet, file in self._sheets():
+            for fname, struct in file:
+                path = self.output_folder / fname
+                with profiler.stage("unpack", sheet=sheet, file=fname) as span:
+                    struct.unpack(path, head=head, tail=tail, page_size=page_size)
+                    span.bytes = path.stat().st_size
 
     def to_str(self):
         if isinstance(self.data, File):
@@ -132,8 +325,24 @@ class ExcelPrinter(Printer):
             return "".join(f"{fname} -->\n {data}" for fname, data in to_write.items())
         raise NotImplementedError
 
+    @property
+    def _parallel(self) -> bool:
+        return self.jobs > 1 and self.file.sheet is None
+
+    @property
+    def _streaming(self) -> bool:
+        """Streaming every sheet here, in parallel every worker streams its own"""
+        from ayed.excel import Excel
+
+        return (
+            isinstance(self.file, Excel)
+            and self.file.stream
+            and self.file.sheet is None
+            and not self._parallel
+        )
+
     def __enter__(self) -> "ExcelPrinter":
-        self.data = self.file.read()
+        self.data = [] if self._parallel or self._streaming else self.file.read()
         return self
 
     def __exit__(self, *args):
@@ -141,7 +350,39 @@ class ExcelPrinter(Printer):
         return False
 
 
+def _layout(file: File) -> File:
+    """A copy of `file` without its data, enough to read back its .dat files"""
+    layout = File(filenames=file.filenames, structs=file.structs, variables=[])
+    for var in file.variables:
+        var = copy(var)
+        var.data = []
+        layout.add(var)
+    return layout
+
+
+def _quiet_worker(profile: bool = False) -> None:
+    """Workers don't log, the parent process reports their results"""
+    console.quiet = True
+    if profile:
+        profiler.enable()
+
+
+def _write_sheet(
+    excel: Excel, output_folder: Path, incremental: bool, manifest: Manifest
+) -> tuple[File, list[str], dict[str, str], list[Span]]:
+    """
+    Parses, packs and writes a single sheet. Runs in a worker process, with
+    its own copy of the manifest.
+    """
+    with ExcelPrinter(excel, output_folder, incremental) as printer:
+        rebuilt = printer._write_files(manifest)
+        data = _layout(printer.data)  # type: ignore
+    return data, rebuilt, manifest.digests, profiler.drain()
+
+
 if __name__ == "__main__":
+    from ayed.excel import Excel
+
     e = Excel("AlgoritmosFiles.xlsx")
     with ExcelPrinter(e) as p:
         p.to_file()
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Iterable, Iterator, Optional, TypeVar
+
+import attr
+
+T = TypeVar("T")
+Hook = Callable[["Span"], None]
+
+
+@attr.s(slots=True)
+class Span:
+    """What a single stage took: wall time, rows, bytes and tracemalloc peak"""
+
+    name: str = attr.ib()
+    sheet: Optional[str] = attr.ib(default=None)
+    file: Optional[str] = attr.ib(default=None)
+    start: float = attr.ib(factory=perf_counter)
+    seconds: float = attr.ib(default=0.0)
+    rows: int = attr.ib(default=0)
+    bytes: int = attr.ib(default=0)
+    peak: int = attr.ib(default=0)
+    child_seconds: float = attr.ib(default=0.0, repr=False)
+    pid: int = attr.ib(factory=os.getpid, repr=False)
+
+    @property
+    def self_seconds(self) -> float:
+        """Time spent in the stage itself, not in the stages nested in it"""
+        return max(0.0, self.seconds - self.child_seconds)
+
+    def to_dict(self) -> dict[str, Any]:
+        return attr.asdict(self)
+
+
+@attr.s(slots=True)
+class Profiler:
+    """
+    Records a Span for every stage ran inside `stage` (or `timed`) while it's
+    enabled, and does nothing otherwise. Spans nest: a stage started inside
+    another one inherits its sheet and file, and its time and peak are
+    accounted to it as well. Every finished span is passed to the hooks.
+
+    >>> profiler.enable()
+    >>> with profiler.stage("pack", file="VUELOS.dat") as span:
+    ...     span.bytes = len(data)
+    >>> profiler.summary()
+    """
+
+    enabled: bool = attr.ib(default=False)
+    spans: list[Span] = attr.ib(factory=list, repr=False)
+    hooks: list[Hook] = attr.ib(factory=list, repr=False)
+    _stack: list[Span] = attr.ib(factory=list, init=False, repr=False)
+    _tracing: bool = attr.ib(default=False, init=False, repr=False)
+
+    def enable(self, *, memory: bool = True) -> None:
+        """Starts recording, tracing allocations too when `memory` is set"""
+        import tracemalloc
+
+        self.enabled = True
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+    def disable(self) -> None:
+        self.enabled = False
+        if self._tracing:
+            from tracemalloc import stop
+
+            stop()
+            self._tracing = False
+
+    def add_hook(self, hook: Hook) -> None:
+        """Calls `hook` with every span once it finishes"""
+        self.hooks.append(hook)
+
+    def drain(self) -> list[Span]:
+        """Returns the recorded spans and forgets about them"""
+        spans, self.spans = self.spans, []
+        return spans
+
+    def extend(self, spans: Iterable[Span]) -> None:
+        """Adds spans recorded somewhere else, ex: by a worker process"""
+        for span in spans:
+            self._finish(span)
+
+    @contextmanager
+    def stage(
+        self,
+        name: str,
+        *,
+        sheet: Optional[str] = None,
+        file: Optional[str] = None,
+        rows: int = 0,
+    ) -> Iterator[Span]:
+        """Times the body of the with statement, the span can be filled in"""
+        if not self.enabled:
+            yield Span(name)
+            return
+        span = self._open(name, sheet=sheet, file=file, rows=rows)
+        try:
+            yield span
+        finally:
+            span.seconds = perf_counter() - span.start
+            self._close(span)
+
+    def timed(
+        self,
+        name: str,
+        items: Iterable[T],
+        *,
+        sheet: Optional[str] = None,
+        file: Optional[str] = None,
+        rows: Optional[int] = None,
+    ) -> Iterator[T]:
+        """
+        Yields `items`, recording the time spent producing them (and not the
+        time spent by the caller on each one) as a single span. Its rows are
+        how many items there were, unless given.
+        """
+        if not self.enabled:
+            yield from items
+            return
+        span = self._open(name, sheet=sheet, file=file)
+        self._stack.pop()  # the caller's stages aren't nested in this one
+        it = iter(items)
+        try:
+            while True:
+                begin = perf_counter()
+                self._stack.append(span)
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+                finally:
+                    span.seconds += perf_counter() - begin
+                    if self._tracing:
+                        span.peak = max(span.peak, _traced_peak())
+                    self._stack.pop()
+                span.rows += 1
+                yield item
+        finally:
+            if rows is not None:
+                span.rows = rows
+            self._close(span, pushed=False)
+
+    def summary(self) -> None:
+        """Prints the spans added up per stage and sheet"""
+        from rich.console import Console
+
+        from ayed.utils import console, create_table
+
+        totals: dict[tuple[str, str], list[Any]] = {}
+        for span in self.spans:
+            key = (span.name, span.sheet or "-")
+            total = totals.setdefault(key, [0, 0.0, 0.0, 0, 0, 0])
+            total[0] += 1
+            total[1] += span.seconds
+            total[2] += span.self_seconds
+            total[3] += span.rows
+            total[4] += span.bytes
+            total[5] = max(total[5], span.peak)
+        table = create_table(
+            "Profile",
+            columns=[
+                "stage",
+                "sheet",
+                "calls",
+                "seconds",
+                "self",
+                "rows",
+                "bytes",
+                "peak MiB",
+            ],
+        )
+        for (name, sheet), (calls, seconds, own, rows, size, peak) in totals.items():
+            table.add_row(
+                name,
+                sheet,
+                str(calls),
+                f"{seconds:.4f}",
+                f"{own:.4f}",
+                f"{rows:,}",
+                f"{size:,}",
+                f"{peak / 2**20:.1f}",
+            )
+        # profiles go to stderr when stdout is busy with machine readable output
+        (Console(stderr=True) if console.quiet else console).print(table)
+
+    def to_json(self, path: Path) -> None:
+        """Dumps every span to `path`"""
+        import json
+
+        spans = [span.to_dict() for span in self.spans]
+        path.write_text(json.dumps({"spans": spans}, indent=2) + "\n")
+
+    def to_chrome_trace(self, path: Path) -> None:
+        """Dumps the spans as a trace for chrome://tracing or ui.perfetto.dev"""
+        import json
+
+        origin = min((span.start for span in self.spans), default=0.0)
+        events = [
+            {
+                "name": span.name,
+                "cat": span.sheet or "ayed",
+                "ph": "X",
+                "ts": round((span.start - origin) * 1e6),
+                "dur": round(span.seconds * 1e6),
+                "pid": span.pid,
+                "tid": span.pid,
+                "args": {
+                    "sheet": span.sheet,
+                    "file": span.file,
+                    "rows": span.rows,
+                    "bytes": span.bytes,
+                    "peak": span.peak,
+                },
+            }
+            for span in self.spans
+        ]
+        path.write_text(json.dumps({"traceEvents": events}) + "\n")
+
+    def _open(self, name: str, **fields: Any) -> Span:
+        parent = self._stack[-1] if self._stack else None
+        if parent is not None:
+            fields["sheet"] = fields["sheet"] or parent.sheet
+            fields["file"] = fields["file"] or parent.file
+        if self._tracing:
+            # the peak is reset for the new stage, keep the parent's so far
+            from tracemalloc import reset_peak
+
+            if parent is not None:
+                parent.peak = max(parent.peak, _traced_peak())
+            reset_peak()
+        span = Span(name, **fields)
+        self._stack.append(span)
+        return span
+
+    def _close(self, span: Span, *, pushed: bool = True) -> None:
+        if pushed:
+            self._stack.pop()
+        if self._tracing:
+            span.peak = max(span.peak, _traced_peak())
+        if self._stack:
+            parent = self._stack[-1]
+            parent.child_seconds += span.seconds
+            parent.peak = max(parent.peak, span.peak)
+        self._finish(span)
+
+    def _finish(self, span: Span) -> None:
+        self.spans.append(span)
+        for hook in self.hooks:
+            hook(span)
+
+
+def _traced_peak() -> int:
+    # tracemalloc is only imported once profiling is enabled
+    from tracemalloc import get_traced_memory
+
+    return get_traced_memory()[1]
+
+
+profiler = Profiler()
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from mmap import ACCESS_READ, mmap
+from pathlib import Path
+from typing import IO, Any, Final, Iterator, Optional, Union, overload
+
+import attr
+
+from ayed.classes import Struct
+
+Record = tuple[Any, ...]
+
+# RecordReader.records decodes this many records at a time
+CHUNK_RECORDS: Final = 4096
+
+
+@attr.s(slots=True)
+class RecordReader:
+    """
+    Random access to the records of a .dat file written with `struct`.
+    The file is memory-mapped and records are decoded with unpack_from, so
+    reading record 4_000_000 doesn't read (nor copy) the ones before it.
+
+    >>> with RecordReader(Path("VUELOS.dat"), vuelo) as vuelos:
+    ...     vuelos[3], vuelos[-1], vuelos[10:20], len(vuelos)
+    """
+
+    path: Path = attr.ib(converter=Path)
+    struct: Struct = attr.ib()
+    _fh: Optional[IO[bytes]] = attr.ib(default=None, init=False, repr=False)
+    _mm: Optional[mmap] = attr.ib(default=None, init=False, repr=False)
+
+    def open(self) -> "RecordReader":
+        self._fh = self.path.open("rb")
+        if self.path.stat().st_size:  # empty files can't be mmapped
+            self._mm = mmap(self._fh.fileno(), 0, access=ACCESS_READ)
+        return self
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def __enter__(self) -> "RecordReader":
+        return self.open()
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """Returns the amount of whole records in the file"""
+        if self._mm is None:
+            return 0
+        return len(self._mm) // self.struct.size
+
+    @overload
+    def __getitem__(self, key: int) -> Record:
+        ...
+
+    @overload
+    def __getitem__(self, key: slice) -> list[Record]:
+        ...
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[Record, list[Record]]:
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return list(self.records(start, stop))
+            return [self[i] for i in range(start, stop, step)]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(f"{self.path.name} has {len(self)} records, not {key}")
+        offset = key * self.struct.size
+        return self.struct.cstruct.unpack_from(self._mm, offset)  # type: ignore
+
+    def __iter__(self) -> Iterator[Record]:
+        return self.records()
+
+    def records(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Record]:
+        """Yields records [start, stop) without copying the file"""
+        if self._mm is None:
+            return
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return
+        size, iter_unpack = self.struct.size, self.struct.cstruct.iter_unpack
+        for begin in range(start, stop, CHUNK_RECORDS):
+            end = min(begin + CHUNK_RECORDS, stop)
+            # the view can't outlive a yield, or closing the mmap would fail
+            with memoryview(self._mm) as view:
+                chunk = list(iter_unpack(view[begin * size : end * size]))
+            yield from chunk
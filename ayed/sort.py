@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+from heapq import merge
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path
+from struct import Struct as CStruct
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+from typing import IO, Any, Callable, Final, Iterable, Iterator, Optional
+
+from ayed.classes import Struct
+from ayed.reader import Record, RecordReader
+
+DEFAULT_MEMORY: Final = 64 * 1024 * 1024
+# A decoded record costs way more than its packed size: the tuple (plus its
+# slot in the run) and one python object per field. Rough estimates of both.
+RECORD_OVERHEAD: Final = 64
+FIELD_OVERHEAD: Final = 32
+# runs merged at once, each one is an open file (and a read buffer)
+MAX_FANIN: Final = 64
+
+Key = Callable[[Record], Any]
+
+
+def run_length(struct: Struct, memory: int) -> int:
+    """How many records fit in `memory` bytes once they're decoded"""
+    per_record = struct.size + RECORD_OVERHEAD + FIELD_OVERHEAD * len(struct.fields)
+    return max(1, memory // per_record)
+
+
+def write_records(path: Path, layout: CStruct, records: Iterable[Record]) -> int:
+    """Packs `records` into `path` a chunk at a time, returns how many it wrote"""
+    with path.open("wb") as fh:
+        return dump_records(fh, layout, records)
+
+
+def dump_records(fh: IO[bytes], layout: CStruct, records: Iterable[Record]) -> int:
+    """Packs `records` into an open file, returns how many it wrote"""
+    pack_into, size = layout.pack_into, layout.size
+    chunk = max(1, (1024 * 1024) // size)
+    buffer = bytearray(chunk * size)
+    written = used = 0
+    for record in records:
+        pack_into(buffer, used * size, *record)
+        used += 1
+        if used == chunk:
+            fh.write(buffer)
+            written, used = written + used, 0
+    with memoryview(buffer) as view:
+        fh.write(view[: used * size])
+    return written + used
+
+
+def read_run(path: Path, layout: CStruct, buffer_bytes: int) -> Iterator[Record]:
+    """Yields the records of a sorted run, reading `buffer_bytes` at a time"""
+    size = layout.size
+    read = max(1, buffer_bytes // size) * size
+    with path.open("rb") as fh:
+        while chunk := fh.read(read):
+            yield from layout.iter_unpack(chunk)
+
+
+def sorted_runs(
+    records: Iterable[Record],
+    layout: CStruct,
+    per_run: int,
+    tmp: Path,
+    *,
+    key: Optional[Key] = None,
+    desc: bool = False,
+) -> list[Path]:
+    """Sorts `records` `per_run` at a time, each run is written to `tmp`"""
+    runs: list[Path] = []
+    records = iter(records)
+    while run := list(islice(records, per_run)):
+        run.sort(key=key, reverse=desc)
+        runs.append(tmp / f"run0-{len(runs)}.dat")
+        write_records(runs[-1], layout, run)
+        del run
+    return runs
+
+
+def merge_runs(
+    runs: list[Path],
+    layout: CStruct,
+    memory: int,
+    tmp: Path,
+    *,
+    key: Optional[Key] = None,
+    desc: bool = False,
+    fanin: int = MAX_FANIN,
+) -> Iterator[Record]:
+    """
+    Merges the sorted `runs` into one sorted stream. At most `fanin` runs are
+    open at once: while there are more, groups of `fanin` runs are merged
+    into longer ones in `tmp` (and removed), one pass after the other. Runs
+    are only grouped with their neighbours, so the merge stays stable.
+    """
+    fanin = max(2, fanin)
+
+    def merged(group: list[Path]) -> Iterator[Record]:
+        buffer_bytes = memory // (len(group) + 1)
+        readers = (read_run(run, layout, buffer_bytes) for run in group)
+        return merge(*readers, key=key, reverse=desc)
+
+    passes = 0
+    while len(runs) > fanin:
+        passes += 1
+        longer = []
+        for start in range(0, len(runs), fanin):
+            group = runs[start : start + fanin]
+            if len(group) == 1:  # nothing to merge it with in this pass
+                longer += group
+                continue
+            longer.append(tmp / f"run{passes}-{len(longer)}.dat")
+            write_records(longer[-1], layout, merged(group))
+            for run in group:
+                run.unlink()
+        runs = longer
+    return merged(runs)
+
+
+def sort_dat(
+    path: Path,
+    struct: Struct,
+    by: str,
+    *,
+    desc: bool = False,
+    output: Optional[Path] = None,
+    memory: int = DEFAULT_MEMORY,
+    tmp_dir: Optional[Path] = None,
+    fanin: int = MAX_FANIN,
+) -> Path:
+    """
+    Sorts the records of `path` by the field `by` with an external merge sort:
+    runs of as many records as fit in `memory` are sorted and written to
+    `tmp_dir`, then they're k-way merged with a heap into `output` (`path`
+    itself by default), `fanin` runs at a time. The sort is stable.
+    """
+    output = output or path
+    key: Key = itemgetter(struct.field(by)[0])
+    layout = struct.cstruct
+    with TemporaryDirectory(prefix="ayed-sort-", dir=tmp_dir) as tmp:
+        with RecordReader(path, struct) as reader:
+            runs = sorted_runs(
+                reader,
+                layout,
+                run_length(struct, memory),
+                Path(tmp),
+                key=key,
+                desc=desc,
+            )
+        merged = merge_runs(
+            runs, layout, memory, Path(tmp), key=key, desc=desc, fanin=fanin
+        )
+        # write next to the output and swap it in, `output` might be `path`
+        with NamedTemporaryFile(
+            dir=output.parent, prefix=f".{output.name}-", delete=False
+        ) as fh:
+            sorted_path = Path(fh.name)
+        try:
+            write_records(sorted_path, layout, merged)
+            sorted_path.replace(output)
+        except BaseException:
+            sorted_path.unlink(missing_ok=True)
+            raise
+    return output
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Final, Iterator, Optional
+
+import attr
+
+from ayed.classes import Struct, Variable
+from ayed.exceptions import SourceException
+from ayed.types import File
+
+if TYPE_CHECKING:
+    from pandas import DataFrame, Series
+
+FLOATS: Final = ("f", "d")
+# sources are read (and packed) this many rows at a time
+CHUNK_ROWS: Final = 65_536
+
+
+def convert_column(var: Variable, data: Series) -> list[Any]:
+    """Converts a column of data to what Struct.pack expects for `var`"""
+    fmt = var.format_character()
+    if var.ctype or fmt == "c":  # a single char packs as a single byte
+        text = data.fillna("").astype(str).str.strip()
+        encoded = text.str.ljust(var.ctype or 1).str.encode("utf-8")
+        return (encoded if var.ctype else encoded.str[:1]).tolist()
+    if fmt in FLOATS:
+        return data.astype("float64").tolist()
+    data = data.infer_objects()
+    if data.dtype == object:  # strip the strings, leave everything else be
+        stripped = data.str.strip()
+        data = stripped.where(stripped.notna(), data)
+    return data.tolist()
+
+
+def pandas_dtype(var: Variable) -> str:
+    """The dtype a column has to be read as to be packed as `var`"""
+    fmt = var.format_character()
+    if fmt[-1] in "sc":
+        return "object"
+    if fmt in FLOATS:
+        return "float64"
+    return "int64" if fmt.islower() else "uint64"
+
+
+@attr.s(slots=True)
+class Source(ABC):
+    """
+    A file with the records of a single struct, whose layout is given by a
+    header instead of the file itself. Sources are read a chunk of rows at a
+    time, every chunk is a File (with a single struct) that holds only its own
+    rows, so that inputs of any size are packed and written in bounded memory.
+
+    Columns are matched to the struct fields by name, extra ones are ignored.
+
+    >>> source = open_source(Path("vuelos.csv"), vuelo)
+    >>> for chunk in source.chunks():
+    ...     for fname, struct in chunk:
+    ...         struct.pack()
+    """
+
+    path: Path = attr.ib(converter=Path)
+    struct: Struct = attr.ib()
+    filename: str = attr.ib(default="")
+    chunk_rows: int = attr.ib(default=CHUNK_ROWS)
+
+    def __attrs_post_init__(self) -> None:
+        if not self.filename:  # vuelos.csv -> VUELOS.dat
+            self.filename = f"{self.path.stem.upper()}.dat"
+
+    @property
+    def sheet(self) -> str:
+        """A source stands for a single sheet, named after the file"""
+        return self.path.name
+
+    @property
+    def columns(self) -> list[str]:
+        return [field.name for field in self.struct]
+
+    def read(self) -> File:
+        """Returns the layout of the source: a File without any records"""
+        file = self._file()
+        for field in self.struct:
+            file.add(self._variable(field))
+        return file
+
+    def chunks(self) -> Iterator[File]:
+        """
+        Yields a File with the next chunk_rows records, until there're none.
+        Raises SourceException on missing columns and on numbers that are
+        missing or aren't numbers, naming their row and column.
+        """
+        row = 0
+        for frame in self._read_frames():
+            missing = [name for name in self.columns if name not in frame]
+            if missing:
+                raise SourceException(
+                    f"{self.path.name} has no column(s) {', '.join(missing)}"
+                )
+            file = self._file()
+            for field in self.struct:
+                var = self._variable(field)
+                column = self._numbers(var, frame[field.name], row)
+                var.data = convert_column(var, column)
+                file.add(var)
+            row += len(frame)
+            yield file
+
+    def digest(self) -> str:
+        """Changes whenever the contents of the file or the struct do"""
+        from ayed.cache import file_digest
+
+        return f"{self.struct.layout}:{file_digest(self.path)}"
+
+    @abstractmethod
+    def _frames(self) -> Iterator[DataFrame]:
+        """Yields DataFrames of at most chunk_rows rows"""
+
+    def _read_frames(self) -> Iterator[DataFrame]:
+        """_frames, with the errors of the readers as SourceException"""
+        try:
+            yield from self._frames()
+        except (ValueError, TypeError) as e:  # ex: a line that isn't json
+            raise SourceException(f"Can't read {self.path.name}: {e}") from e
+
+    def _numbers(self, var: Variable, data: Series, row: int) -> Series:
+        """
+        Returns the column of a number field as the dtype it's packed as,
+        raises SourceException on the first value that's missing or isn't
+        a number. `row` is the number of rows before the column's first.
+        """
+        dtype = pandas_dtype(var)
+        if dtype == "object":
+            return data
+        from pandas import isna, to_numeric
+
+        numbers = to_numeric(data, errors="coerce")
+        bad = numbers.isna()
+        if dtype != "float64":
+            bad |= numbers % 1 != 0
+        if bad.any():
+            i = int(bad.to_numpy().argmax())
+            value = data.iloc[i]
+            what = (
+                "is missing"
+                if isna(value) or str(value).strip() == ""
+                else f"{value!r} isn't a valid {var.type}"
+            )
+            raise SourceException(
+                f"{self.path.name}, row {row + i + 1}, column {var.name}: {what}"
+            )
+        return numbers.astype(dtype)
+
+    @property
+    def _text(self) -> dict[str, str]:
+        """Reads every column as is, _numbers converts them"""
+        return {name: "object" for name in self.columns}
+
+    def _file(self) -> File:
+        return File(filenames=[self.filename], structs=[self.struct.name], variables=[])
+
+    @staticmethod
+    def _variable(field: Variable) -> Variable:
+        var = Variable(type=field.type, name=field.name, ctype=field.ctype)
+        var.struct_id, var.file_id = 0, 0
+        return var
+
+
+@attr.s(slots=True)
+class CsvSource(Source):
+    """Comma separated values, with the field names in the first line"""
+
+    def _frames(self) -> Iterator[DataFrame]:
+        from pandas import read_csv
+
+        dtypes = self._text
+        with read_csv(
+            self.path,
+            usecols=lambda column: column in dtypes,
+            dtype=dtypes,
+            chunksize=self.chunk_rows,
+            keep_default_na=False,
+        ) as reader:
+            yield from reader
+
+
+@attr.s(slots=True)
+class NdjsonSource(Source):
+    """One json object per line, with the field names as keys"""
+
+    def _frames(self) -> Iterator[DataFrame]:
+        from pandas import read_json
+
+        with read_json(
+            self.path,
+            lines=True,
+            dtype=self._text,
+            convert_dates=False,  # a "date" or "*_at" column would be parsed
+            chunksize=self.chunk_rows,
+        ) as reader:
+            yield from reader
+
+
+@attr.s(slots=True)
+class ParquetSource(Source):
+    """Parquet files, read a batch at a time. Needs pyarrow"""
+
+    def _frames(self) -> Iterator[DataFrame]:
+        try:
+            from pyarrow.parquet import ParquetFile
+        except ImportError as e:
+            raise SourceException(
+                "Reading parquet files needs pyarrow, install it with"
+                " `pip install pyarrow`."
+            ) from e
+        parquet = ParquetFile(self.path)
+        try:
+            for batch in parquet.iter_batches(
+                batch_size=self.chunk_rows, columns=self.columns
+            ):
+                yield batch.to_pandas()
+        finally:
+            parquet.close()
+
+
+SOURCES: Final[dict[str, type[Source]]] = {
+    ".csv": CsvSource,
+    ".ndjson": NdjsonSource,
+    ".jsonl": NdjsonSource,
+    ".parquet": ParquetSource,
+    ".pq": ParquetSource,
+}
+
+
+def open_source(
+    path: Path, struct: Struct, filename: Optional[str] = None, **kwargs: Any
+) -> Source:
+    """Picks the source for `path` by its extension"""
+    try:
+        cls = SOURCES[path.suffix.lower()]
+    except KeyError:
+        raise SourceException(
+            f"Can't read {path.name}, supported files: {', '.join(SOURCES)}"
+        ) from None
+    return cls(path, struct, filename or "", **kwargs)
@@ -5,9 +5,11 @@ import os
 import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Final, Optional
+from typing import TYPE_CHECKING, Any, Final, List, Optional
 
-from typer import Argument, Option, Typer
+from typer import Argument, BadParameter, Option, Typer
+
+from ayed.formats import Format
 
 PACKAGE_PARENT = ".."
 SCRIPT_DIR = os.path.dirname(
@@ -16,19 +18,81 @@ SCRIPT_DIR = os.path.dirname(
 sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
 
 
-from ayed.editor import edit
-from ayed.excel import Excel
-from ayed.parser import Tokenizer
-from ayed.printer import ExcelPrinter, StructPrinter
-from ayed.types import Structs
-from ayed.utils import console
+# Every command imports what it needs on its own, so that `ayed coll` doesn't
+# have to pay for pandas/openpyxl on every run.
+if TYPE_CHECKING:
+    from ayed.classes import Struct
+    from ayed.types import Structs
 
 app = Typer(name="ayed")
 
 DEFAULT_EXCEL: Final = "AlgoritmosFiles.xlsx"
+PAGE_SIZE: Final = 50  # same as ayed.utils.PAGE_SIZE, without importing rich
+
+STRUCT_FILE = Option(
+    ...,
+    "--struct-file",
+    "-f",
+    exists=True,
+    dir_okay=False,
+    resolve_path=True,
+    help="El archivo .cpp[,.hpp,.c,.h] que define al struct de los registros",
+)
+STRUCT_NAME = Option(
+    None,
+    "--struct",
+    "-s",
+    help="El nombre del struct, si el archivo define más de uno",
+)
+
+
+FORMAT = Option(
+    Format.rich,
+    "--format",
+    case_sensitive=False,
+    help="rich muestra tablas, json/csv/ndjson escriben los datos a stdout",
+)
+HEAD = Option(None, "--head", min=0, help="Muestra solo los primeros N registros")
+TAIL = Option(None, "--tail", min=0, help="Muestra solo los últimos N registros")
+PAGE = Option(PAGE_SIZE, "--page-size", min=1, help="Cantidad de registros por tabla")
+
+
+def check_head_tail(head: Optional[int], tail: Optional[int]) -> None:
+    if head is not None and tail is not None:
+        raise BadParameter("--head and --tail can't be used together")
+
+
+def parse_range(value: str) -> slice:
+    """Parses A:B, A: or :B into a slice"""
+    start, sep, stop = value.partition(":")
+    try:
+        if not sep:
+            raise ValueError
+        return slice(int(start) if start else None, int(stop) if stop else None)
+    except ValueError as e:
+        raise BadParameter(f"{value!r} should look like A:B, A: or :B") from e
+
+
+def load_struct(struct_file: Path, name: Optional[str]) -> Struct:
+    """
+    Tokenizer.struct_from_path, with its errors (and fields that can't be
+    packed) reported as -f's
+    """
+    from ayed.exceptions import NoStructException
+    from ayed.parser import Tokenizer
+
+    try:
+        struct = Tokenizer.struct_from_path(struct_file, name)
+        struct.cstruct  # raises if its records can't be packed
+    except NoStructException as e:
+        raise BadParameter(str(e), param_hint="-f") from e
+    return struct
 
 
 def open_editor() -> Structs:
+    from ayed.editor import edit
+    from ayed.parser import Tokenizer
+
     SEPARATOR = "// write your code below"
     code = edit(SEPARATOR)
     return Tokenizer.from_str(code)
@@ -36,6 +100,11 @@ def open_editor() -> Structs:
 
 @app.command(name="coll")
 def coll_fn_gen(
+    inputs: Optional[List[str]] = Argument(
+        None,
+        help="Archivos, carpetas o globs (ej: 'structs/**/*.hpp') con structs",
+        show_default=False,
+    ),
     path: Path = Option(
         None,
         "--path",
@@ -44,7 +113,33 @@ def coll_fn_gen(
         dir_okay=False,
         resolve_path=True,
         help="La dirección del archivo .cpp[,.hpp,.c,.h] que contiene a los structs",
-    )
+    ),
+    output_folder: Path = Option(
+        Path("output_files"),
+        "--output",
+        "-o",
+        file_okay=False,
+        help="La carpeta en la que se escriben los .hpp de varios archivos",
+    ),
+    jobs: int = Option(
+        1, "-j", "--jobs", min=1, help="Cantidad de archivos a parsear en paralelo"
+    ),
+    force: bool = Option(
+        False, "--force", help="Reescribe todos los .hpp, aunque no hayan cambiado"
+    ),
+    stdout: bool = Option(
+        False, "--stdout", help="Escribe el código a stdout en vez de a un .hpp"
+    ),
+    io: bool = Option(
+        True, help="Agrega TRead, TWrite, TReadAll... para leer/escribir los .dat"
+    ),
+    sep: str = Option(
+        "-", "--sep", help="Separador de los campos en TToString y TFromString"
+    ),
+    collection: bool = Option(
+        False, help="Agrega TColl, una colección de T que no pasa por strings"
+    ),
+    format: Format = FORMAT,
 ) -> None:
     """
     Crea las funciones newT, TToString, TFromString, TToDebug para un struct T.
@@ -54,19 +149,113 @@ def coll_fn_gen(
 
     Si ya tienen un archivo y no quieren que se abra el editor, pueden usar
     -p o --path [PATH], siendo [PATH] el nombre del archivo
+
+    También pueden pasar varios archivos, carpetas o globs, ej:
+    ayed coll structs/ 'tps/**/*.hpp'. Se escribe un .hpp por archivo en
+    --output (output_files por default), con las mismas subcarpetas. Si dos
+    archivos solo difieren en la extensión, sus .hpp la conservan, ej:
+    vuelos.h y vuelos.cpp -> vuelos.h.hpp y vuelos.cpp.hpp. Solo se
+    vuelven a parsear los archivos que cambiaron desde la última vez, con
+    --force se regeneran todos, y con -j o --jobs [N] se parsean N a la vez.
+
+    Para los structs sin std::string ni otros structs, también se crean
+    TRead, TWrite, TReadAll, TWriteAll, TSeek y TCount, que leen y escriben
+    los registros de los .dat de a muchos por vez. Con --no-io no se crean.
+
+    TToString y TFromString separan los campos con un -, con --sep [SEP] se
+    puede usar otro separador, ej: --sep ';'
+
+    Con --collection también se crea TColl, una colección de T (sin pasar
+    por strings como Coll) con TCollAdd, TCollGetAt, TCollSetAt, TCollSort,
+    TCollFind y, por cada campo, TCollSortBy[Campo] y TCollSearchBy[Campo].
+
+    Con --stdout el código se escribe a stdout, a medida que se genera, en vez
+    de a output_files, ej: ayed coll -p vuelos.hpp --stdout > funciones.hpp
+
+    Con --format json, csv o ndjson se escribe un resumen a stdout en vez de
+    mostrar mensajes.
     """
-    if not path:
-        structs = open_editor()
-    else:
-        structs = Tokenizer.from_path(path)
-    dt = datetime.now().strftime("%d-%m-%y-%H%M")
-    StructPrinter.from_tokens(structs).to_file(Path(f"{dt}.hpp"))
-    written_structs = ", ".join(struct.name for struct in structs)
+    from ayed.output import output
+    from ayed.parser import Tokenizer
+    from ayed.printer import StructPrinter
+    from ayed.utils import console
+
+    if not sep:
+        raise BadParameter("the separator can't be empty", param_hint="--sep")
+    if inputs and path:
+        raise BadParameter("use either -p or the files, not both")
+    if inputs and stdout:
+        raise BadParameter("--stdout only works with -p or the editor")
+    if stdout and format is not Format.rich:
+        raise BadParameter("--stdout writes the code itself, it has no --format")
+    output.use(format)
+    try:
+        if inputs:
+            options = dict(io=io, sep=sep, collection=collection)
+            coll_many(inputs, output_folder, jobs=jobs, force=force, **options)
+            return
+        if not path:
+            structs = open_editor()
+        else:
+            structs = Tokenizer.from_path(path)
+        if stdout:
+            StructPrinter(iter(structs), io, sep, collection).write(sys.stdout)
+            return
+        dt = datetime.now().strftime("%d-%m-%y-%H%M")
+        StructPrinter(iter(structs), io, sep, collection).to_file(Path(f"{dt}.hpp"))
+        written_structs = ", ".join(struct.name for struct in structs)
+        console.print(
+            "[b yellow]Wrote TtoDebug, TtoString,"
+            f" TfromString and newT for {written_structs}",
+            justify="center",
+        )
+        output.summary(
+            "coll",
+            output=str(Path("output_files") / f"{dt}.hpp"),
+            structs=[struct.name for struct in structs],
+        )
+        console.log("[b white]Done! Bye! 👋", justify="center")
+    finally:
+        output.close()
+
+
+def coll_many(
+    inputs: List[str], output_folder: Path, *, jobs: int, force: bool, **options: Any
+) -> None:
+    from ayed.coll import coll
+    from ayed.output import output
+    from ayed.utils import console
+
+    headers = coll(inputs, output_folder, jobs=jobs, force=force, **options)
+    if not headers:
+        raise BadParameter(f"no .cpp/.hpp/.c/.h files in {', '.join(inputs)}")
+    for header in headers:
+        if header.error:
+            console.log(f"[yellow]Skipped {header.source.name}: {header.error}")
+        elif header.rebuilt:
+            console.log(
+                f"[b]{header.source.name} -> [magenta]{header.output}[/magenta]:"
+                f" {', '.join(header.structs or [])}"
+            )
+    rebuilt = sum(header.rebuilt for header in headers)
     console.print(
-        "[b yellow]Wrote TtoDebug, TtoString,"
-        f" TfromString and newT for {written_structs}",
+        f"[b yellow]Wrote {rebuilt} header(s),"
+        f" {len(headers) - rebuilt} unchanged or skipped",
         justify="center",
     )
+    output.summary(
+        "coll",
+        outputs=[
+            {
+                "input": str(header.source),
+                "output": str(header.output),
+                "structs": header.structs,
+                "rebuilt": header.rebuilt,
+                "error": header.error,
+            }
+            for header in headers
+        ],
+    )
     console.log("[b white]Done! Bye! 👋", justify="center")
 
 
@@ -76,7 +265,7 @@ def coll_fn_gen(
 def open_excel(
     path: Path = Argument(
         DEFAULT_EXCEL,
-        help="La dirección del .xlsx",
+        help="La dirección del .xlsx (o .csv, .ndjson, .parquet)",
         dir_okay=False,
         resolve_path=True,
         exists=True,
@@ -85,6 +274,51 @@ def open_excel(
         None, "-s", "--sheet", help="El nombre de la solapa/sheet"
     ),
     read: bool = Option(True, help="Lee las estructuras guardadas en el .dat"),
+    stream: bool = Option(
+        False, help="Lee el excel solapa por solapa, sin cargarlo entero en memoria"
+    ),
+    cache: bool = Option(
+        True, help="Reutiliza lo parseado si el excel no cambió desde la última vez"
+    ),
+    force: bool = Option(
+        False, "--force", help="Reescribe todos los .dat, aunque no hayan cambiado"
+    ),
+    jobs: int = Option(
+        1, "-j", "--jobs", min=1, help="Cantidad de solapas a procesar en paralelo"
+    ),
+    head: Optional[int] = HEAD,
+    tail: Optional[int] = TAIL,
+    page_size: int = PAGE,
+    format: Format = FORMAT,
+    struct_file: Optional[Path] = Option(
+        None,
+        "--struct-file",
+        "-f",
+        exists=True,
+        dir_okay=False,
+        resolve_path=True,
+        help="Archivo con el struct de los registros de un csv/ndjson/parquet",
+    ),
+    struct: Optional[str] = Option(
+        None, "--struct", help="El nombre del struct, si el archivo define más de uno"
+    ),
+    dat: Optional[str] = Option(
+        None, "--dat", help="El .dat a escribir para un csv/ndjson/parquet"
+    ),
+    profile: bool = Option(
+        False,
+        "--profile",
+        help="Mide tiempo, filas, bytes y memoria de cada etapa y solapa",
+    ),
+    profile_json: Optional[Path] = Option(
+        None, "--profile-json", dir_okay=False, help="Guarda el perfil en un .json"
+    ),
+    profile_trace: Optional[Path] = Option(
+        None,
+        "--profile-trace",
+        dir_okay=False,
+        help="Guarda el perfil como trace de Chrome (chrome://tracing)",
+    ),
 ) -> None:
     """
     Por default, abre el excel `AlgoritmosFiles.xlsx` en la carpeta en la que
@@ -97,13 +331,433 @@ def open_excel(
     Con -s o --sheet [SHEET] pueden especificar una solapa, siendo [SHEET] la solapa.
 
     Si utilizan --no-read, el programa no leerá los archivos para mostrarlos.
+
+    Con --stream, el excel se lee en modo streaming (útil para excels muy grandes).
+
+    Lo parseado se guarda en output_files/.cache, con --no-cache se vuelve a leer
+    el excel siempre.
+
+    Solo se reescriben los .dat cuyos datos cambiaron, con --force se reescriben
+    todos.
+
+    Con -j o --jobs [N] se procesan N solapas en paralelo (con --stream,
+    cada una se lee en modo streaming).
+
+    Los registros se muestran en tablas de --page-size registros, con --head N
+    o --tail N se muestran solo los primeros o últimos N de cada archivo.
+
+    Con --format json, csv o ndjson los registros y un resumen se escriben a
+    stdout en vez de mostrar tablas.
+
+    También se pueden leer .csv, .ndjson o .parquet (con pyarrow instalado) de
+    cualquier tamaño, de a partes. Como no dicen qué struct tienen sus
+    registros, hay que indicarlo con -f o --struct-file [ARCHIVO]; las columnas
+    se buscan por el nombre de cada campo. Se escriben en [NOMBRE].dat o --dat.
+
+    Con --profile se muestra cuánto tiempo, filas, bytes y memoria llevó cada
+    etapa (leer el excel, parsear, empaquetar, escribir, mostrar) por solapa.
+    Con --profile-json o --profile-trace [ARCHIVO] además se guarda el perfil.
     """
-    excel = Excel(path, sheet=sheet)
-    with ExcelPrinter(excel) as printer:
-        printer.to_file()
-        if read:
-            printer.to_table()
-    console.log("[b white]Done! Bye! 👋", justify="center")
+    from ayed.cache import WorkbookCache
+    from ayed.excel import Excel
+    from ayed.exceptions import (
+        NoStructException,
+        ReadSheetException,
+        SourceException,
+    )
+    from ayed.output import output
+    from ayed.printer import ExcelPrinter
+    from ayed.profile import profiler
+    from ayed.sources import SOURCES, Source, open_source
+    from ayed.types import File
+    from ayed.utils import console
+
+    check_head_tail(head, tail)
+    output.use(format)
+    try:
+        profile = profile or bool(profile_json or profile_trace)
+        if profile:
+            profiler.enable()
+        if path.suffix.lower() in SOURCES:
+            if struct_file is None:
+                raise BadParameter(
+                    f"{path.name} doesn't say which struct it holds", param_hint="-f"
+                )
+            layout = load_struct(struct_file, struct)
+            source: Excel | Source = open_source(path, layout, dat)
+        else:
+            source = Excel(
+                path,
+                sheet=sheet,
+                stream=stream,
+                cache=WorkbookCache() if cache else None,
+            )
+        with ExcelPrinter(source, incremental=not force, jobs=jobs) as printer:
+            try:
+                rebuilt = printer.to_file()
+            except (NoStructException, ReadSheetException, SourceException) as e:
+                # ex: a std::string column, columns of different lengths or missing
+                raise BadParameter(str(e), param_hint="PATH") from e
+            if read:
+                printer.to_table(head=head, tail=tail, page_size=page_size)
+            data = printer.data
+            if isinstance(data, File):  # a single sheet was read
+                data = [{source.sheet or path.name: data}]
+            output.summary(
+                "files",
+                workbook=str(path),
+                sheets=[
+                    {"sheet": name, "structs": file.structs, "files": file.filenames}
+                    for sheets in data
+                    for name, file in sheets.items()
+                ],
+                rebuilt=rebuilt,
+            )
+        if profile:
+            profiler.summary()
+            if profile_json:
+                profiler.to_json(profile_json)
+            if profile_trace:
+                profiler.to_chrome_trace(profile_trace)
+            profiler.disable()
+        console.log("[b white]Done! Bye! 👋", justify="center")
+    finally:
+        output.close()
+
+
+@app.command(name="read")
+def read_dat(
+    path: Path = Argument(
+        ...,
+        help="La dirección del .dat",
+        dir_okay=False,
+        resolve_path=True,
+        exists=True,
+    ),
+    struct_file: Path = STRUCT_FILE,
+    struct: Optional[str] = STRUCT_NAME,
+    at: Optional[int] = Option(None, "--at", help="Muestra solo el registro N"),
+    records: Optional[str] = Option(
+        None, "--range", help="Muestra los registros desde A hasta B (sin incluir)"
+    ),
+    head: Optional[int] = HEAD,
+    tail: Optional[int] = TAIL,
+    page_size: int = PAGE,
+    format: Format = FORMAT,
+) -> None:
+    """
+    Muestra los registros guardados en un .dat, usando el struct definido en
+    el archivo de --struct-file para leerlos.
+
+    Con --at N se muestra solo el registro N, y con --range A:B los registros
+    desde A hasta B. El archivo no se lee entero, así que funciona igual de
+    rápido con archivos enormes.
+
+    Los registros se muestran en tablas de --page-size registros, con --head N
+    o --tail N se muestran solo los primeros o últimos N.
+
+    Con --format json, csv o ndjson los registros se escriben a stdout en vez
+    de mostrar tablas.
+    """
+    from ayed.output import output
+    from ayed.reader import RecordReader
+
+    check_head_tail(head, tail)
+    output.use(format)
+    try:
+        layout = load_struct(struct_file, struct)
+        with RecordReader(path, layout) as reader:
+            if at is not None:
+                if not -len(reader) <= at < len(reader):
+                    raise BadParameter(f"{path.name} only has {len(reader)} records")
+                selected = slice(at % len(reader), at % len(reader) + 1)
+            else:
+                selected = parse_range(records) if records else slice(None)
+            start, stop, _ = selected.indices(len(reader))
+            if head is not None:
+                stop = min(stop, start + head)
+            if tail is not None:
+                start = max(start, stop - tail)
+            output.records(
+                path.name,
+                columns=[field.name for field in layout],
+                records=reader.records(start, stop),
+                title=f"{path.name} - {len(reader)} records of {layout.size} bytes",
+                start=start,
+                page_size=page_size,
+            )
+    finally:
+        output.close()
+
+
+@app.command(name="index")
+def index_dat(
+    path: Path = Argument(
+        ...,
+        help="La dirección del .dat",
+        dir_okay=False,
+        resolve_path=True,
+        exists=True,
+    ),
+    struct_file: Path = STRUCT_FILE,
+    struct: Optional[str] = STRUCT_NAME,
+    key: str = Option(..., "--key", "-k", help="El campo por el que se indexa"),
+) -> None:
+    """
+    Crea un índice ordenado del campo --key de un .dat, en un archivo .idx al
+    lado del .dat, para poder buscar registros con `ayed lookup`.
+    """
+    from ayed.index import build_index
+    from ayed.utils import console
+
+    layout = load_struct(struct_file, struct)
+    try:
+        idx = build_index(path, layout, key)
+    except KeyError as e:
+        raise BadParameter(e.args[0], param_hint="--key") from e
+    console.log(
+        f"[b]Indexed {path.name} by {key}: [magenta]{idx.as_uri()}[/magenta][/b]",
+        justify="center",
+    )
+
+
+@app.command(name="lookup")
+def lookup_dat(
+    path: Path = Argument(
+        ...,
+        help="La dirección del .dat, indexado con `ayed index`",
+        dir_okay=False,
+        resolve_path=True,
+        exists=True,
+    ),
+    key: str = Option(..., "--key", "-k", help="El valor a buscar"),
+    format: Format = FORMAT,
+) -> None:
+    """
+    Busca los registros de un .dat cuyo campo indexado vale --key, usando el
+    índice creado con `ayed index` (búsqueda binaria, sin leer todo el .dat).
+    """
+    from ayed.exceptions import IndexFileException
+    from ayed.index import Index
+    from ayed.output import output
+
+    output.use(format)
+    try:
+        try:
+            with Index(path) as index:
+                found = index.lookup(key)
+                fields, field = index.fields, index.header["key"]
+        except IndexFileException as e:
+            raise BadParameter(str(e), param_hint="PATH") from e
+        except ValueError as e:
+            raise BadParameter(str(e), param_hint="--key") from e
+        output.records(
+            path.name,
+            columns=fields,
+            records=[record for _, record in found],
+            index=[i for i, _ in found],
+            title=f"{path.name} - {len(found)} records with {field}={key}",
+        )
+    finally:
+        output.close()
+
+
+@app.command(name="sort")
+def sort_dat(
+    path: Path = Argument(
+        ...,
+        help="La dirección del .dat",
+        dir_okay=False,
+        resolve_path=True,
+        exists=True,
+    ),
+    struct_file: Path = STRUCT_FILE,
+    struct: Optional[str] = STRUCT_NAME,
+    by: str = Option(..., "--by", "-b", help="El campo por el que se ordena"),
+    desc: bool = Option(False, "--desc", help="Ordena de mayor a menor"),
+    output_path: Optional[Path] = Option(
+        None,
+        "--output",
+        "-o",
+        dir_okay=False,
+        resolve_path=True,
+        help="Dónde escribir el .dat ordenado, por default se reemplaza PATH",
+    ),
+    memory: int = Option(
+        64, "--memory", min=1, help="Memoria a usar para ordenar, en MiB"
+    ),
+    tmp_dir: Optional[Path] = Option(
+        None,
+        "--tmp-dir",
+        file_okay=False,
+        exists=True,
+        resolve_path=True,
+        help="Carpeta para los archivos temporales",
+    ),
+) -> None:
+    """
+    Ordena los registros de un .dat por el campo --by, sin importar si el
+    archivo entra o no en memoria: se ordena de a partes de --memory MiB que
+    después se intercalan (external merge sort).
+    """
+    from ayed import sort
+    from ayed.utils import console
+
+    layout = load_struct(struct_file, struct)
+    try:
+        layout.field(by)
+    except KeyError as e:
+        raise BadParameter(e.args[0], param_hint="--by") from e
+    with console.status(f"Sorting {path.name} by {by}..."):
+        out = sort.sort_dat(
+            path,
+            layout,
+            by,
+            desc=desc,
+            output=output_path,
+            memory=memory * 1024 * 1024,
+            tmp_dir=tmp_dir,
+        )
+    console.log(
+        f"[b]Sorted {path.name} by {by}: [magenta]{out.as_uri()}[/magenta][/b]",
+        justify="center",
+    )
+
+
+@app.command(name="gen")
+def gen_dat(
+    struct_file: Path = STRUCT_FILE,
+    struct: Optional[str] = Option(
+        None,
+        "--struct",
+        "-s",
+        help="El nombre del struct, por default se generan todos los del archivo",
+    ),
+    rows: int = Option(..., "--rows", "-n", min=0, help="Cantidad de registros"),
+    seed: Optional[int] = Option(
+        None, "--seed", help="Semilla, la misma semilla genera los mismos datos"
+    ),
+    ranges: Optional[List[str]] = Option(
+        None,
+        "--range",
+        "-r",
+        help="Rango de un campo numérico, ej: --range idVue=1:500",
+    ),
+    unique: Optional[List[str]] = Option(
+        None, "--unique", "-u", help="Campo que no puede repetir valores"
+    ),
+    output_folder: Path = Option(
+        Path("output_files"),
+        "--output",
+        "-o",
+        file_okay=False,
+        help="Carpeta donde se escriben los .dat",
+    ),
+) -> None:
+    """
+    Genera --rows registros al azar por cada struct del archivo y los escribe
+    en output_files/[STRUCT].dat, de a partes, sin tenerlos todos en memoria.
+
+    Con --seed siempre se generan los mismos registros.
+
+    Con --range CAMPO=MIN:MAX se limitan los valores de un campo numérico y
+    con --unique CAMPO no se repiten sus valores. Ambos se pueden repetir.
+    """
+    from ayed.exceptions import NoStructException
+    from ayed.gen import Generator
+    from ayed.gen import parse_range as parse_field_range
+    from ayed.parser import Tokenizer
+    from ayed.utils import console
+
+    if struct is None:
+        try:
+            layouts = Tokenizer.from_path(struct_file)
+        except NoStructException as e:
+            raise BadParameter(str(e), param_hint="-f") from e
+    else:
+        layouts = [load_struct(struct_file, struct)]
+    try:
+        bounds = dict(parse_field_range(value) for value in ranges or [])
+    except ValueError as e:
+        raise BadParameter(str(e), param_hint="--range") from e
+    fields = {field.name for layout in layouts for field in layout}
+    for name in (*bounds, *(unique or [])):
+        if name not in fields:
+            raise BadParameter(f"no struct has a field {name}")
+    output_folder.mkdir(parents=True, exist_ok=True)
+    for layout in layouts:
+        names = {field.name for field in layout}
+        try:
+            generator = Generator(
+                layout,
+                rows,
+                seed=seed,
+                ranges={k: v for k, v in bounds.items() if k in names},
+                unique={name for name in unique or [] if name in names},
+            )
+            path = output_folder / f"{layout.name}.dat"
+            with console.status(f"Generating {rows} {layout.name} records..."):
+                generator.write(path)
+        except (ValueError, NoStructException) as e:
+            raise BadParameter(str(e)) from e
+        console.log(
+            f"[b]Wrote {rows} records to [magenta]{path.absolute().as_uri()}[/magenta]",
+            justify="center",
+        )
+
+
+@app.command(name="watch")
+def watch(
+    path: Path = Argument(
+        DEFAULT_EXCEL,
+        help="El .xlsx a vigilar",
+        dir_okay=False,
+        resolve_path=True,
+    ),
+    structs: Optional[List[str]] = Option(
+        None,
+        "--coll",
+        "-c",
+        help="Archivos, carpetas o globs con structs a regenerar, como ayed coll",
+    ),
+    output_folder: Path = Option(
+        Path("output_files"),
+        "--output",
+        "-o",
+        file_okay=False,
+        help="La carpeta en la que se escriben los .dat y .hpp",
+    ),
+    polling: bool = Option(
+        False, "--polling", help="Revisa los archivos cada tanto en vez de usar inotify"
+    ),
+    interval: float = Option(
+        0.5, "--interval", min=0.05, help="Segundos entre revisiones con --polling"
+    ),
+) -> None:
+    """
+    Vigila el excel (y con -c o --coll [ARCHIVOS] los structs) y cada vez que
+    cambian vuelve a escribir lo que depende de ellos: los .dat de las solapas
+    que cambiaron y los .hpp de los structs que cambiaron.
+
+    El programa queda abierto, así que no vuelve a cargar pandas ni el excel
+    entero en cada cambio. Usa inotify en Linux y si no está disponible (o con
+    --polling) revisa los archivos cada --interval segundos.
+
+    Se termina con Ctrl+C.
+    """
+    from ayed.utils import console
+    from ayed.watch import Session, watcher
+
+    workbook = path if path.exists() else None
+    if workbook is None and not structs:
+        raise BadParameter(f"{path.name} doesn't exist and there's no --coll")
+    session = Session(workbook, structs or [], output_folder)
+    with watcher(polling, interval) as w:
+        console.log(f"[b]Watching with {type(w).__name__}, Ctrl+C to stop")
+        try:
+            session.loop(w)
+        except KeyboardInterrupt:
+            console.log("[b white]Done! Bye! 👋", justify="center")
 
 
 if __name__ == "__main__":
@@ -1,16 +1,18 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Iterator, Union
+from typing import TYPE_CHECKING, Iterator, Optional, Union
 
-from attr import dataclass
-from pandas import DataFrame, Series
+from attr import dataclass, field
 
 from ayed.classes import Struct, Variable
 
+if TYPE_CHECKING:
+    from pandas import DataFrame, Series
+
 PathLike = Union[Path, str]
-PandasDF = Union[DataFrame, dict[str, DataFrame]]
-Sheet = Union[DataFrame, Series]
+PandasDF = Union["DataFrame", dict[str, "DataFrame"]]
+Sheet = Union["DataFrame", "Series"]
 Variables = list[Variable]
 
 
@@ -26,15 +28,47 @@ class File:
     filenames: list[str]
     structs: list[str]
     variables: Variables
+    # struct_id -> its variables, kept up to date by File.add and File.struct
+    index: dict[int, Variables] = field(factory=dict, repr=False, eq=False)
+    compiled: dict[int, Struct] = field(factory=dict, repr=False, eq=False)
+    indexed: int = field(default=0, repr=False, eq=False)  # len(variables) seen
+    # the list that was indexed, a new one has to be indexed from scratch. Not
+    # its id(), which a new list can get once the old one is gone
+    indexed_list: Optional[Variables] = field(default=None, repr=False, eq=False)
+
+    def add(self, var: Variable) -> None:
+        """Adds a variable, indexing it by the struct it belongs to"""
+        self.variables.append(var)
+        self.reindex()
+
+    def reindex(self) -> None:
+        """
+        Indexes the variables added since the last time, be it with add or by
+        hand, and forgets the layouts of the structs they belong to.
+        """
+        replaced = self.indexed_list is not self.variables
+        if replaced or self.indexed > len(self.variables):  # or some removed
+            self.index.clear()
+            self.compiled.clear()
+            self.indexed, self.indexed_list = 0, self.variables
+        for var in self.variables[self.indexed :]:
+            if var.struct_id is not None:
+                self.index.setdefault(var.struct_id, []).append(var)
+                self.compiled.pop(var.struct_id, None)
+        self.indexed = len(self.variables)
+
+    def struct(self, i: int) -> Struct:
+        """Returns the i-th struct, building its layout only once"""
+        self.reindex()  # a no-op unless the variables changed
+        if i not in self.compiled:
+            self.compiled[i] = Struct(
+                name=self.structs[i], fields=self.index.get(i, [])
+            )
+        return self.compiled[i]
 
     def __iter__(self) -> Iterator[tuple[str, Struct]]:
         for i, fname in enumerate(self.filenames):
-            vars: list[Variable] = []
-            for var in self.variables:
-                if var.struct_id == i:
-                    vars.append(var)
-                    continue
-            yield fname, Struct(name=self.structs[i], fields=vars)
+            yield fname, self.struct(i)
 
 
 Files = list[dict[str, File]]
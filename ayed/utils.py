@@ -1,18 +1,40 @@
 from __future__ import annotations
 
+import sys
 from contextlib import contextmanager
+from itertools import count
 from pathlib import Path
 from tempfile import mkstemp
-from typing import Any, Iterable, Optional
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, Final, Iterable, Iterator, Optional, Sequence
 from unicodedata import category, normalize
 
 from rich.console import Console
-from rich.table import Table
-from rich.traceback import install
+
+if TYPE_CHECKING:
+    from rich.table import Table
 
 console = Console()
 
-install(console=console)  # install traceback hook
+# render_records logs a table every PAGE_SIZE records
+PAGE_SIZE: Final = 50
+
+
+def rich_excepthook(
+    exc_type: type[BaseException], exc: BaseException, tb: TracebackType | None
+) -> None:
+    """
+    sys.excepthook that only imports rich.traceback once something actually
+    blows up, so that importing ayed doesn't pay for it on every run.
+    """
+    from rich.traceback import install
+
+    # a quiet console (machine readable output) would swallow the traceback
+    install(console=Console(stderr=True) if console.quiet else console)
+    sys.excepthook(exc_type, exc, tb)
+
+
+sys.excepthook = rich_excepthook
 
 
 def add_includes(*, libs: list[str]) -> str:
@@ -29,35 +51,46 @@ def add_includes(*, libs: list[str]) -> str:
     return "\n".join(lib) + "\n"
 
 
+def iter_cfn(
+    ret: str,
+    name: str,
+    *,
+    params: Optional[Iterable[str]] = None,
+    body: Optional[Iterable[str]] = None,
+    vret: Optional[str] = None,
+) -> Iterator[str]:
+    """Yields a Cpp function a line at a time, see build_cfn"""
+    if ret == "string":
+        ret = "std::string"
+    # returntype functionName(type varname, for all params)
+    yield f'{ret} {name}({", ".join(params or [])})\n{{\n'
+    sep = "  "
+    for line in body or ():  # function body
+        yield f"{sep}{line}"
+        sep = ";\n  "
+    yield ";\n" if sep != "  " else "\n"
+    yield f"  return {vret};\n" if ret != "void" else "\n"  # return varname;
+    yield "};\n"
+
+
 def build_cfn(
     ret: str,
     name: str,
     *,
-    params: Optional[list[str]] = None,
-    body: Optional[list[str]] = None,
+    params: Optional[Iterable[str]] = None,
+    body: Optional[Iterable[str]] = None,
     vret: Optional[str] = None,
 ) -> str:
     """Builds a Cpp function"""
-    if body:
-        body = ["  " + line for line in body]
-    if ret == "string":
-        ret = "std::string"
-    return "\n".join(
-        [
-            # returntype functionName(type varname, for all params)
-            f'{ret} {name}({", ".join(params or [])})',
-            "{",  # {
-            (";\n".join(body) + ";" if body else ""),  # function body
-            (f"  return {vret};" if ret != "void" else ""),
-            "};\n",  # return varname;  # };
-        ]
-    )
+    return "".join(iter_cfn(ret, name, params=params, body=body, vret=vret))
 
 
 def create_table(
     title: str, columns: Iterable[Any], rows: Iterable[Any] = None
 ) -> Table:
     """Creates a table to print out all the written structs"""
+    from rich.table import Table
+
     table = Table(
         highlight=True,
         title=title,
@@ -73,6 +106,31 @@ def create_table(
     return table
 
 
+def render_records(
+    title: str,
+    columns: Iterable[str],
+    records: Iterable[Sequence[Any]],
+    *,
+    start: int = 0,
+    index: Optional[Iterable[int]] = None,
+    page_size: int = PAGE_SIZE,
+) -> None:
+    """
+    Logs `records` in tables of at most `page_size` rows, each one as soon as
+    it fills up, so only a page is ever held in memory. Rows are numbered
+    from `start`, or by `index` if given.
+    """
+    columns = ["#", *columns]
+    page = create_table(title, columns=columns)
+    for i, record in zip(index or count(start), records):
+        page.add_row(str(i), *[str(value) for value in record])
+        if page.row_count == page_size:
+            console.log(page, justify="center")
+            page = create_table("", columns=columns)
+    if page.row_count or page.title:  # nothing was logged yet
+        console.log(page, justify="center")
+
+
 def sanitize_name(fname: str) -> str:
     """Removes all spaces, diacritics and tildes from a str"""
     return "".join(
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from time import monotonic, perf_counter, sleep
+from typing import Final, Iterable, Iterator, Optional
+
+import attr
+
+from ayed.coll import SUFFIXES, coll, expand
+from ayed.utils import console
+
+# edits come in bursts (excel writes a temp file, then renames it), a change
+# is handled once nothing else changed for this long
+DEBOUNCE: Final = 0.3
+INTERVAL: Final = 0.5  # seconds between checks when polling
+# parts of a workbook that every sheet depends on, see sheet_digests
+SHARED: Final = ("xl/sharedStrings.xml", "xl/styles.xml")
+MAIN: Final = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL: Final = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+# inotify(7)
+IN_CLOSE_WRITE: Final = 0x008
+IN_MOVED_FROM: Final = 0x040
+IN_MOVED_TO: Final = 0x080
+IN_CREATE: Final = 0x100
+IN_DELETE: Final = 0x200
+IN_Q_OVERFLOW: Final = 0x4000
+IN_EVENTS: Final = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+def sheet_digests(path: Path) -> dict[str, int]:
+    """
+    Maps every sheet of an .xlsx to the crc of its xml, which the zip already
+    holds, so nothing is decompressed. The "" key covers the shared strings
+    and styles: when they change, any sheet might have. Returns {} for
+    workbooks it can't make sense of.
+    """
+    from xml.etree.ElementTree import ParseError, fromstring
+    from zipfile import BadZipFile, ZipFile
+
+    try:
+        with ZipFile(path) as zf:
+            crcs = {info.filename: info.CRC for info in zf.infolist()}
+            workbook = fromstring(zf.read("xl/workbook.xml"))
+            rels = fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    except (OSError, KeyError, BadZipFile, ParseError):
+        return {}
+    targets = {rel.get("Id"): rel.get("Target", "") for rel in rels}
+    digests = {"": hash(tuple(crcs.get(part) for part in SHARED))}
+    for sheet in workbook.iter(f"{MAIN}sheet"):
+        target = targets.get(sheet.get(f"{REL}id"), "")
+        member = target[1:] if target.startswith("/") else f"xl/{target}"
+        if member not in crcs:
+            return {}
+        digests[sheet.get("name", "")] = crcs[member]
+    return digests
+
+
+def changed_sheets(old: dict[str, int], new: dict[str, int]) -> Optional[list[str]]:
+    """The sheets whose digest changed, None when all of them have to be read"""
+    if not old or not new or old[""] != new[""]:
+        return None
+    return [name for name, crc in new.items() if name and old.get(name) != crc]
+
+
+class Watcher(ABC):
+    """Tells which of the watched files changed"""
+
+    @abstractmethod
+    def watch(self, paths: Iterable[Path]) -> None:
+        """Watches `paths` (files or directories) instead of the previous ones"""
+
+    @abstractmethod
+    def wait(self, timeout: Optional[float]) -> set[Path]:
+        """
+        Returns the paths that changed, waiting up to `timeout` seconds (or
+        forever) for one to. Directories report the files that changed in them.
+        """
+
+    def close(self) -> None:
+        pass
+
+    def changes(self, debounce: float = DEBOUNCE) -> Iterator[set[Path]]:
+        """Yields what changed in every burst of changes"""
+        while True:
+            changed = self.wait(None)
+            while more := self.wait(debounce):  # until the writes settle down
+                changed |= more
+            if changed:
+                yield changed
+
+    def __enter__(self) -> "Watcher":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+@attr.s(slots=True)
+class PollingWatcher(Watcher):
+    """Checks the mtime and size of every path each `interval` seconds"""
+
+    interval: float = attr.ib(default=INTERVAL)
+    stats: dict[Path, Optional[tuple[int, int]]] = attr.ib(factory=dict, repr=False)
+
+    def watch(self, paths: Iterable[Path]) -> None:
+        self.stats = {path: self._stat(path) for path in paths}
+
+    def wait(self, timeout: Optional[float]) -> set[Path]:
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            left = self.interval if deadline is None else deadline - monotonic()
+            sleep(max(0.0, min(self.interval, left)))
+            changed = set()
+            for path, stat in self.stats.items():
+                if (current := self._stat(path)) != stat:
+                    self.stats[path] = current
+                    changed.add(path)
+            if changed or (deadline is not None and monotonic() >= deadline):
+                return changed
+
+    @staticmethod
+    def _stat(path: Path) -> Optional[tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+
+@attr.s(slots=True)
+class InotifyWatcher(Watcher):
+    """
+    Linux's inotify, through libc. Watches the directories the files are in,
+    since editors (and excel) save by writing a new file and renaming it.
+    """
+
+    fd: int = attr.ib()
+    libc: object = attr.ib(repr=False)
+    dirs: dict[int, Path] = attr.ib(factory=dict)
+
+    @classmethod
+    def open(cls) -> "InotifyWatcher":
+        """Raises OSError where there's no inotify"""
+        import ctypes
+        from ctypes.util import find_library
+
+        try:
+            libc = ctypes.CDLL(find_library("c") or "libc.so.6", use_errno=True)
+            init = libc.inotify_init1
+        except (OSError, AttributeError) as e:
+            raise OSError("inotify isn't available") from e
+        fd = init(os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        return cls(fd, libc)
+
+    def watch(self, paths: Iterable[Path]) -> None:
+        dirs = {path if path.is_dir() else path.parent for path in paths}
+        for wd, folder in list(self.dirs.items()):
+            if folder not in dirs:
+                self.libc.inotify_rm_watch(self.fd, wd)  # type: ignore
+                del self.dirs[wd]
+        for folder in dirs - set(self.dirs.values()):
+            wd = self.libc.inotify_add_watch(  # type: ignore
+                self.fd, os.fsencode(folder), IN_EVENTS
+            )
+            if wd >= 0:
+                self.dirs[wd] = folder
+
+    def wait(self, timeout: Optional[float]) -> set[Path]:
+        from select import select
+        from struct import unpack_from
+
+        if not select([self.fd], [], [], timeout)[0]:
+            return set()
+        buffer, offset = os.read(self.fd, 64 * 1024), 0
+        changed: set[Path] = set()
+        while offset < len(buffer):
+            # struct inotify_event { int wd; uint32_t mask, cookie, len; name }
+            wd, mask, _, size = unpack_from("iIII", buffer, offset)
+            name = buffer[offset + 16 : offset + 16 + size].rstrip(b"\0")
+            offset += 16 + size
+            if mask & IN_Q_OVERFLOW:  # events were lost, anything could've changed
+                changed.update(self.dirs.values())
+            elif wd in self.dirs:
+                folder = self.dirs[wd]
+                changed.add(folder / os.fsdecode(name) if name else folder)
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def watcher(polling: bool = False, interval: float = INTERVAL) -> Watcher:
+    """inotify when it's available, polling otherwise"""
+    if not polling:
+        try:
+            return InotifyWatcher.open()
+        except OSError:
+            pass
+    return PollingWatcher(interval)
+
+
+@attr.s(slots=True)
+class Session:
+    """
+    What `ayed watch` keeps between changes: the digests of the sheets it
+    last wrote, so that only the ones that changed are read again. Modules
+    and compiled layouts are reused just by living in the same process.
+    """
+
+    workbook: Optional[Path] = attr.ib()
+    headers: list[str] = attr.ib(factory=list)
+    output_folder: Path = attr.ib(default=Path("output_files"))
+    sheets: dict[str, int] = attr.ib(factory=dict, repr=False)
+
+    def paths(self) -> list[Path]:
+        """The files and folders to watch"""
+        paths = [self.workbook] if self.workbook else []
+        paths += [path for path in expand(self.headers) if not self.generated(path)]
+        paths += [Path(p).resolve() for p in self.headers if Path(p).is_dir()]
+        return paths
+
+    def generated(self, path: Path) -> bool:
+        """Whether `path` is in the output folder, where the session writes"""
+        return path.resolve().is_relative_to(self.output_folder.resolve())
+
+    def run(self, changed: Optional[set[Path]] = None) -> None:
+        """Rebuilds what depends on `changed`, everything when it's None"""
+        if changed is not None:  # its own writes don't count as changes
+            changed = {path for path in changed if not self.generated(path)}
+        excel = self.workbook and (changed is None or self.workbook in changed)
+        structs = self.headers and (
+            changed is None
+            or any(path.suffix in SUFFIXES or path.is_dir() for path in changed)
+        )
+        if not (excel or structs):  # ex: excel's ~$lock files
+            return
+        start = perf_counter()
+        if excel:
+            self.excel()
+        if structs:
+            self.structs()
+        console.log(f"[dim]Done in {perf_counter() - start:.2f}s, watching...")
+
+    def excel(self) -> list[str]:
+        """Writes the .dat of the sheets that changed, returns the rebuilt ones"""
+        from ayed.excel import Excel
+        from ayed.printer import ExcelPrinter
+
+        assert self.workbook is not None
+        digests = sheet_digests(self.workbook)
+        sheets = changed_sheets(self.sheets, digests)
+        if sheets == []:
+            return []
+        rebuilt = []
+        for sheet in [None] if sheets is None else sheets:
+            excel = Excel(self.workbook, sheet=sheet)
+            with ExcelPrinter(excel, output_folder=self.output_folder) as printer:
+                rebuilt += printer.to_file()
+        self.sheets = digests  # only once everything was written
+        return rebuilt
+
+    def structs(self) -> list[str]:
+        """Writes the headers of the files that changed, returns them"""
+        rebuilt = []
+        for header in coll(self.headers, self.output_folder):
+            if header.error and header.parsed:  # not again for every change
+                console.log(f"[yellow]{header.source.name}: {header.error}")
+            elif header.rebuilt:
+                console.log(f"[b]Wrote [magenta]{header.output}[/magenta]")
+                rebuilt.append(str(header.output))
+        return rebuilt
+
+    def loop(self, watcher: Watcher) -> None:
+        """Runs once, then after every change until interrupted"""
+        self.attempt(None)
+        watcher.watch(self.paths())
+        for changed in watcher.changes():
+            self.attempt(changed)
+            watcher.watch(self.paths())  # new headers might've shown up
+
+    def attempt(self, changed: Optional[set[Path]]) -> None:
+        """A half saved workbook or a typo in a header don't stop the watch"""
+        try:
+            self.run(changed)
+        except Exception as e:  # noqa: B902
+            console.log(f"[red]{type(e).__name__}: {e}")
+            console.log("[dim]Watching, it'll be tried again on the next change...")
@@ -0,0 +1,263 @@
+"""
+Benchmarks for every stage of `ayed files`, run over synthetic workbooks.
+
+    $ python -m tests.benchmarks.bench --save              # take the baseline
+    $ python -m tests.benchmarks.bench                     # compare to baseline
+    $ python -m tests.benchmarks.bench --rows 100000       # a single size
+
+Each size generates a workbook with `--sheets` sheets of `--structs` structs
+with `rows` records each, plus a header with as many structs, and times
+Excel.read (pandas and streaming), Tokenizer.from_str, Struct.pack,
+ExcelPrinter.to_file and Struct.unpack separately, recording throughput and
+the tracemalloc peak of each. Timings slower than the baseline by more than
+--tolerance are reported as regressions and make the run exit with 1.
+
+Timings (which include the tracing overhead) only mean something next to
+others taken on the same machine, so the baseline isn't part of the repo:
+take it locally with --save, before the changes to measure. It records the
+machine it was taken on, and a baseline from another one isn't compared to.
+
+The baseline only has 1e3 and 1e4 rows: reading the workbook takes about
+a minute for 1e4 rows under tracemalloc and grows linearly, so 1e5 takes
+over ten minutes and 1e6 a couple of hours. Larger sizes are opt-in with
+--rows (--save adds them to the baseline next to the others), sizes that
+aren't in the baseline are reported without being compared.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import platform
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from random import Random
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Any, Iterator, List, Optional
+
+from openpyxl import Workbook
+from typer import Option, Typer
+
+from ayed.excel import Excel
+from ayed.output import Format, output
+from ayed.parser import Tokenizer
+from ayed.printer import ExcelPrinter
+from ayed.utils import console
+
+# differences under this many seconds are noise, not regressions
+NOISE = 0.05
+BASELINE = Path(__file__).with_name("baseline.json")
+DEFAULT_ROWS = [1_000, 10_000]  # larger sizes take too long, see above
+STAGES = [
+    "Excel.read",
+    "Excel.read (stream)",
+    "Tokenizer.from_str",
+    "Struct.pack",
+    "ExcelPrinter.to_file",
+    "Struct.unpack",
+]
+
+# (type, name) of every field of the synthetic structs
+FIELDS = [
+    ("int", "id"),
+    ("char[20]", "descr"),
+    ("double", "precio"),
+    ("int", "cant"),
+    ("char[8]", "codigo"),
+]
+
+app = Typer(add_completion=False)
+
+
+def machine() -> dict[str, Any]:
+    """What a baseline's timings depend on, besides ayed itself"""
+    return {
+        "node": platform.node(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+
+def write_workbook(path: Path, *, rows: int, sheets: int, structs: int) -> None:
+    """Writes a workbook laid out like AlgoritmosFiles.xlsx"""
+    rand = Random(rows)
+    wb = Workbook(write_only=True)
+    for s in range(sheets):
+        ws = wb.create_sheet(f"Sheet {s}")
+        header: list[list[Any]] = [[], [], [], []]
+        for k in range(structs):
+            for i, (ctype, name) in enumerate(FIELDS):
+                first = i == 0
+                header[0].append(f"FILE{s}_{k}.dat" if first else None)
+                header[1].append(f"struct S{s}_{k}" if first else None)
+                header[2].append(ctype)
+                header[3].append(name)
+            for row in header:
+                row.append(None)  # an empty column between structs
+        ws.append([])  # the first row is read as the column names
+        for row in header:
+            ws.append(row)
+        for r in range(rows):
+            record = [
+                r,
+                f"item {rand.randrange(10**6)}",
+                rand.random() * 1000,
+                rand.randrange(100),
+                f"C{r % 9999}",
+                None,
+            ]
+            ws.append(record * structs)
+    wb.save(path)
+
+
+def struct_header(n: int) -> str:
+    """C source with `n` structs shaped like the ones in the workbook"""
+    lines = []
+    for ctype, name in FIELDS:
+        ctype, _, size = ctype.partition("[")
+        lines.append(f"  {ctype} {name}{'[' + size if size else ''};")
+    fields = "\n".join(lines)
+    return "\n".join(f"struct S{i} {{\n{fields}\n}};" for i in range(n))
+
+
+@contextmanager
+def measure(results: dict[str, Any], stage: str, rows: int) -> Iterator[None]:
+    tracemalloc.start()
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[stage] = {
+            "seconds": round(elapsed, 4),
+            "rows_per_second": round(rows / elapsed) if elapsed else None,
+            "peak_bytes": peak,
+        }
+
+
+def run(rows: int, sheets: int, structs: int) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    total = rows * sheets * structs
+    with TemporaryDirectory(prefix="ayed-bench-") as tmp:
+        xlsx, out = Path(tmp) / "bench.xlsx", Path(tmp) / "output_files"
+        write_workbook(xlsx, rows=rows, sheets=sheets, structs=structs)
+        with measure(results, "Excel.read", total):
+            Excel(xlsx).read()
+        with measure(results, "Excel.read (stream)", total):
+            Excel(xlsx, stream=True).read()
+        header = struct_header(max(10, rows // 100))
+        with measure(results, "Tokenizer.from_str", header.count("struct")):
+            Tokenizer.from_str(header)
+        # not streamed: a streaming printer reads the workbook again in to_file
+        excel = Excel(xlsx)
+        with ExcelPrinter(excel, output_folder=out, incremental=False) as printer:
+            structs_ = [struct for _, struct in printer._structs()]
+            with measure(results, "Struct.pack", total):
+                for struct in structs_:
+                    for _ in struct.iter_packed():
+                        pass
+            with measure(results, "ExcelPrinter.to_file", total):
+                printer.to_file()
+            quiet = console.quiet
+            with open(os.devnull, "w") as devnull:
+                output.use(Format.ndjson, devnull)  # decoding, without rich
+                try:
+                    with measure(results, "Struct.unpack", total):
+                        printer.to_table()
+                finally:
+                    output.use(Format.rich)
+                    console.quiet = quiet
+    return results
+
+
+def compare(
+    current: dict[str, Any], baseline: dict[str, Any], tolerance: float
+) -> List[str]:
+    """Returns a line for every stage slower than the baseline + tolerance"""
+    regressions = []
+    for size, stages in current.items():
+        for stage, result in stages.items():
+            base = baseline.get(size, {}).get(stage)
+            if not base:
+                continue
+            limit = max(base["seconds"] * (1 + tolerance), base["seconds"] + NOISE)
+            if result["seconds"] > limit:
+                regressions.append(
+                    f"{size} rows - {stage}: {result['seconds']}s"
+                    f" > {base['seconds']}s (+{tolerance:.0%})"
+                )
+    return regressions
+
+
+def report(results: dict[str, Any]) -> None:
+    from ayed.utils import create_table
+
+    table = create_table(
+        "ayed benchmarks",
+        columns=["rows", "stage", "seconds", "rows/s", "peak MiB"],
+    )
+    for size, stages in results.items():
+        for stage, r in stages.items():
+            table.add_row(
+                size,
+                stage,
+                f"{r['seconds']:.3f}",
+                f"{r['rows_per_second'] or 0:,}",
+                f"{r['peak_bytes'] / 2**20:.1f}",
+            )
+    console.print(table)
+
+
+@app.command()
+def main(
+    rows: Optional[List[int]] = Option(
+        None, "--rows", "-r", help="Rows per struct, can be repeated"
+    ),
+    sheets: int = Option(4, help="Sheets per workbook"),
+    structs: int = Option(3, help="Structs per sheet"),
+    tolerance: float = Option(0.5, help="Allowed slowdown over the baseline"),
+    save: bool = Option(False, "--save", help="Store the results as the baseline"),
+    baseline: Path = Option(BASELINE, help="The baseline file"),
+    results_file: Optional[Path] = Option(
+        None, "--output", "-o", help="Also write the results to this file"
+    ),
+) -> None:
+    console.quiet = True  # no logs from ayed itself
+    results = {str(n): run(n, sheets, structs) for n in rows or DEFAULT_ROWS}
+    console.quiet = False
+    report(results)
+    if results_file:
+        results_file.write_text(json.dumps(results, indent=2) + "\n")
+    stored = json.loads(baseline.read_text()) if baseline.exists() else {}
+    same_machine = stored.pop("machine", None) == machine()
+    if save:
+        stored = {**stored, **results} if same_machine else results
+        baseline.write_text(
+            json.dumps({"machine": machine(), **stored}, indent=2) + "\n"
+        )
+        console.print(f"Saved baseline to {baseline}")
+        return
+    if not stored:
+        console.print("No baseline to compare to, run with --save first.")
+        return
+    if not same_machine:
+        console.print(
+            "The baseline was taken on another machine, its timings can't be"
+            " compared to these. Run with --save to take it on this one."
+        )
+        return
+    regressions = compare(results, stored, tolerance)
+    for line in regressions:
+        console.print(f"[b red]Regression[/b red] {line}")
+    if regressions:
+        raise SystemExit(1)
+    console.print("[b green]No regressions[/b green]")
+
+
+if __name__ == "__main__":
+    app()
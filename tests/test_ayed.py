@@ -39,11 +39,19 @@ def test_tfrom_str() -> None:
     result = """Equipo equipoFromString(std::string s)
 {
   Equipo x{};
-  std::string t0 = getTokenAt(s, '-', 0);
+  size_t pos = 0;
+  auto token = [&]()
+  {
+    size_t end = s.find('-', pos);
+    std::string t = s.substr(pos, end - pos);
+    pos = end == std::string::npos ? s.size() : end + 1;
+    return t;
+  };
+  std::string t0 = token();
   x.idEq = stoi(t0);
-  std::string t1 = getTokenAt(s, '-', 1);
+  std::string t1 = token();
   strcpy(x.nombre, t1.c_str());
-  std::string t2 = getTokenAt(s, '-', 2);
+  std::string t2 = token();
   x.puntos = stoi(t2);
   return x;
 };
@@ -74,11 +82,19 @@ def test_from_str() -> None:
     result = """Equipo equipoFromString(std::string s)
 {
   Equipo x{};
-  std::string t0 = getTokenAt(s, '-', 0);
+  size_t pos = 0;
+  auto token = [&]()
+  {
+    size_t end = s.find('-', pos);
+    std::string t = s.substr(pos, end - pos);
+    pos = end == std::string::npos ? s.size() : end + 1;
+    return t;
+  };
+  std::string t0 = token();
   x.idEq = stoi(t0);
-  std::string t1 = getTokenAt(s, '-', 1);
+  std::string t1 = token();
   strcpy(x.nombre, t1.c_str());
-  std::string t2 = getTokenAt(s, '-', 2);
+  std::string t2 = token();
   x.puntos = stoi(t2);
   return x;
 };
@@ -95,21 +111,43 @@ def test_from_str() -> None:
 def test_to_str() -> None:
     result = """std::string equipoToString(Equipo e)
 {
-
-  return std::to_string(e.idEq)+'-'+(e.nombre)+'-'+std::to_string(e.puntos);
+  std::string out;
+  out.reserve(62);
+  out += std::to_string(e.idEq);
+  out += '-';
+  out += e.nombre;
+  out += '-';
+  out += std::to_string(e.puntos);
+  return out;
 };
 """
     t = Tokenizer.from_path(Path("tests/structs/structs.cpp"))
     assert t[0].to_str() == result
 
 
+def test_to_str_doesnt_shadow_the_parameter() -> None:
+    (sale,) = Tokenizer.from_str("struct Sale { int id; std::string desc; };")
+    to_str = sale.to_str()
+    assert "std::string saleToString(Sale s)" in to_str
+    assert "std::string s;" not in to_str
+    assert "out += std::to_string(s.id);" in to_str and "out += s.desc;" in to_str
+
+
 def test_fromstr_with_structs() -> None:
     result = """NEquipo nequipoFromString(std::string s)
 {
   NEquipo x{};
-  std::string t0 = getTokenAt(s, '-', 0);
+  size_t pos = 0;
+  auto token = [&]()
+  {
+    size_t end = s.find('-', pos);
+    std::string t = s.substr(pos, end - pos);
+    pos = end == std::string::npos ? s.size() : end + 1;
+    return t;
+  };
+  std::string t0 = token();
   x.e = equipoFromString(t0);
-  std::string t1 = getTokenAt(s, '-', 1);
+  std::string t1 = token();
   x.npuntos = stoi(t1);
   return x;
 };
@@ -121,9 +159,106 @@ def test_fromstr_with_structs() -> None:
 def test_tostr_with_structs() -> None:
     result = """std::string nequipoToString(NEquipo n)
 {
-
-  return equipoToString(n.e)+'-'+std::to_string(n.npuntos);
+  std::string out;
+  out.reserve(41);
+  out += equipoToString(n.e);
+  out += '-';
+  out += std::to_string(n.npuntos);
+  return out;
 };
 """
     t = Tokenizer.from_path(Path("tests/structs/structs3.cpp"))
     assert str(t[0].to_str()) == result
+
+
+def test_struct_printer_streams() -> None:
+    from io import StringIO
+    from random import seed
+
+    from ayed.printer import StructPrinter
+
+    structs = Tokenizer.from_str(
+        "struct Equipo { int idEq; char nombre[20]; };"
+        "struct NEquipo { Equipo e; int npuntos; };"
+    )
+    built: list[str] = []
+    chunks = StructPrinter(built.append(s) or s for s in structs).iter_str()
+    next(chunks)  # the includes
+    next(chunks)
+    assert built == [structs[0]]  # structs are built one at a time
+    sink = StringIO()
+    seed(1)
+    StructPrinter(structs).write(sink)
+    seed(1)
+    assert sink.getvalue() == StructPrinter(structs).to_str()
+
+
+def test_io() -> None:
+    from ayed.printer import StructPrinter
+
+    equipo, nequipo = Tokenizer.from_str(
+        "struct Equipo { int idEq; char nombre[20]; double puntos; };"
+        "struct NEquipo { Equipo e; int npuntos; };"
+    )
+    assert equipo.binary and not nequipo.binary
+    io = equipo.io()
+    assert f"const size_t EQUIPO_SIZE = {equipo.size};" in io
+    for fn in ("Read(", "Write(", "ReadAll(", "WriteAll(", "Seek(", "Count("):
+        assert f"equipo{fn}" in io
+    assert "std::vector<Equipo> equipoReadAll(FILE* f)" in io
+    code = StructPrinter([equipo, nequipo]).to_str()
+    assert "#include <vector>" in code and "nequipoRead" not in code
+    assert "EQUIPO_SIZE" not in StructPrinter([equipo], io=False).to_str()
+
+
+def test_layouts() -> None:
+    from ayed.exceptions import NoStructException
+
+    (numbers,) = Tokenizer.from_str(
+        "struct N { unsigned int a; long long b; short int c; unsigned d;"
+        " signed char e; unsigned long long int f; uint16_t g; bool h; };"
+    )
+    assert numbers.cstruct.format == "IqhIbQH?"
+    (item,) = Tokenizer.from_str("struct Item { int id; std::string d; Equipo e; };")
+    assert "itemToString" in item.to_str() and not item.binary  # no layout needed
+    with raises(NoStructException, match="d is a string"):
+        item.size
+
+
+def test_separator() -> None:
+    equipo = Tokenizer.from_path(Path("tests/structs/structs.cpp"))[0]
+    assert "out += ';';" in equipo.to_str(";")
+    assert "s.find(';', pos)" in equipo.from_str(";")
+    from_str = equipo.from_str("||")
+    assert 's.find("||", pos)' in from_str and "end + 2" in from_str
+
+
+def test_collection() -> None:
+    from ayed.printer import StructPrinter
+
+    (item,) = Tokenizer.from_str(
+        "struct Item { int id; char nom[10]; std::string desc; Equipo e; };"
+    )
+    coll = item.collection()
+    assert "struct ItemColl\n{\n  std::vector<Item> items;\n};\n" in coll
+    for fn in ("Add(", "Reserve(", "Size(", "GetAt(", "SetAt(", "Sort(", "Find("):
+        assert f"itemColl{fn}" in coll
+    assert "int itemCollSearchById(const ItemColl& c, int k)" in coll
+    assert "strncmp(a.nom, k, 10) < 0" in coll
+    assert "itemCollSearchByDesc(const ItemColl& c, const std::string& k)" in coll
+    assert "itemCollSortByE(" not in coll  # structs can't be compared
+    assert "ItemColl" not in StructPrinter([item]).to_str()
+    assert "ItemColl" in StructPrinter([item], collection=True).to_str()
+
+
+def test_fixed_width_types() -> None:
+    (flags,) = Tokenizer.from_str(
+        "struct Flags { bool ok; int8_t a; uint16_t b; int64_t c; size_t d; };"
+    )
+    to_str, from_str = flags.to_str(), flags.from_str()
+    converters = {"ok": "stoi", "a": "stoi", "b": "stoul", "c": "stoll", "d": "stoull"}
+    for i, (field, fn) in enumerate(converters.items()):
+        assert f"out += std::to_string(f.{field});" in to_str
+        assert f"x.{field} = {fn}(t{i});" in from_str
+    assert "ToString(" not in to_str.replace("flagsToString(", "")
+    assert "FromString(" not in from_str.replace("flagsFromString(", "")
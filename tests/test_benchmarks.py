@@ -0,0 +1,41 @@
+from tests.benchmarks.bench import STAGES, compare, run
+
+
+def test_bench_runs_every_stage():
+    results = run(20, sheets=2, structs=2)
+    assert list(results) == STAGES
+    for result in results.values():
+        assert result["seconds"] >= 0
+        assert result["peak_bytes"] > 0
+    # at least the 20 records of a struct, of 44+ bytes each, were packed
+    assert results["Struct.pack"]["peak_bytes"] >= 20 * 44
+
+
+def test_compare_reports_regressions():
+    baseline = {"1000": {"Excel.read": {"seconds": 1.0}}}
+    slow = {"1000": {"Excel.read": {"seconds": 1.6}, "Struct.pack": {"seconds": 9}}}
+    fast = {"1000": {"Excel.read": {"seconds": 1.4}}}
+    assert len(compare(slow, baseline, tolerance=0.5)) == 1
+    assert compare(fast, baseline, tolerance=0.5) == []
+
+
+def test_baseline_from_another_machine_isnt_compared(tmp_path, monkeypatch):
+    import json
+
+    from typer.testing import CliRunner
+
+    from tests.benchmarks import bench
+
+    result = {"seconds": 9, "rows_per_second": 1, "peak_bytes": 1}
+    monkeypatch.setattr(bench, "run", lambda *args: {"Struct.pack": result})
+    baseline = tmp_path / "baseline.json"
+    slow = {"20": {"Struct.pack": result}}
+    fast = {"20": {"Struct.pack": {**result, "seconds": 1}}}
+    baseline.write_text(json.dumps({"machine": {"node": "elsewhere"}, **fast}))
+    args = ["--rows", "20", "--baseline", str(baseline)]
+    ran = CliRunner().invoke(bench.app, args)
+    assert ran.exit_code == 0 and "another machine" in ran.output
+    CliRunner().invoke(bench.app, [*args, "--save"])
+    assert json.loads(baseline.read_text()) == {"machine": bench.machine(), **slow}
+    baseline.write_text(json.dumps({"machine": bench.machine(), **fast}))
+    assert CliRunner().invoke(bench.app, args).exit_code == 1  # a regression
@@ -0,0 +1,33 @@
+from pathlib import Path
+
+import ayed.excel
+from ayed.cache import WorkbookCache
+from ayed.excel import Excel
+
+XLSX = "tests/structs/AlgoritmosFiles.xlsx"
+
+
+def test_cache_hit_skips_parsing(tmp_path: Path, monkeypatch) -> None:
+    cache = WorkbookCache(tmp_path)
+    first = Excel(XLSX, cache=cache).read()
+    assert len(list(tmp_path.glob("*.pickle"))) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("read_excel shouldn't be called on a cache hit")
+
+    monkeypatch.setattr(ayed.excel, "read_excel", fail)
+    second = Excel(XLSX, cache=cache).read()
+    assert first == second
+
+
+def test_cache_keyed_by_sheet(tmp_path: Path) -> None:
+    cache = WorkbookCache(tmp_path)
+    Excel(XLSX, sheet="Emisión de tickets", cache=cache).read()
+    Excel(XLSX, sheet="Compañía de aviación", cache=cache).read()
+    assert len(list(tmp_path.glob("*.pickle"))) == 2
+
+
+def test_cache_eviction(tmp_path: Path) -> None:
+    cache = WorkbookCache(tmp_path, max_bytes=0)
+    Excel(XLSX, cache=cache).read()
+    assert not list(tmp_path.glob("*.pickle"))
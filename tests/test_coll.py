@@ -0,0 +1,103 @@
+from pathlib import Path
+
+from pytest import fixture
+
+from ayed.coll import MANIFEST, coll, expand
+
+VUELO = "struct Vuelo { int idVue; char cod[4]; };\n"
+PASAJERO = "struct Pasajero { int idPas; double saldo; };\n"
+
+
+@fixture
+def headers(tmp_path: Path) -> Path:
+    src = tmp_path / "src"
+    (src / "a").mkdir(parents=True)
+    (src / "b").mkdir()
+    (src / "a" / "vuelo.hpp").write_text(VUELO)
+    (src / "b" / "vuelo.hpp").write_text(PASAJERO)
+    (src / "b" / "main.cpp").write_text("int main() { return 0; }\n")
+    (src / "b" / "notes.txt").write_text(VUELO)
+    return src
+
+
+def test_expand(headers: Path) -> None:
+    found = expand([str(headers), str(headers / "**" / "*.hpp")])
+    assert [p.relative_to(headers).as_posix() for p in found] == [
+        "a/vuelo.hpp",
+        "b/main.cpp",
+        "b/vuelo.hpp",
+    ]
+
+
+def test_coll_writes_one_header_per_file(headers: Path, tmp_path: Path) -> None:
+    out = tmp_path / "out"
+    results = coll([str(headers)], out, jobs=2)
+    assert [(h.output.relative_to(out).as_posix(), h.structs) for h in results] == [
+        ("a/vuelo.hpp", ["Vuelo"]),
+        ("b/main.hpp", None),
+        ("b/vuelo.hpp", ["Pasajero"]),
+    ]
+    assert results[1].error and not results[1].output.exists()
+    assert "Pasajero newPasajero(" in (out / "b" / "vuelo.hpp").read_text()
+    assert (out / MANIFEST).exists()
+
+
+def test_coll_skips_unchanged(headers: Path, tmp_path: Path) -> None:
+    out = tmp_path / "out"
+    coll([str(headers)], out)
+    (headers / "b" / "vuelo.hpp").write_text(PASAJERO + VUELO)
+    rebuilt = [h.output.name for h in coll([str(headers)], out) if h.rebuilt]
+    assert rebuilt == ["vuelo.hpp"]
+    assert "Vuelo newVuelo(" in (out / "b" / "vuelo.hpp").read_text()
+
+    (out / "a" / "vuelo.hpp").unlink()  # deleted outputs are written again
+    assert [h.rebuilt for h in coll([str(headers)], out)] == [True, False, False]
+    assert all(h.rebuilt for h in coll([str(headers)], out, force=True)[::2])
+    assert all(h.rebuilt for h in coll([str(headers)], out, io=False)[::2])
+    assert "vueloRead(" not in (out / "a" / "vuelo.hpp").read_text()
+
+
+def test_coll_remembers_failures(headers: Path, tmp_path: Path) -> None:
+    out = tmp_path / "out"
+    first = coll([str(headers)], out)[1]
+    assert first.parsed and first.error
+    again = coll([str(headers)], out)[1]
+    assert not again.parsed and again.error == first.error  # not parsed again
+
+    (headers / "b" / "main.cpp").write_text(PASAJERO)
+    fixed = coll([str(headers)], out)[1]
+    assert fixed.parsed and fixed.rebuilt and fixed.error is None
+    assert coll([str(headers)], out)[1].error is None
+
+
+def test_coll_ignores_its_own_output(headers: Path) -> None:
+    out = headers / "out"
+    coll([str(headers)], out)
+    assert len(coll([str(headers)], out)) == 3
+
+
+def test_coll_keeps_the_suffix_of_clashing_sources(tmp_path: Path) -> None:
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    (src / "x.cpp").write_text("struct A { int a; };\n")
+    (src / "x.h").write_text("struct B { int b; };\n")
+    (src / "y.hpp").write_text(VUELO)
+    results = coll([str(src)], out)
+    assert [(h.output.relative_to(out).as_posix(), h.structs) for h in results] == [
+        ("x.cpp.hpp", ["A"]),
+        ("x.h.hpp", ["B"]),
+        ("y.hpp", ["Vuelo"]),
+    ]
+    assert "A newA(" in (out / "x.cpp.hpp").read_text()
+    assert "B newB(" in (out / "x.h.hpp").read_text()
+    assert not any(h.rebuilt for h in coll([str(src)], out))
+
+
+def test_coll_records_unreadable_sources(headers: Path, tmp_path: Path) -> None:
+    out = tmp_path / "out"
+    (headers / "a" / "vuelo.hpp").write_bytes("// compañía\n".encode("cp1252") + b"x")
+    results = coll([str(headers)], out, jobs=2)
+    assert "isn't UTF-8" in (results[0].error or "")
+    assert results[2].rebuilt and (out / "b" / "vuelo.hpp").exists()
+    assert (out / MANIFEST).exists()
+    assert coll([str(headers)], out)[0].error == results[0].error
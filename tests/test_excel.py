@@ -1,9 +1,13 @@
-from ayed.excel import Excel
-from ayed.printer import ExcelPrinter
-from typing import Generator
+import pickle
 from pathlib import Path
 from struct import Struct
-from pytest import fixture
+from typing import Generator
+
+from pytest import fixture, raises
+
+from ayed.excel import Excel
+from ayed.printer import ExcelPrinter
+from ayed.utils import console
 
 
 @fixture(autouse=True, scope="module")
@@ -11,6 +15,7 @@ def teardown() -> Generator[None, None, None]:
     yield
     for i in Path("output_files").glob("*.dat"):
         i.unlink()
+    Path("output_files/.manifest.json").unlink(missing_ok=True)
 
 
 def test_struct_write() -> None:
@@ -119,3 +124,315 @@ def test_RUBROS() -> None:
         for tup in should_eq:
             packed_data = s.unpack(prod.read(s.size))
             assert packed_data == tup
+
+
+def test_stream_matches_read_excel() -> None:
+    path = "tests/structs/AlgoritmosFiles.xlsx"
+    streamed = Excel(file_path=path, stream=True).read()
+    loaded = Excel(file_path=path).read()
+    assert len(streamed) == len(loaded) == 2
+    for s_sheet, l_sheet in zip(streamed, loaded):
+        assert s_sheet.keys() == l_sheet.keys()
+        for name, s_file in s_sheet.items():
+            l_file = l_sheet[name]
+            assert s_file.filenames == l_file.filenames
+            assert s_file.structs == l_file.structs
+            for (s_fname, s_struct), (l_fname, l_struct) in zip(s_file, l_file):
+                assert s_fname == l_fname
+                assert s_struct.pack() == l_struct.pack()
+
+
+def test_stream_single_sheet() -> None:
+    excel = Excel(
+        file_path="tests/structs/AlgoritmosFiles.xlsx",
+        sheet="Compañía de aviación",
+        stream=True,
+    )
+    assert excel.df is None
+    file = excel.read()
+    assert file.filenames == ["RESERVAS.dat", "VUELOS.dat", "CIUDADES.dat"]
+    assert file.structs == ["Reserva", "Vuelo", "Ciudad"]
+
+
+def test_incremental_to_file(tmp_path: Path) -> None:
+    excel = Excel(
+        file_path="tests/structs/AlgoritmosFiles.xlsx", sheet="Emisión de tickets"
+    )
+    with ExcelPrinter(excel, output_folder=tmp_path) as p:
+        assert sorted(p.to_file()) == ["PRODUCTOS.dat", "RUBROS.dat"]
+        assert p.to_file() == []
+        p.data.variables[-1].data[0] = 0.5  # RUBROS.dat dto
+        assert p.to_file() == ["RUBROS.dat"]
+    (tmp_path / "PRODUCTOS.dat").unlink()
+    with ExcelPrinter(excel, output_folder=tmp_path) as p:
+        assert p.to_file() == ["PRODUCTOS.dat", "RUBROS.dat"]
+    with ExcelPrinter(excel, output_folder=tmp_path, incremental=False) as p:
+        assert len(p.to_file()) == 2
+
+
+def test_digest_hashes_columns_in_chunks(monkeypatch) -> None:
+    import ayed.classes
+    from ayed.classes import Struct, Variable
+
+    def struct(values: list[int]) -> Struct:
+        var = Variable("int", "id")
+        var.data = values
+        return Struct("Id", [var])
+
+    monkeypatch.setattr(ayed.classes, "DIGEST_VALUES", 3)
+    assert struct(list(range(10))).digest() == struct(list(range(10))).digest()
+    assert struct(list(range(10))).digest() != struct(list(range(11))).digest()
+    assert struct([1, 23]).digest() != struct([12, 3]).digest()
+
+
+def test_parallel_to_file(tmp_path: Path) -> None:
+    excel = Excel(file_path="tests/structs/AlgoritmosFiles.xlsx")
+    with ExcelPrinter(excel, output_folder=tmp_path, jobs=2) as p:
+        assert len(p.to_file()) == 5
+        assert [list(sheet) for sheet in p.data] == [
+            ["Companiadeaviacion"],
+            ["Emisiondetickets"],
+        ]
+        assert p.to_file() == []
+    serial = tmp_path / "serial"
+    with ExcelPrinter(excel, output_folder=serial) as p:
+        p.to_file()
+    for dat in serial.glob("*.dat"):
+        assert dat.read_bytes() == (tmp_path / dat.name).read_bytes()
+    with ExcelPrinter(excel, output_folder=tmp_path, jobs=2) as p:
+        p.to_file()
+        _, file = next(p._sheets())
+        assert file.structs and not any(var.data for var in file.variables)
+
+
+def test_parallel_workers_stream(tmp_path: Path, monkeypatch) -> None:
+    import ayed.excel
+
+    def fail(*args, **kwargs):
+        raise AssertionError("streamed sheets aren't read with read_excel")
+
+    monkeypatch.setattr(ayed.excel, "read_excel", fail)  # forked workers too
+    excel = Excel(file_path="tests/structs/AlgoritmosFiles.xlsx", stream=True)
+    with ExcelPrinter(excel, output_folder=tmp_path, jobs=2) as p:
+        assert len(p.to_file()) == 5
+
+
+def test_file_structs_are_indexed_and_compiled_once() -> None:
+    excel = Excel(
+        file_path="tests/structs/AlgoritmosFiles.xlsx", sheet="Emisión de tickets"
+    )
+    file = excel.read()
+    assert sorted(file.index) == [0, 1]
+    first, second = list(file), list(file)
+    for (_, a), (_, b) in zip(first, second):
+        assert a is b
+    assert [var.name for var in file.struct(1)] == ["idRub", "descr", "dto"]
+    clone = pickle.loads(pickle.dumps(file))
+    assert clone == file
+    assert clone.struct(0).pack() == file.struct(0).pack()
+
+
+def test_file_indexes_variables_appended_by_hand() -> None:
+    from ayed.classes import Variable
+    from ayed.types import File
+
+    def variable(name: str, struct_id: int) -> Variable:
+        var = Variable("int", name)
+        var.struct_id = struct_id
+        return var
+
+    file = File(["A.dat", "B.dat"], ["A", "B"], [variable("a", 0)])
+    assert [var.name for var in file.struct(0)] == ["a"]
+    file.add(variable("b", 1))
+    file.variables.append(variable("a2", 0))
+    assert [var.name for var in file.struct(0)] == ["a", "a2"]
+    assert file.struct(0).cstruct.format == "ii"
+    assert [var.name for var in file.struct(1)] == ["b"]
+    file.variables = [variable("c", 1)]
+    assert [var.name for var in file.struct(0)] == []
+    assert [var.name for var in file.struct(1)] == ["c"]
+    file.variables = [variable("d", 0)]  # the same length
+    assert [var.name for var in file.struct(0)] == ["d"]
+    assert [var.name for var in file.struct(1)] == []
+    file.variables = [variable("e", 1), variable("f", 1)]  # longer
+    assert [var.name for var in file.struct(1)] == ["e", "f"]
+
+
+def test_bulk_packing_matches_pack() -> None:
+    excel = Excel(
+        file_path="tests/structs/AlgoritmosFiles.xlsx", sheet="Emisión de tickets"
+    )
+    for _, struct in excel.read():
+        packed = b"".join(struct.pack())
+        assert struct.pack_buffer() == packed
+        chunks = list(struct.iter_packed(chunk_bytes=struct.size * 3))
+        assert len(chunks) == -(-len(struct) // 3)
+        assert b"".join(chunks) == packed
+
+
+def test_packing_ragged_columns_raises() -> None:
+    from ayed.classes import Struct, Variable
+    from ayed.exceptions import ReadSheetException
+
+    id_, price = Variable("int", "id"), Variable("double", "price")
+    id_.data, price.data = [1, 2, 3], [1.5, 2.5]
+    struct = Struct("Product", [id_, price])
+    for pack in (struct.pack, struct.pack_buffer, struct.to_array):
+        with raises(ReadSheetException, match="id=3, price=2"):
+            pack()
+
+
+def test_numpy_backend(tmp_path: Path) -> None:
+    excel = Excel(
+        file_path="tests/structs/AlgoritmosFiles.xlsx", sheet="Emisión de tickets"
+    )
+    _, productos = next(iter(excel.read()))
+    assert productos.dtype.itemsize == productos.size == Struct("i8sdi").size
+    assert productos.to_array().tobytes() == productos.pack_buffer()
+    productos.tofile(tmp_path / "PRODUCTOS.dat")
+    for mmap in (False, True):
+        array = productos.fromfile(tmp_path / "PRODUCTOS.dat", mmap=mmap)
+        assert array["idPro"].tolist() == list(range(1, 11))
+        assert array[4]["descr"] == b"Detergen"
+        assert array["precio"].sum() == 1170.0
+
+
+def test_paginated_to_table(tmp_path: Path) -> None:
+    excel = Excel(
+        file_path="tests/structs/AlgoritmosFiles.xlsx", sheet="Emisión de tickets"
+    )
+    with ExcelPrinter(excel, output_folder=tmp_path) as p:
+        p.to_file()
+        productos = p.data.struct(0)
+        dat = tmp_path / "PRODUCTOS.dat"
+        assert [r[0] for r in productos.iter_unpack(dat, 8)] == [9, 10]
+        assert [r[0] for r in productos.iter_unpack(dat, 2, 4)] == [3, 4]
+        with console.capture() as capture:
+            p.to_table(tail=2, page_size=1)
+        out = capture.get()
+        assert "Aceite" not in out and "Vinagre" in out and "Sal" in out
+        assert out.count("idPro") == 2  # one table per page
+        with console.capture() as capture:
+            p.to_table(head=1)
+        out = capture.get()
+        assert "Manteca" in out and "Leche" not in out and "Lacteo" in out
+
+
+def test_stream_to_file_holds_one_sheet(tmp_path: Path, monkeypatch) -> None:
+    import weakref
+
+    iter_sheets = Excel.iter_sheets
+    previous: list[weakref.ref] = []
+
+    def tracked(self: Excel):
+        for name, file in iter_sheets(self):
+            # the previous sheet has to be gone by the time this one is read
+            assert all(ref() is None for ref in previous)
+            previous.append(weakref.ref(file))
+            yield name, file
+
+    monkeypatch.setattr(Excel, "iter_sheets", tracked)
+    excel = Excel(file_path="tests/structs/AlgoritmosFiles.xlsx", stream=True)
+    with ExcelPrinter(excel, output_folder=tmp_path) as p:
+        assert p.data == []
+        assert len(p.to_file()) == 5
+        assert len(previous) == 2
+        assert [list(sheet) for sheet in p.data] == [
+            ["Companiadeaviacion"],
+            ["Emisiondetickets"],
+        ]
+        assert all(not var.data for var in p.data[1]["Emisiondetickets"].variables)
+        with console.capture() as capture:
+            p.to_table()
+        assert "Detergen" in capture.get()
+    serial = tmp_path / "serial"
+    with ExcelPrinter(Excel(excel.file_path), output_folder=serial) as p:
+        p.to_file()
+    for dat in serial.glob("*.dat"):
+        assert dat.read_bytes() == (tmp_path / dat.name).read_bytes()
+
+
+def test_stream_caches_each_sheet(tmp_path: Path) -> None:
+    from ayed.cache import WorkbookCache
+
+    cache = WorkbookCache(tmp_path)
+    excel = Excel("tests/structs/AlgoritmosFiles.xlsx", stream=True, cache=cache)
+    first = [file for _, file in excel.iter_sheets()]
+    assert len(list(tmp_path.glob("*.pickle"))) == 2
+    assert [file for _, file in excel.iter_sheets()] == first
+
+
+def test_convert_column_mixed() -> None:
+    from pandas import Series
+
+    from ayed.classes import Variable
+    from ayed.sources import convert_column
+
+    mixed = Series([1, " dos ", 3.0], dtype=object)
+    assert convert_column(Variable("int", "id"), mixed) == [1, "dos", 3.0]
+    ints = Series([1, 2, 3], dtype=object)
+    converted = convert_column(Variable("int", "id"), ints)
+    assert converted == [1, 2, 3] and all(type(i) is int for i in converted)
+    floats = Series([1, "2.5", 3], dtype=object)
+    assert convert_column(Variable("double", "precio"), floats) == [1.0, 2.5, 3.0]
+    chars = Series(["a", 7, "bc", None], dtype=object)
+    assert convert_column(Variable("char", "c"), chars) == [b"a", b"7", b"b", b" "]
+
+
+def test_convert_column_char_overflow() -> None:
+    from pandas import Series
+
+    from ayed.classes import Struct, Variable
+    from ayed.sources import convert_column
+
+    descr = Variable("char", "descr", ctype=8)
+    descr.data = convert_column(descr, Series([" Leche", "Detergente", 10]))
+    assert descr.data == [b"Leche   ", b"Detergente", b"10      "]
+    # the struct's 8s truncates whatever doesn't fit
+    assert Struct("Producto", [descr]).pack() == [b"Leche   ", b"Detergen", b"10      "]
+
+
+def test_ragged_sheet_raises() -> None:
+    from pandas import DataFrame
+
+    from ayed.exceptions import ReadSheetException
+
+    excel = Excel(file_path="ragged.xlsx", sheet="Ragged")
+    excel.df = DataFrame(
+        {
+            "A": ["VUELOS.dat", "struct Vuelo", "int", "idVue", 1, 2, 3],
+            "B": [None, None, "char[4]", "descr", "a", None, "c "],
+        }
+    )
+    file = excel.read()
+    _, vuelo = next(iter(file))
+    assert vuelo.fields[0].data == [1, 2, 3]
+    assert vuelo.fields[1].data == [b"a   ", b"c   "]
+    with raises(ReadSheetException, match="idVue=3, descr=2"):
+        vuelo.pack()
+
+
+def test_ragged_sheet_is_a_bad_parameter(tmp_path: Path) -> None:
+    from openpyxl import Workbook
+    from typer.testing import CliRunner
+
+    from ayed.tool import app
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Ragged"
+    for row in (
+        [],
+        ["VUELOS.dat"],
+        ["struct Vuelo"],
+        ["int", "int"],
+        ["idVue", "cap"],
+        [1, 10],
+        [2],
+    ):
+        ws.append(row)
+    xlsx = tmp_path / "ragged.xlsx"
+    wb.save(xlsx)
+    result = CliRunner().invoke(app, ["files", str(xlsx), "--no-cache"])
+    assert result.exit_code == 2, result.output
+    assert "different lengths" in result.output
@@ -0,0 +1,70 @@
+from pathlib import Path
+from struct import Struct as CStruct
+
+from pytest import raises
+
+from ayed import gen
+from ayed.gen import Generator, int_bounds, parse_range
+from ayed.parser import Tokenizer
+
+VUELO_SRC = """struct Vuelo {
+  int idVue;
+  unsigned char cap;
+  char codigo[3];
+  double millas;
+};"""
+VUELO = Tokenizer.from_str(VUELO_SRC)[0]
+
+
+def test_parse_range() -> None:
+    assert parse_range("idVue=1:500") == ("idVue", (1, 500))
+    assert parse_range("millas=0.5:2") == ("millas", (0.5, 2.0))
+    with raises(ValueError):
+        parse_range("idVue=1")
+    with raises(ValueError):
+        parse_range("idVue=5:1")
+
+
+def test_int_bounds() -> None:
+    assert int_bounds("B") == (0, 255)
+    assert int_bounds("i") == (-(2**31), 2**31 - 1)
+
+
+def test_generate(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(gen, "CHUNK_ROWS", 64)  # several chunks
+    generator = Generator(
+        VUELO,
+        1_000,
+        seed=7,
+        ranges={"idVue": (1, 1_000), "millas": (10.0, 20.0)},
+        unique={"idVue", "codigo"},
+    )
+    dat = tmp_path / "VUELOS.dat"
+    assert generator.write(dat) == 1_000
+    records = list(CStruct(VUELO.cstruct.format).iter_unpack(dat.read_bytes()))
+    assert records == list(generator.records())  # same seed, same records
+    assert sorted(r[0] for r in records) == list(range(1, 1_001))
+    assert len({r[2] for r in records}) == 1_000
+    assert all(0 <= r[1] <= 255 and 10.0 <= r[3] <= 20.0 for r in records)
+
+
+def test_generate_errors() -> None:
+    with raises(KeyError):
+        Generator(VUELO, 10, unique={"nope"})
+    with raises(ValueError, match="unique"):
+        Generator(VUELO, 10, ranges={"idVue": (1, 5)}, unique={"idVue"})
+    with raises(ValueError, match="integers"):
+        Generator(VUELO, 10, ranges={"cap": (0, 256)})
+    with raises(ValueError, match="numeric"):
+        Generator(VUELO, 10, ranges={"codigo": (0, 5)})
+
+
+def test_unique_floats_need_room() -> None:
+    for bounds in ((5.0, 5.0), (1.0, 1.0 + 1e-15)):
+        with raises(ValueError, match="millas can't have 10 unique values"):
+            Generator(VUELO, 10, ranges={"millas": bounds}, unique={"millas"})
+    Generator(VUELO, 1, ranges={"millas": (5.0, 5.0)}, unique={"millas"})
+    generator = Generator(
+        VUELO, 10, ranges={"millas": (1.0, 1.0 + 1e-14)}, unique={"millas"}
+    )
+    assert len({record[3] for record in generator.records()}) == 10
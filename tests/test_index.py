@@ -0,0 +1,80 @@
+from os import utime
+from pathlib import Path
+from struct import Struct as CStruct
+
+from pytest import raises
+
+from ayed.exceptions import IndexFileException
+from ayed.index import Index, build_index, index_path
+from ayed.parser import Tokenizer
+
+CIUDAD = """struct Ciudad {
+  int idCiu;
+  char descr[20];
+  double millas;
+};"""
+
+
+def write_ciudades(path: Path, n: int) -> None:
+    s = CStruct("i20sd")
+    with path.open("wb") as fh:
+        for i in range(n):
+            # ids aren't sorted and repeat every 1000 records
+            fh.write(s.pack((i * 7919) % 1000, f"city{i}".ljust(20).encode(), i / 2))
+
+
+def test_lookup_int_key(tmp_path: Path) -> None:
+    dat = tmp_path / "CIUDADES.dat"
+    write_ciudades(dat, 5_000)
+    ciudad = Tokenizer.from_str(CIUDAD)[0]
+    assert build_index(dat, ciudad, "idCiu") == index_path(dat)
+    with Index(dat) as index:
+        assert len(index) == 5_000
+        found = index.lookup(7)
+        assert len(found) == 5
+        for i, record in found:
+            assert record[0] == 7
+            assert record[1] == f"city{i}".ljust(20).encode()
+        assert index.lookup("7") == found
+        assert index.lookup(1_000) == []
+
+
+def test_lookup_char_key(tmp_path: Path) -> None:
+    dat = tmp_path / "CIUDADES.dat"
+    write_ciudades(dat, 100)
+    ciudad = Tokenizer.from_str(CIUDAD)[0]
+    build_index(dat, ciudad, "descr")
+    with Index(dat) as index:
+        [(i, record)] = index.lookup("city42")
+        assert i == 42 and record[2] == 21.0
+
+
+def test_index_in_bounded_memory(tmp_path: Path) -> None:
+    dat = tmp_path / "CIUDADES.dat"
+    write_ciudades(dat, 5_000)
+    ciudad = Tokenizer.from_str(CIUDAD)[0]
+    build_index(dat, ciudad, "descr")
+    in_memory = index_path(dat).read_bytes()
+    for key in ("idCiu", "descr"):  # hundreds of runs of 6 entries
+        build_index(dat, ciudad, key, memory=1_000, tmp_dir=tmp_path)
+        with Index(dat) as index:
+            assert len(index) == 5_000
+            keys = [index.entry(i)[0] for i in range(len(index))]
+            assert keys == sorted(keys)
+            assert len(index.lookup(7 if key == "idCiu" else "city7")) in (1, 5)
+    assert index_path(dat).read_bytes() == in_memory  # descr's, built last
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        dat.name,
+        index_path(dat).name,
+    ]
+
+
+def test_stale_and_missing_index(tmp_path: Path) -> None:
+    dat = tmp_path / "CIUDADES.dat"
+    write_ciudades(dat, 10)
+    with raises(IndexFileException):
+        Index(dat).open()
+    build_index(dat, Tokenizer.from_str(CIUDAD)[0], "idCiu")
+    utime(dat, ns=(0, 0))
+    with raises(IndexFileException):
+        Index(dat).open()
@@ -0,0 +1,101 @@
+import json
+from io import StringIO
+
+from pytest import fixture
+
+from ayed.output import Format, Output
+from ayed.utils import console
+
+RECORDS = [(1, b"Miami".ljust(20), 800), (2, b"Madrid".ljust(20), 2000)]
+COLUMNS = ["idCiu", "descr", "millas"]
+
+
+@fixture(autouse=True)
+def unquiet() -> None:
+    yield
+    console.quiet = False
+
+
+def run(format: Format) -> str:
+    stream = StringIO()
+    out = Output()
+    out.use(format, stream)
+    out.records("CIUDADES.dat", COLUMNS, iter(RECORDS), start=5)
+    out.summary("files", rebuilt=["CIUDADES.dat"])
+    out.close()
+    return stream.getvalue()
+
+
+def test_ndjson() -> None:
+    lines = [json.loads(line) for line in run(Format.ndjson).splitlines()]
+    assert lines[0] == {
+        "type": "record",
+        "file": "CIUDADES.dat",
+        "index": 5,
+        "data": {"idCiu": 1, "descr": "Miami", "millas": 800},
+    }
+    assert lines[2] == {
+        "type": "summary",
+        "command": "files",
+        "rebuilt": ["CIUDADES.dat"],
+    }
+    assert not console.quiet  # close lets it log again
+
+
+def test_json() -> None:
+    items = json.loads(run(Format.json))
+    assert [item["type"] for item in items] == ["record", "record", "summary"]
+    assert items[1]["data"]["descr"] == "Madrid"
+
+
+def test_empty_json() -> None:
+    stream = StringIO()
+    out = Output()
+    out.use(Format.json, stream)
+    out.close()
+    assert json.loads(stream.getvalue()) == []
+
+
+def test_csv() -> None:
+    records, summary = run(Format.csv).split("\n\n")
+    assert records.splitlines() == [
+        "file,#,idCiu,descr,millas",
+        "CIUDADES.dat,5,1,Miami,800",
+        "CIUDADES.dat,6,2,Madrid,2000",
+    ]
+    assert summary.splitlines() == ["command,rebuilt", 'files,"[""CIUDADES.dat""]"']
+
+
+def test_close_restores_the_console() -> None:
+    out = Output()
+    for format in (Format.ndjson, Format.json):
+        out.use(format, StringIO())
+        assert console.quiet
+        out.close()
+        assert not console.quiet
+    console.quiet = True  # ex: a worker process
+    out.use(Format.csv, StringIO())
+    out.use(Format.rich)
+    assert console.quiet
+    out.close()
+    assert console.quiet
+
+
+def test_commands_close_the_output_on_errors(tmp_path) -> None:
+    from typer.testing import CliRunner
+
+    from ayed.tool import app
+
+    header = tmp_path / "vuelo.hpp"
+    header.write_text("struct Vuelo { int idVue; };\n")
+    runner = CliRunner()
+    result = runner.invoke(app, ["coll", str(tmp_path / "*.txt"), "--format", "json"])
+    assert result.exit_code == 2
+    assert result.stdout.startswith("[]")  # the array is closed
+    assert not console.quiet
+    args = ["coll", "-p", str(header), "--stdout", "--format", "json"]
+    result = runner.invoke(app, args)
+    assert result.exit_code == 2 and "--stdout" in result.output
+    assert not console.quiet
+    result = runner.invoke(app, ["coll", "-p", str(header), "--stdout"])
+    assert result.exit_code == 0 and "Vuelo newVuelo(" in result.stdout
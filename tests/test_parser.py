@@ -0,0 +1,116 @@
+from pytest import raises
+
+from ayed.exceptions import NoStructException
+from ayed.parser import Tokenizer, tokenize
+
+HEADER = r"""
+#include <string>
+#define SIZE(a) \
+    sizeof(a)
+// struct Commented { int x; };
+/* struct Blocked {
+  int y; }; */
+struct Fecha;
+int dias(struct Fecha f) { if (f.dia) { return 1; } return 0; }
+
+typedef struct {
+  unsigned long long int id; // the key
+  const char nombre[20] = "x;}";
+  double a, b;
+  char c[0x3];
+  std::string s;
+  std::vector<std::pair<int, int>> v;
+  struct Hora { short int h, m; } desde, hasta;
+  static int count;
+  Equipo e{};
+  int total() const { return a + b; }
+  Registro() : id(0) {}
+  public:
+  long double ld = 1.5;
+} Registro;
+
+namespace ayed {
+struct Ultimo : Registro {
+  signed char q;
+};
+}
+"""
+
+
+def fields(struct):
+    return [(v.type, v.name, v.ctype) for v in struct]
+
+
+def test_tokenize() -> None:
+    assert tokenize("std :: string s; // x\n/* y */ char t[20];") == [
+        "std::string",
+        "s",
+        ";",
+        "char",
+        "t",
+        "[",
+        "20",
+        "]",
+        ";",
+    ]
+
+
+def test_parse_header() -> None:
+    hora, registro, ultimo = Tokenizer.from_str(HEADER)
+    assert hora.name == "Hora"
+    assert fields(hora) == [("short int", "h", 0), ("short int", "m", 0)]
+    assert registro.name == "Registro"
+    assert fields(registro) == [
+        ("unsigned long long int", "id", 0),
+        ("char", "nombre", 20),
+        ("double", "a", 0),
+        ("double", "b", 0),
+        ("char", "c", 3),
+        ("string", "s", 0),
+        ("std::vector<std::pair<int,int>>", "v", 0),
+        ("Hora", "desde", 0),
+        ("Hora", "hasta", 0),
+        ("Equipo", "e", 0),
+        ("long double", "ld", 0),
+    ]
+    assert (ultimo.name, fields(ultimo)) == ("Ultimo", [("signed char", "q", 0)])
+
+
+def test_parse_many() -> None:
+    code = "\n".join(f"struct S{i} {{ int a; char b[{i + 1}]; }};" for i in range(2000))
+    structs = Tokenizer.from_str(code)
+    assert [s.name for s in structs] == [f"S{i}" for i in range(2000)]
+    assert structs[-1].size == 4 + 2000
+
+
+def test_parse_errors() -> None:
+    with raises(NoStructException, match="Couldn't find a struct"):
+        Tokenizer.from_str("int main() { return 0; }")
+    with raises(NoStructException, match="missing"):
+        Tokenizer.from_str("struct A { int a;")
+    with raises(NoStructException, match="size"):
+        Tokenizer.from_str("struct A { char a[N]; };")
+    for array in ("double c[3]", "char *c[3]", "char c[3][20]", "char c[]"):
+        with raises(NoStructException, match="only char"):
+            Tokenizer.from_str(f"struct A {{ {array}; }};")
+
+
+def test_unions_enums_and_bitfields() -> None:
+    (struct,) = Tokenizer.from_str(
+        """struct A {
+  enum Color { ROJO, VERDE };
+  enum class Dia : char { LUNES };
+  enum Mes;
+  union Valor { int i; float f; };
+  int a;
+};"""
+    )
+    assert fields(struct) == [("int", "a", 0)]
+    for member in ("union { int i; float f; } u", "union Valor v", "enum Color c"):
+        with raises(NoStructException, match=f"field {member[-1]},"):
+            Tokenizer.from_str(f"struct A {{ int a; {member}; }};")
+    with raises(NoStructException, match="anonymous"):
+        Tokenizer.from_str("struct A { union { int i; float f; }; };")
+    for bitfield in ("int a : 3", "unsigned b:1, c:2", "int : 4"):
+        with raises(NoStructException, match="bitfield"):
+            Tokenizer.from_str(f"struct A {{ {bitfield}; }};")
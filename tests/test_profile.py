@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+
+from pytest import fixture
+
+from ayed.excel import Excel
+from ayed.printer import ExcelPrinter
+from ayed.profile import Profiler, profiler
+
+EXCEL = Path("tests/structs/AlgoritmosFiles.xlsx")
+
+
+@fixture
+def enabled() -> Profiler:
+    profiler.enable()
+    yield profiler
+    profiler.disable()
+    profiler.drain()
+
+
+def test_disabled_records_nothing() -> None:
+    p = Profiler()
+    with p.stage("pack") as span:
+        span.rows = 10
+    assert list(p.timed("iter", range(3))) == [0, 1, 2]
+    assert p.spans == []
+
+
+def test_nested_stages() -> None:
+    p, seen = Profiler(), []
+    p.add_hook(seen.append)
+    p.enable()
+    try:
+        with p.stage("sheet", sheet="Vuelos"):
+            with p.stage("write", file="VUELOS.dat") as span:
+                span.bytes = 320
+                assert sum(x for x in p.timed("pack", range(4))) == 6
+    finally:
+        p.disable()
+    pack, write, sheet = p.spans
+    assert seen == p.spans
+    assert (pack.name, pack.sheet, pack.file, pack.rows) == (
+        "pack",
+        "Vuelos",
+        "VUELOS.dat",
+        4,
+    )
+    assert write.bytes == 320 and write.sheet == "Vuelos"
+    assert write.child_seconds == pack.seconds
+    assert sheet.seconds >= write.seconds >= pack.seconds
+    assert sheet.peak >= write.peak > 0
+
+
+def test_files_profile(enabled: Profiler, tmp_path: Path) -> None:
+    with ExcelPrinter(Excel(EXCEL), output_folder=tmp_path) as printer:
+        printer.to_file()
+    stages = {(span.name, span.sheet) for span in enabled.spans}
+    assert ("read_excel", None) in stages
+    assert ("parse sheet", "Companiadeaviacion") in stages
+    assert ("write", "Emisiondetickets") in stages
+    written = sum(span.bytes for span in enabled.spans if span.name == "write")
+    assert written == sum(f.stat().st_size for f in tmp_path.glob("*.dat"))
+
+    enabled.to_chrome_trace(tmp_path / "trace.json")
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    assert len(events) == len(enabled.spans)
+    assert all(event["ph"] == "X" and event["ts"] >= 0 for event in events)
+    enabled.to_json(tmp_path / "profile.json")
+    spans = json.loads((tmp_path / "profile.json").read_text())["spans"]
+    assert spans[0]["name"] == enabled.spans[0].name
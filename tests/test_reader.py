@@ -0,0 +1,66 @@
+from pathlib import Path
+from struct import Struct as CStruct
+
+from pytest import raises
+
+from ayed.exceptions import NoStructException
+from ayed.parser import Tokenizer
+from ayed.reader import RecordReader
+
+VUELO = """struct Vuelo {
+  int idVue;
+  int cap;
+  char destino[8];
+};"""
+
+
+def write_vuelos(path: Path, n: int) -> None:
+    s = CStruct("ii8s")
+    with path.open("wb") as fh:
+        for i in range(n):
+            fh.write(s.pack(i, i * 10, f"dst{i}".encode()))
+
+
+def test_random_access(tmp_path: Path) -> None:
+    write_vuelos(tmp_path / "VUELOS.dat", 10_000)
+    vuelo = Tokenizer.from_str(VUELO)[0]
+    with RecordReader(tmp_path / "VUELOS.dat", vuelo) as vuelos:
+        assert len(vuelos) == 10_000
+        assert vuelos[4_000] == (4_000, 40_000, b"dst4000\x00")
+        assert vuelos[-1][0] == 9_999
+        assert [v[0] for v in vuelos[10:13]] == [10, 11, 12]
+        assert [v[0] for v in vuelos[:6:2]] == [0, 2, 4]
+        assert sum(1 for _ in vuelos) == 10_000
+        assert [v[0] for v in vuelos.records(9_998, 20_000)] == [9_998, 9_999]
+        with raises(IndexError):
+            vuelos[10_000]
+
+
+def test_empty_file(tmp_path: Path) -> None:
+    (tmp_path / "EMPTY.dat").touch()
+    vuelo = Tokenizer.from_str(VUELO)[0]
+    with RecordReader(tmp_path / "EMPTY.dat", vuelo) as empty:
+        assert len(empty) == 0
+        assert list(empty) == []
+
+
+def test_struct_from_path() -> None:
+    equipo = Tokenizer.struct_from_path(Path("tests/structs/structs.cpp"))
+    assert equipo.name == "Equipo"
+    assert equipo.cstruct.format == "i20si"
+    with raises(NoStructException):
+        Tokenizer.struct_from_path(Path("tests/structs/structs.cpp"), "Vuelo")
+
+
+def test_struct_errors_are_bad_parameters(tmp_path: Path) -> None:
+    from typer.testing import CliRunner
+
+    from ayed.tool import app
+
+    csv = tmp_path / "vuelos.csv"
+    csv.write_text("idVue,cap,destino\n1,2,x\n")
+    struct = ["-f", "tests/structs/structs.cpp", "--struct", "Vuelo"]
+    for command in ("files", "read"):
+        result = CliRunner().invoke(app, [command, str(csv), *struct])
+        assert result.exit_code == 2, result.output
+        assert "Couldn't find struct Vuelo" in result.output
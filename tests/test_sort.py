@@ -0,0 +1,78 @@
+import heapq
+from pathlib import Path
+from random import Random
+from struct import Struct as CStruct
+
+from ayed.parser import Tokenizer
+from ayed.sort import run_length, sort_dat
+
+RESERVA = """struct Reserva {
+  int idCli;
+  char nombre[10];
+  double monto;
+};"""
+
+
+def write_reservas(path: Path, n: int) -> list[tuple]:
+    s, rand = CStruct("i10sd"), Random(42)
+    records = [
+        (rand.randrange(100), f"cli{i}".ljust(10).encode(), rand.random() * 1000)
+        for i in range(n)
+    ]
+    with path.open("wb") as fh:
+        for record in records:
+            fh.write(s.pack(*record))
+    return records
+
+
+def read_all(path: Path) -> list[tuple]:
+    return list(CStruct("i10sd").iter_unpack(path.read_bytes()))
+
+
+def test_external_sort(tmp_path: Path) -> None:
+    dat = tmp_path / "RESERVAS.dat"
+    records = write_reservas(dat, 2_000)
+    reserva = Tokenizer.from_str(RESERVA)[0]
+    memory = 20_000  # forces several runs
+    assert run_length(reserva, memory) < 200
+    sort_dat(dat, reserva, "idCli", memory=memory, tmp_dir=tmp_path)
+    assert read_all(dat) == sorted(records, key=lambda r: r[0])  # stable
+    assert [p.name for p in tmp_path.iterdir()] == ["RESERVAS.dat"]
+
+
+def test_external_sort_caps_the_fanin(tmp_path: Path, monkeypatch) -> None:
+    import ayed.sort
+
+    fanins = []
+
+    def merge(*runs, **kwargs):
+        fanins.append(len(runs))
+        return heapq.merge(*runs, **kwargs)
+
+    monkeypatch.setattr(ayed.sort, "merge", merge)
+    dat = tmp_path / "RESERVAS.dat"
+    records = write_reservas(dat, 2_000)
+    reserva = Tokenizer.from_str(RESERVA)[0]
+    sort_dat(dat, reserva, "idCli", memory=10_000, fanin=3, tmp_dir=tmp_path)
+    assert read_all(dat) == sorted(records, key=lambda r: r[0])
+    assert len(fanins) > 3 and max(fanins) == 3  # several passes
+    assert [p.name for p in tmp_path.iterdir()] == ["RESERVAS.dat"]
+
+
+def test_external_sort_desc_to_output(tmp_path: Path) -> None:
+    dat = tmp_path / "RESERVAS.dat"
+    records = write_reservas(dat, 500)
+    reserva = Tokenizer.from_str(RESERVA)[0]
+    out = sort_dat(
+        dat, reserva, "monto", desc=True, output=tmp_path / "SORTED.dat", memory=5_000
+    )
+    assert out == tmp_path / "SORTED.dat"
+    assert read_all(out) == sorted(records, key=lambda r: r[2], reverse=True)
+    assert read_all(dat) == records
+
+
+def test_sort_empty_file(tmp_path: Path) -> None:
+    dat = tmp_path / "EMPTY.dat"
+    dat.touch()
+    sort_dat(dat, Tokenizer.from_str(RESERVA)[0], "nombre")
+    assert dat.read_bytes() == b""
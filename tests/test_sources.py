@@ -0,0 +1,187 @@
+import json
+from pathlib import Path
+from struct import Struct as CStruct
+
+from pytest import importorskip, raises
+
+from ayed.exceptions import SourceException
+from ayed.parser import Tokenizer
+from ayed.printer import ExcelPrinter
+from ayed.sources import CsvSource, NdjsonSource, ParquetSource, open_source
+
+VUELO = Tokenizer.from_str(
+    """struct Vuelo {
+  int idVue;
+  char destino[10];
+  double millas;
+};"""
+)[0]
+RECORDS = [(i, f"ciudad{i}".ljust(10).encode(), i * 1.5) for i in range(100)]
+
+
+def write_csv(path: Path) -> Path:
+    lines = ["millas,extra,idVue,destino"]
+    lines += [f"{m},x,{i},{d.decode().strip()}" for i, d, m in RECORDS]
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def read_dat(path: Path) -> list[tuple]:
+    return list(CStruct(VUELO.cstruct.format).iter_unpack(path.read_bytes()))
+
+
+def test_csv_chunks(tmp_path: Path) -> None:
+    source = CsvSource(write_csv(tmp_path / "vuelos.csv"), VUELO, chunk_rows=30)
+    assert source.filename == "VUELOS.dat"
+    chunks = list(source.chunks())
+    assert [len(chunk.struct(0)) for chunk in chunks] == [30, 30, 30, 10]
+    packed = b"".join(b"".join(chunk.struct(0).pack()) for chunk in chunks)
+    assert packed == b"".join(VUELO.cstruct.pack(*r) for r in RECORDS)
+
+
+def test_ndjson_source(tmp_path: Path) -> None:
+    path = tmp_path / "vuelos.ndjson"
+    path.write_text(
+        "".join(
+            json.dumps({"idVue": i, "destino": d.decode().strip(), "millas": m}) + "\n"
+            for i, d, m in RECORDS
+        )
+    )
+    source = open_source(path, VUELO, "VUE.dat", chunk_rows=64)
+    assert isinstance(source, NdjsonSource) and source.filename == "VUE.dat"
+    chunks = list(source.chunks())
+    assert len(chunks) == 2
+    assert [r for chunk in chunks for r in zip(*(f.data for f in chunk.struct(0)))] == (
+        RECORDS
+    )
+
+
+def test_parquet_source(tmp_path: Path) -> None:
+    pandas = importorskip("pandas")
+    importorskip("pyarrow")
+    path = tmp_path / "vuelos.parquet"
+    frame = pandas.DataFrame(RECORDS, columns=["idVue", "destino", "millas"])
+    frame["destino"] = frame["destino"].str.decode("utf-8").str.strip()
+    frame.to_parquet(path, row_group_size=25)
+    chunks = list(ParquetSource(path, VUELO, chunk_rows=25).chunks())
+    assert len(chunks) == 4
+
+
+def test_source_errors(tmp_path: Path) -> None:
+    with raises(SourceException, match="supported"):
+        open_source(tmp_path / "vuelos.txt", VUELO)
+    path = tmp_path / "vuelos.csv"
+    path.write_text("idVue,millas\n1,2.5\n")
+    with raises(SourceException, match="destino"):
+        list(CsvSource(path, VUELO).chunks())
+
+
+def test_bad_values(tmp_path: Path) -> None:
+    path = tmp_path / "vuelos.csv"
+    for rows, error in (
+        (["1,abc,2.5", ",def,3"], "row 2, column idVue: is missing"),
+        (["x,abc,2.5"], "row 1, column idVue: 'x' isn't a valid int"),
+        (["1,abc,2.5", "2.5,abc,2.5"], "row 2, column idVue: '2.5' isn't"),
+        (["1,abc,2.5", "2,abc,lejos"], "row 2, column millas: 'lejos' isn't"),
+    ):
+        path.write_text("\n".join(["idVue,destino,millas", *rows]) + "\n")
+        with raises(SourceException, match=error):
+            list(CsvSource(path, VUELO).chunks())
+    path.write_text("idVue,destino,millas\n" + "1,a,2\n" * 5 + "y,a,2\n")
+    with raises(SourceException, match="vuelos.csv, row 6, column idVue"):
+        list(CsvSource(path, VUELO, chunk_rows=2).chunks())
+
+    path = tmp_path / "vuelos.ndjson"
+    rows = [{"idVue": 1, "destino": "a", "millas": 2}, {"destino": "b", "millas": 3}]
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    with raises(SourceException, match="vuelos.ndjson, row 2, column idVue"):
+        list(NdjsonSource(path, VUELO).chunks())
+    path.write_text('{"idVue": 1, "destino": "a", "millas": 2}\nnot json\n')
+    with raises(SourceException, match="Can't read vuelos.ndjson"):
+        list(NdjsonSource(path, VUELO).chunks())
+
+
+def test_source_errors_are_bad_parameters(tmp_path: Path, monkeypatch) -> None:
+    from typer.testing import CliRunner
+
+    from ayed.tool import app
+
+    monkeypatch.chdir(tmp_path)
+    Path("vuelos.csv").write_text("idVue,millas\n1,2.5\n")
+    Path("vuelo.hpp").write_text("struct Vuelo { int idVue; char destino[10]; };")
+    result = CliRunner().invoke(app, ["files", "vuelos.csv", "-f", "vuelo.hpp"])
+    assert result.exit_code == 2, result.output
+    assert "no column(s) destino" in result.output
+    Path("vuelos.csv").write_text("idVue,destino\n1,a\n,b\n")
+    result = CliRunner().invoke(app, ["files", "vuelos.csv", "-f", "vuelo.hpp"])
+    assert result.exit_code == 2, result.output
+    assert "row 2, column idVue" in result.output
+
+
+def test_printer_streams_sources(tmp_path: Path) -> None:
+    source = CsvSource(write_csv(tmp_path / "vuelos.csv"), VUELO, chunk_rows=7)
+    out = tmp_path / "output_files"
+    with ExcelPrinter(source, output_folder=out) as printer:
+        assert printer.to_file() == ["VUELOS.dat"]
+        assert printer.data.filenames == ["VUELOS.dat"]
+    assert read_dat(out / "VUELOS.dat") == RECORDS
+    with ExcelPrinter(source, output_folder=out) as printer:
+        assert printer.to_file() == []  # the csv didn't change
+
+
+def test_chars_and_dates(tmp_path: Path) -> None:
+    (pago,) = Tokenizer.from_str("struct Pago { char tipo; char date[10]; int id; };")
+    path = tmp_path / "pagos.ndjson"
+    rows = [{"tipo": "A", "date": "2021-05-01", "id": 1}, {"tipo": "", "id": 2}]
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    (chunk,) = open_source(path, pago).chunks()
+    assert chunk.struct(0).pack() == [
+        pago.cstruct.pack(b"A", b"2021-05-01", 1),
+        pago.cstruct.pack(b" ", b" " * 10, 2),  # missing values are blank
+    ]
+
+
+def test_digest_changes_with_the_fields(tmp_path: Path) -> None:
+    path = write_csv(tmp_path / "vuelos.csv")
+
+    def digest(code: str) -> str:
+        return CsvSource(path, Tokenizer.from_str(code)[0]).digest()
+
+    ab = digest("struct Vuelo { int a; int b; };")
+    assert ab == digest("struct Vuelo { int a; int b; };")
+    assert ab != digest("struct Vuelo { int b; int a; };")
+    assert ab != digest("struct Vuelo { int a; int c; };")
+    assert ab != digest("struct Avion { int a; int b; };")
+    assert digest("struct V { char a[4]; int b; };") != digest(
+        "struct V { char b[4]; int a; };"
+    )
+
+
+def test_outputs_changed_afterwards_are_rebuilt(tmp_path: Path) -> None:
+    from ayed.sort import sort_dat
+
+    source = CsvSource(write_csv(tmp_path / "vuelos.csv"), VUELO)
+    out = tmp_path / "output_files"
+    with ExcelPrinter(source, output_folder=out) as printer:
+        assert printer.to_file() == ["VUELOS.dat"]
+    sort_dat(out / "VUELOS.dat", VUELO, "idVue", desc=True)
+    assert read_dat(out / "VUELOS.dat") == RECORDS[::-1]
+    with ExcelPrinter(source, output_folder=out) as printer:
+        assert printer.to_file() == ["VUELOS.dat"]
+        assert printer.to_file() == []
+    assert read_dat(out / "VUELOS.dat") == RECORDS
+
+
+def test_failed_source_leaves_the_dat_alone(tmp_path: Path) -> None:
+    path = write_csv(tmp_path / "vuelos.csv")
+    out = tmp_path / "output_files"
+    with ExcelPrinter(CsvSource(path, VUELO), output_folder=out) as printer:
+        printer.to_file()
+    before = (out / "VUELOS.dat").read_bytes()
+    path.write_text(path.read_text() + "1.5,x,nope,Roma\n")
+    source = CsvSource(path, VUELO, chunk_rows=30)  # fails on the 4th chunk
+    with ExcelPrinter(source, output_folder=out) as printer:
+        with raises(SourceException, match="row 101, column idVue"):
+            printer.to_file()
+    assert (out / "VUELOS.dat").read_bytes() == before
+    assert sorted(p.name for p in out.iterdir()) == [".manifest.json", "VUELOS.dat"]
@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+import sys
+
+from pytest import mark
+
+# `ayed coll` should never pay for the excel stack.
+HEAVY_MODULES = ("pandas", "openpyxl", "regex", "numpy", "rich.traceback")
+# How long the imports take depends on the machine, so the budget is only
+# checked when it's given, ex: AYED_STARTUP_BUDGET_MS=100 pytest
+STARTUP_BUDGET_MS = os.environ.get("AYED_STARTUP_BUDGET_MS")
+RUNS = 3  # timings are noisy, keep the best run
+
+CODE = """
+import json, sys
+import typer
+import ayed.tool, ayed.parser, ayed.printer, ayed.coll
+print(json.dumps(sorted(sys.modules)))
+"""
+# the options of the commands can't import rich, attr or the rest of ayed
+TOOL_CODE = """
+import json, sys
+import ayed.tool
+print(json.dumps(sorted(m for m in sys.modules if m.split(".")[0] == "ayed")))
+"""
+
+
+def run_importtime() -> tuple[list[str], str]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CODE],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(proc.stdout), proc.stderr
+
+
+def test_coll_does_not_import_heavy_modules() -> None:
+    modules, _ = run_importtime()
+    for heavy in HEAVY_MODULES:
+        assert heavy not in modules, f"{heavy} is imported at startup"
+
+
+def test_tool_only_imports_what_typer_needs() -> None:
+    proc = subprocess.run(
+        [sys.executable, "-c", TOOL_CODE], capture_output=True, text=True, check=True
+    )
+    assert json.loads(proc.stdout) == ["ayed", "ayed.formats", "ayed.tool"]
+
+
+def startup_us() -> int:
+    _, importtime = run_importtime()
+    total_us = 0
+    for line in importtime.splitlines():
+        # import time: self [us] | cumulative | imported package
+        *_, cumulative, name = line.split("|")
+        if name.startswith(" ayed"):  # top level imports only
+            total_us += int(cumulative)
+    return total_us
+
+
+@mark.skipif(STARTUP_BUDGET_MS is None, reason="set AYED_STARTUP_BUDGET_MS")
+def test_coll_startup_budget() -> None:
+    best_us = min(startup_us() for _ in range(RUNS))
+    assert best_us / 1000 < float(STARTUP_BUDGET_MS or 0)
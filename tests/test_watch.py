@@ -0,0 +1,91 @@
+from pathlib import Path
+from shutil import copy
+
+from openpyxl import load_workbook
+from pytest import fail, fixture, mark
+
+from ayed.watch import (
+    InotifyWatcher,
+    PollingWatcher,
+    Session,
+    changed_sheets,
+    sheet_digests,
+)
+
+EXCEL = Path("tests/structs/AlgoritmosFiles.xlsx")
+TICKETS = "Emisión de tickets"
+
+
+def set_cell(path: Path, sheet: str, cell: str, value: float) -> None:
+    wb = load_workbook(path)
+    wb[sheet][cell] = value
+    wb.save(path)
+
+
+@fixture
+def workbook(tmp_path: Path) -> Path:
+    path = tmp_path / EXCEL.name
+    copy(EXCEL, path)
+    set_cell(path, TICKETS, "F11", 100)  # saved by openpyxl, like the edits
+    return path
+
+
+def test_changed_sheets(workbook: Path) -> None:
+    before = sheet_digests(workbook)
+    assert set(before) == {"", "Compañía de aviación", TICKETS}
+    set_cell(workbook, TICKETS, "F11", 123)
+    assert changed_sheets(before, sheet_digests(workbook)) == [TICKETS]
+    assert changed_sheets({}, before) is None
+    assert changed_sheets({**before, "": 0}, before) is None
+    assert sheet_digests(workbook.with_suffix(".csv")) == {}
+
+
+def test_session_rewrites_changed_sheets(workbook: Path, tmp_path: Path) -> None:
+    session = Session(workbook, output_folder=tmp_path / "out")
+    assert len(session.excel()) == 5
+    assert session.excel() == []  # nothing changed, not even read
+    set_cell(workbook, TICKETS, "F11", 123)
+    assert session.excel() == ["PRODUCTOS.dat"]
+
+
+def test_session_headers(tmp_path: Path) -> None:
+    header = tmp_path / "vuelo.hpp"
+    header.write_text("struct Vuelo { int idVue; };\n")
+    session = Session(None, [str(tmp_path)], output_folder=tmp_path / "out")
+    assert tmp_path.resolve() in session.paths()
+    assert session.structs() == [str(tmp_path / "out" / "vuelo.hpp")]
+    assert session.structs() == []
+
+
+def test_session_ignores_its_output(tmp_path: Path, monkeypatch) -> None:
+    (tmp_path / "vuelo.hpp").write_text("struct Vuelo { int idVue; };\n")
+    session = Session(None, ["."], output_folder=Path("out"))
+    monkeypatch.chdir(tmp_path)
+    session.run()
+    assert (tmp_path / "out" / "vuelo.hpp").exists()
+    assert not any(session.generated(path) for path in session.paths())
+    watcher = PollingWatcher(interval=0.01)
+    watcher.watch(session.paths())
+    (tmp_path / "out" / "vuelo.hpp").write_text("edited")
+    assert watcher.wait(0.1) == set()
+    monkeypatch.setattr(Session, "structs", lambda self: fail("ran"))
+    session.run({(tmp_path / "out" / "vuelo.hpp").resolve()})
+
+
+def check_watcher(watcher, tmp_path: Path) -> None:
+    watched = tmp_path / "a.hpp"
+    watched.write_text("a")
+    watcher.watch([watched])
+    assert watcher.wait(0.1) == set()
+    watched.write_text("changed")
+    assert watched in watcher.wait(2)
+
+
+def test_polling_watcher(tmp_path: Path) -> None:
+    check_watcher(PollingWatcher(interval=0.01), tmp_path)
+
+
+@mark.skipif(not Path("/proc/sys/fs/inotify").exists(), reason="needs inotify")
+def test_inotify_watcher(tmp_path: Path) -> None:
+    with InotifyWatcher.open() as watcher:
+        check_watcher(watcher, tmp_path)